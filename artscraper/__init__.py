@@ -1,12 +1,63 @@
-"""Scrape art image and metadata from WikiArt and Google Arts."""
-
-from artscraper.googleart import GoogleArtScraper
-from artscraper.wikiart import WikiArtScraper
-from artscraper.philamuseum import PhiladelphiaMuseumScraper
-from artscraper.getty import GettyScraper
-from artscraper.rijksmuseum import RijksmuseumScraper
-from artscraper.artic import ArticScraper
-from artscraper.smithsonian import SmithsonianScraper
-from artscraper.met import MetMuseumScraper
-
-__all__ = ["GoogleArtScraper", "WikiArtScraper", "PhiladelphiaMuseumScraper", "GettyScraper", "RijksmuseumScraper", "ArticScraper", "SmithsonianScraper", "MetMuseumScraper"]
+"""Scrape art image and metadata from WikiArt and Google Arts.
+
+The scrapers are imported lazily on first access, so that importing
+artscraper does not load selenium, requests or bs4 until a scraper that
+needs them is actually used.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Make the lazy attributes visible to type checkers and linters.
+    from artscraper.googleart import GoogleArtScraper
+    from artscraper.wikiart import WikiArtScraper
+    from artscraper.philamuseum import PhiladelphiaMuseumScraper
+    from artscraper.getty import GettyScraper
+    from artscraper.rijksmuseum import RijksmuseumScraper
+    from artscraper.artic import ArticScraper
+    from artscraper.smithsonian import SmithsonianScraper
+    from artscraper.met import MetMuseumScraper
+    from artscraper.router import ScraperRouter
+    from artscraper.router import scrape
+
+_LAZY_ATTRIBUTES = {
+    "GoogleArtScraper": "artscraper.googleart",
+    "WikiArtScraper": "artscraper.wikiart",
+    "PhiladelphiaMuseumScraper": "artscraper.philamuseum",
+    "GettyScraper": "artscraper.getty",
+    "RijksmuseumScraper": "artscraper.rijksmuseum",
+    "ArticScraper": "artscraper.artic",
+    "SmithsonianScraper": "artscraper.smithsonian",
+    "MetMuseumScraper": "artscraper.met",
+    "ScraperRouter": "artscraper.router",
+    "scrape": "artscraper.router",
+}
+
+__all__ = [
+    "GoogleArtScraper",
+    "WikiArtScraper",
+    "PhiladelphiaMuseumScraper",
+    "GettyScraper",
+    "RijksmuseumScraper",
+    "ArticScraper",
+    "SmithsonianScraper",
+    "MetMuseumScraper",
+    "ScraperRouter",
+    "scrape",
+]
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,7 @@
+"""Run the ArtScraper command line interface with python -m artscraper."""
+
+import sys
+
+from artscraper.cli import main
+
+sys.exit(main())
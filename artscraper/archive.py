@@ -0,0 +1,154 @@
+"""Archive of the raw responses that metadata was extracted from.
+
+In record mode (a scraper with an archive), the raw inputs of the metadata
+parser of each artwork, the page source and/or the API response, are
+stored compressed in a SQLite file. When a parser changes, the metadata can
+then be extracted again from the archive with replay, in a pool of worker
+processes, without a browser or any network requests.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from itertools import islice
+
+from artscraper.router import ScrapeResult
+from artscraper.sources import source_of
+
+
+class ResponseArchive():
+    """Compressed store of raw responses, keyed on the artwork link.
+
+    Parameters
+    ----------
+    archive_fp: str or Path
+        SQLite file to store the responses in; created if needed.
+    level: int, default=6
+        Compression level of zlib.
+    """
+
+    def __init__(self, archive_fp, level=6):
+        self.archive_fp = archive_fp
+        self.level = level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(archive_fp), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (link TEXT PRIMARY KEY, "
+                "source TEXT, data BLOB, recorded REAL)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def record(self, link, sources):
+        """Store the raw responses of an artwork, replacing older ones.
+
+        Parameters
+        ----------
+        link: str
+            Url of the artwork.
+        sources: dict
+            Name ("page", "api") -> raw response text, as passed to the
+            parse_metadata function of the scraper module.
+        """
+        data = zlib.compress(json.dumps(sources).encode("utf-8"), self.level)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (link, source_of(link), data, time.time()))
+
+    def load(self, link):
+        """Load the raw responses of an artwork.
+
+        Returns
+        -------
+        dict or None:
+            The stored responses, or None if the link is not archived.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM responses WHERE link = ?", (link,)).fetchone()
+        if row is None:
+            return None
+        return _decompress(row[0])
+
+    def sources(self):
+        """list of str: The sources of the archived artworks."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT source FROM responses ORDER BY source")]
+
+    def rows(self, source=None):
+        """Iterate over (link, source, compressed data) of all artworks."""
+        query = "SELECT link, source, data FROM responses"
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+        cursor = self._conn.cursor()
+        cursor.execute(query + " ORDER BY link", params)
+        yield from cursor
+
+    def items(self, source=None):
+        """Iterate over (link, source, responses) of all artworks."""
+        for link, row_source, data in self.rows(source):
+            yield link, row_source, _decompress(data)
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+def _decompress(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _parse_row(row):
+    """Extract the metadata of one archived artwork, in a worker process."""
+    link, source, data = row
+    try:
+        parse_metadata = import_module(f"artscraper.{source}").parse_metadata
+        metadata = parse_metadata(_decompress(data), link)
+        metadata["link"] = link
+    except Exception as error:  # pylint: disable=broad-except
+        return ScrapeResult(link, source, None, repr(error))
+    return ScrapeResult(link, source, metadata, None)
+
+
+def replay(archive, source=None, processes=None, chunk_size=256):
+    """Extract metadata again from an archive with the current parsers.
+
+    Parameters
+    ----------
+    archive: ResponseArchive or str or Path
+        The archive, or the file it is stored in.
+    source: str, optional
+        Only replay the artworks of this source.
+    processes: int, optional
+        Number of worker processes, by default the number of CPUs.
+    chunk_size: int, default=256
+        Number of artworks sent to a worker at once.
+
+    Yields
+    ------
+    ScrapeResult:
+        One result per archived artwork, in the order of their links.
+        Errors are stored in the error field as a string.
+    """
+    if not isinstance(archive, ResponseArchive):
+        archive = ResponseArchive(archive)
+    rows = archive.rows(source)
+    with ProcessPoolExecutor(processes) as executor:
+        # Submit in bounded batches, so that a large archive is not loaded
+        # into memory at once.
+        while True:
+            batch = list(islice(rows, chunk_size * 16))
+            if not batch:
+                break
+            yield from executor.map(_parse_row, batch, chunksize=chunk_size)
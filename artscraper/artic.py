@@ -2,16 +2,58 @@
 
 import json
 from pathlib import Path
-from urllib.parse import urlparse
-from urllib.request import urlopen
 
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 
-from artscraper.base import BaseArtScraper
+from artscraper.bandwidth import IMAGE
+from artscraper.browser import BrowserScraper
+from artscraper.canonical import object_dir
+from artscraper.tracing import traced
 
 
-class ArticScraper(BaseArtScraper):
+def parse_metadata(sources, link):  # pylint: disable=unused-argument
+    """Extract the metadata of an artwork from its API response.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the JSON metadata under "api".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    return json.loads(sources["api"])
+
+
+def iiif_image_url(metadata, width=843):
+    """Get the url of the image of an artwork on the IIIF image server.
+
+    Parameters
+    ----------
+    metadata: dict
+        API response (or ingested record) of the artwork.
+    width: int, default=843
+        Width of the image in pixels; 843 is the largest size the Art
+        Institute recommends.
+
+    Returns
+    -------
+    str or None:
+        The url of the PNG image, or None if the artwork has no image.
+    """
+    image_id = metadata.get("data", {}).get("image_id")
+    iiif_url = metadata.get("config", {}).get("iiif_url")
+    if not image_id or not iiif_url:
+        return None
+    return f"{iiif_url}/{image_id}/full/{width},/0/default.png"
+
+
+class ArticScraper(BrowserScraper):
     """Class for scraping Artic images.
 
     Parameters
@@ -26,13 +68,14 @@ class ArticScraper(BaseArtScraper):
         is randomly drawn from a polynomial distribution.
     """
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5, driver_options=None):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
-        self.driver = webdriver.Firefox(options=driver_options)
+    parse_metadata = staticmethod(parse_metadata)
 
-    def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.close()
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5,
+                 driver_options=None, **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait,
+                         driver_options=driver_options, **kwargs)
 
+    @traced()
     def load_link(self, link):
         if link == self.link:
             return False
@@ -45,14 +88,13 @@ class ArticScraper(BaseArtScraper):
                 return False
             self.paint_dir.mkdir(exist_ok=True, parents=True)
 
-        self.wait(self.min_wait)
-        self.driver.get(link)
+        # Stored metadata has the image id, so the page is rarely needed.
+        self._load_page(link, postpone=self._has_stored_metadata())
         return True
 
     @property
     def paint_dir(self):
-        paint_id = "_".join(urlparse(self.link).path.split("/")[-2:])
-        return Path(self.output_dir, paint_id)
+        return Path(self.output_dir, object_dir(self.link))
 
     def get_main_text(self):
         """Get the main text for the artwork.
@@ -71,19 +113,31 @@ class ArticScraper(BaseArtScraper):
                 metadata = json.load(f)
             return metadata
 
+        metadata = self._stored_metadata()
+        if metadata is not None:
+            return metadata
+
+        self._ensure_page()
         self.wait(self.min_wait, update=False)
         elem = self.driver.find_element('id', 'dl-artwork-details')
         rows = elem.find_elements('css selector', 'dd')
         # Select last element in rows to extract the .json link
         link = rows[-1].find_element('class name', 'f-secondary').get_attribute('innerHTML')
 
-        with urlopen(link) as url:
-            metadata = json.load(url)
-
-        return metadata
+        return self._parse_sources({"api": self.transport.get(link).text})
 
     def get_image(self):
-        """Get a binary PNG image in memory."""
+        """Get a binary PNG image in memory.
+
+        The image is downloaded from the IIIF image server if the metadata
+        has its id; otherwise a screenshot of the zoomed image is taken.
+        """
+        img_url = iiif_image_url(self.get_metadata())
+        if img_url is not None:
+            self.wait(self.min_wait)
+            return self.transport.get(img_url, priority=IMAGE).content
+
+        self._ensure_page()
         self.wait(self.min_wait)
         # Select relevant element
         ul = self.driver.find_element('class name', 'm-article-header__img-actions')
@@ -101,6 +155,7 @@ class ArticScraper(BaseArtScraper):
         self.driver.find_element("xpath", "/html/body").send_keys(Keys.ESCAPE)
         return img
 
+    @traced()
     def save_image(self, img_fp=None, link=None):
         """Save the artwork image to a file.
 
@@ -118,10 +173,6 @@ class ArticScraper(BaseArtScraper):
 
         img_fp = self._convert_img_fp(img_fp, suffix=".png")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
-
-    def close(self):
-        self.driver.close()
+        self._write_image(img_fp, self.get_image())
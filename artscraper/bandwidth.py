@@ -0,0 +1,165 @@
+"""Limits on the bandwidth used for downloads.
+
+Request rate limits do not bound the number of bytes: a few concurrent
+image downloads can saturate a shared uplink. A BandwidthLimiter holds a
+token bucket for all downloads together and optionally one per host. The
+Transport reads response bodies in chunks and charges every chunk to the
+buckets; image downloads wait while a bucket is empty, so that the
+average rate stays below the cap. Metadata is never delayed, but its bytes
+are charged as well, so that it takes priority over images.
+
+By default the buckets are kept in memory and shared by all threads of
+the process. With a state file, the buckets are kept in SQLite and shared
+by all processes that use the same file, e.g. several crawls on one node.
+"""
+
+import sqlite3
+import threading
+import time
+
+from artscraper.ratecontrol import rate_host
+
+# Priority of the requests that are delayed when the budget is used up.
+IMAGE = "image"
+# Priority of the requests that are only charged.
+METADATA = "metadata"
+
+# Size of the chunks in which limited response bodies are read.
+CHUNK_SIZE = 64 * 1024
+
+GLOBAL_BUCKET = "*"
+
+
+class BandwidthLimiter():
+    """Token buckets for the bytes downloaded, globally and per host.
+
+    Parameters
+    ----------
+    max_rate: float, optional
+        Maximum bytes per second for all hosts together.
+    host_rates: dict, optional
+        Host -> maximum bytes per second. A domain (e.g. "wikiart.org")
+        also limits its subdomains; each host counts against the most
+        specific entry.
+    burst: float, default=1
+        Size of the buckets in seconds of their rate: after an idle period,
+        this many seconds worth of bytes can be downloaded at full speed.
+    state_fp: str or Path, optional
+        SQLite file to keep the buckets in, to share them between processes.
+    """
+
+    def __init__(self, max_rate=None, host_rates=None, burst=1, state_fp=None):
+        self.rates = dict(host_rates or {})
+        if max_rate is not None:
+            self.rates[GLOBAL_BUCKET] = max_rate
+        self.burst = burst
+        self.bytes = {IMAGE: 0, METADATA: 0}
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._conn = None
+        if state_fp is not None:
+            self._conn = sqlite3.connect(str(state_fp), timeout=60,
+                                         check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, "
+                "tokens REAL, updated REAL)")
+
+    def _names(self, url):
+        names = [GLOBAL_BUCKET] if GLOBAL_BUCKET in self.rates else []
+        host = rate_host(url) or ""
+        while host:
+            if host in self.rates:
+                names.append(host)
+                break
+            _, _, host = host.partition(".")
+        return names
+
+    def _refill(self, name, tokens, updated, now):
+        rate = self.rates[name]
+        return min(rate * self.burst, tokens + (now - updated) * rate)
+
+    def _take(self, buckets, names, n_bytes, wait, now):
+        """Take bytes from the buckets, unless an image has to wait.
+
+        Buckets can go into debt, so that a chunk larger than a bucket is
+        never blocked forever; the debt delays the following images.
+
+        Returns
+        -------
+        float:
+            Seconds to wait before trying again, 0 if the bytes were taken.
+        """
+        tokens = {}
+        for name in names:
+            bucket_tokens, updated = buckets.get(
+                name, (self.rates[name] * self.burst, now))
+            tokens[name] = self._refill(name, bucket_tokens, updated, now)
+        if wait:
+            delay = max([-tokens[name] / self.rates[name] for name in names
+                         if tokens[name] < 0] or [0])
+            if delay > 0:
+                return delay
+        for name in names:
+            buckets[name] = (tokens[name] - n_bytes, now)
+        return 0
+
+    def _take_shared(self, names, n_bytes, wait):
+        """Take bytes from the buckets in the state file."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                placeholders = ", ".join("?" * len(names))
+                buckets = {name: (tokens, updated) for name, tokens, updated
+                           in self._conn.execute(
+                               "SELECT name, tokens, updated FROM buckets "
+                               f"WHERE name IN ({placeholders})", names)}
+                delay = self._take(buckets, names, n_bytes, wait, time.time())
+                if delay == 0:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                        [(name, *buckets[name]) for name in names])
+            finally:
+                self._conn.execute("COMMIT")
+        return delay
+
+    def consume(self, url, n_bytes, priority=IMAGE):
+        """Charge downloaded bytes, waiting first if the budget is used up.
+
+        Parameters
+        ----------
+        url: str
+            Url the bytes were downloaded from.
+        n_bytes: int
+            Number of bytes.
+        priority: str, default="image"
+            With "image", wait until the buckets have tokens again. With
+            "metadata", only charge the bytes.
+        """
+        names = self._names(url)
+        wait = priority != METADATA
+        while names:
+            if self._conn is not None:
+                delay = self._take_shared(names, n_bytes, wait)
+            else:
+                with self._lock:
+                    delay = self._take(self._buckets, names, n_bytes, wait,
+                                       time.time())
+            if delay == 0:
+                break
+            time.sleep(delay)
+            with self._lock:
+                self.waited += delay
+        with self._lock:
+            self.bytes[priority] = self.bytes.get(priority, 0) + n_bytes
+
+    def metrics(self):
+        """dict: Bytes downloaded per priority and seconds spent waiting."""
+        with self._lock:
+            return {"bytes": dict(self.bytes), "waited": round(self.waited, 3)}
+
+    def close(self):
+        """Close the state file, if any."""
+        if self._conn is not None:
+            self._conn.close()
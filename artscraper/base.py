@@ -5,13 +5,21 @@ BaseArtScraper.
 """
 
 import json
+import os
 from abc import ABC
 from abc import abstractmethod
-from pathlib import Path
-from artscraper.utils import random_wait_time
 import time
+from pathlib import Path
 from time import sleep
 
+from artscraper.bandwidth import IMAGE
+from artscraper.deadline import LinkTimeout
+from artscraper.deadline import remaining
+from artscraper.tracing import span
+from artscraper.tracing import traced
+from artscraper.transport import Transport
+from artscraper.utils import random_wait_time
+
 class BaseArtScraper(ABC):
     """Base class for ArtScrapers.
 
@@ -26,13 +34,62 @@ class BaseArtScraper(ABC):
         If true, skip downloading any existing images.
     min_wait: float
         To avoid going over rate limits, this can be set a floating point
-        number, which sets the minimum time between requests.
+        number, which sets the minimum time between requests. If the
+        transport has a rate controller, this is only the starting value,
+        which the controller adjusts to the responses of the host.
+    image_pipeline: artscraper.postprocess.ImagePipeline, optional
+        If given, every saved image is submitted to this pipeline to
+        create derivatives (thumbnails, other formats) in the background.
+    hash_index: artscraper.dedup.HashIndex, optional
+        If given, the perceptual hash of each saved image is added to this
+        index. Where the source offers a thumbnail, it is checked against
+        the index first and images that were already downloaded (possibly
+        from another source) are skipped.
+    transport: artscraper.transport.Transport, optional
+        Transport for HTTP requests, which can be shared between scrapers,
+        e.g. to use one HTTP cache. By default a new transport is created.
+    integrity_index: artscraper.integrity.IntegrityIndex, optional
+        If given, the size and hash of each saved image are recorded, and
+        skip_existing only skips images that were saved completely.
+    max_size: int, optional
+        Default maximum width/height in pixels for save_image. Scrapers that
+        download images request the smallest size offered by the source that
+        is at least this large; screenshot based scrapers ignore it.
+    archive: artscraper.archive.ResponseArchive, optional
+        If given, the raw page source and API responses that the metadata
+        is extracted from are recorded in this archive, so that the
+        metadata can be extracted again later without a crawl.
+    writer: artscraper.writer.AsyncWriter, optional
+        If given, images and metadata are written on the background threads
+        of this writer instead of on the scraping thread.
+    metadata_store: artscraper.ingest.MetadataStore, optional
+        If given, scrapers that support it (Met, Art Institute) take the
+        metadata of artworks in this store from it instead of requesting it.
+    request_clock: artscraper.ratecontrol.RequestClock, optional
+        Shared time of the last request to each host. Give scrapers on
+        parallel threads the same clock, so that together they keep to
+        min_wait instead of each on their own.
     """
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=None):
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=None,
+                 image_pipeline=None, hash_index=None, transport=None,
+                 integrity_index=None, max_size=None, archive=None,
+                 writer=None, metadata_store=None, request_clock=None):
         self.skip_existing = skip_existing
         self.output_dir = output_dir
-        self.last_request = time.time() - 100
+        self.image_pipeline = image_pipeline
+        self.hash_index = hash_index
+        self.transport = transport if transport is not None else Transport()
+        self.integrity_index = integrity_index
+        self.max_size = max_size
+        self.archive = archive
+        self.writer = writer
+        self.metadata_store = metadata_store
+        self.request_clock = request_clock
+        self.bytes_saved = 0
+        self._last_request = time.time() - 100
+        # Waiting time before the next request, drawn in advance by ready_at.
+        self._next_wait = None
 
         # Cache of metadata, in case it is needed more than once/later.
         self._meta_store = {"link": "", "data": {}}
@@ -45,6 +102,57 @@ class BaseArtScraper(ABC):
     def __exit__(self, _exc_type, _exc_val, _exc_tb):
         pass
 
+    @property
+    def min_wait(self):
+        """float: Minimum time between requests in seconds."""
+        controller = self.transport.rate_controller
+        if controller is None or not self._min_wait:
+            return self._min_wait
+        return controller.interval(self.link, self._min_wait)
+
+    @min_wait.setter
+    def min_wait(self, min_wait):
+        self._min_wait = min_wait
+
+    @property
+    def last_request(self):
+        """float: Time of the last request, to the host of the current link
+        if there is a request clock."""
+        if self.request_clock is None:
+            return self._last_request
+        return self.request_clock.last_request(self.link)
+
+    @last_request.setter
+    def last_request(self, request_time):
+        if self.request_clock is None:
+            self._last_request = request_time
+        else:
+            self.request_clock.update(self.link, request_time)
+
+    def _start_time(self, wait_time, update=True):
+        """Time at which the next request may be made.
+
+        Parameters
+        ----------
+        wait_time: float
+            Minimum time after the last request in seconds.
+        update: bool, default=True
+            If true and there is a request clock, reserve the time on the
+            clock, so that scrapers on other threads wait for this request.
+        """
+        blocked_until = self._blocked_until()
+        if update and self.request_clock is not None:
+            return self.request_clock.reserve(self.link, wait_time,
+                                              blocked_until)
+        return max(time.time(), self.last_request + wait_time, blocked_until)
+
+    def _blocked_until(self):
+        """Time until which the host asked not to be sent requests."""
+        controller = self.transport.rate_controller
+        if controller is None:
+            return 0
+        return controller.blocked_until(self.link)
+
     def wait(self, min_wait, max_wait=None, update=True):
         """Wait until we are allowed to perform our next action.
 
@@ -57,14 +165,46 @@ class BaseArtScraper(ABC):
             3 times the minimum waiting time.
         update: bool, default=True
             If true, reset the timer.
+
+        Raises
+        ------
+        LinkTimeout:
+            If the wait would end after the deadline of the current link.
         """
-        time_elapsed = time.time() - self.last_request
-        wait_time = random_wait_time(min_wait, max_wait) - time_elapsed
+        if (update and self._next_wait is not None and max_wait is None
+                and min_wait == self.min_wait):
+            wait_time = self._next_wait
+            self._next_wait = None
+        else:
+            wait_time = random_wait_time(min_wait, max_wait)
+        wait_time = self._start_time(wait_time, update) - time.time()
+        time_left = remaining()
+        if time_left is not None and wait_time > time_left:
+            raise LinkTimeout(f"Waiting {wait_time:.1f} s for the rate limit "
+                              "would exceed the time budget of the link.")
         if wait_time > 0:
             sleep(wait_time)
-        if update:
+        if update and self.request_clock is None:
             self.last_request = time.time()
 
+    def ready_at(self):
+        """Earliest time at which the rate limit allows the next request.
+
+        The random waiting time for the next request is drawn in advance,
+        so that the next call to wait(self.min_wait) ends at this time.
+
+        Returns
+        -------
+        float:
+            Time in seconds since the epoch, as returned by time.time().
+        """
+        if self.last_request is None or not self.min_wait:
+            return self._blocked_until()
+        if self._next_wait is None:
+            self._next_wait = random_wait_time(self.min_wait)
+        return max(self.last_request + self._next_wait, self._blocked_until())
+
+    @traced()
     def load_link(self, link):
         """Load an url / webpage.
 
@@ -75,6 +215,25 @@ class BaseArtScraper(ABC):
         """
         self.link = link
 
+    def abort(self):
+        """Make a blocked operation of the scraper fail, from another thread.
+
+        Called by the watchdog when the time budget of a link runs out (see
+        artscraper.deadline). Downloads that are still running are cut
+        off, and the transport starts over with a new session.
+        """
+        self.transport.abort_overdue()
+
+    def prefetch(self, link):  # pylint: disable=unused-argument
+        """Start loading the next link in the background, if supported.
+
+        Returns
+        -------
+        bool:
+            True if the link is being prefetched.
+        """
+        return False
+
     @property
     @abstractmethod
     def paint_dir(self):
@@ -84,6 +243,49 @@ class BaseArtScraper(ABC):
     def _get_metadata(self):
         raise NotImplementedError
 
+    @staticmethod
+    def parse_metadata(sources, link):
+        """Extract the metadata of an artwork from its raw responses.
+
+        This does not use the network or a browser, so that archived
+        responses can be parsed again (see artscraper.archive).
+
+        Parameters
+        ----------
+        sources: dict
+            Name ("page" for the page source, "api" for an API response)
+            -> raw response text.
+        link: str
+            Url of the artwork.
+
+        Returns
+        -------
+        dict:
+            The metadata of the artwork.
+        """
+        raise NotImplementedError
+
+    def _parse_sources(self, sources):
+        """Parse the raw responses of the current artwork and record them.
+
+        Responses are only archived if they could be parsed, so that e.g.
+        a static page without the metadata never replaces the rendered one.
+        """
+        metadata = self.parse_metadata(sources, self.link)
+        if self.archive is not None:
+            self.archive.record(self.link, sources)
+        return metadata
+
+    def _stored_metadata(self):
+        """Metadata of the current artwork from the metadata store, if any."""
+        if self.metadata_store is None:
+            return None
+        return self.metadata_store.load(self.link)
+
+    def _has_stored_metadata(self):
+        """Whether the current artwork is in the metadata store."""
+        return self.metadata_store is not None and self.link in self.metadata_store
+
     @property
     def meta_fp(self):
         """pathlib.Path: Path to metadata file for current artwork."""
@@ -107,6 +309,92 @@ class BaseArtScraper(ABC):
             img_fp = Path(img_fp)
         return img_fp
 
+    def _image_exists(self, img_fp):
+        """Check whether an image has already been saved.
+
+        With an integrity index, partially written images do not count.
+        Images whose original was removed by the image pipeline count as
+        saved if all their derivatives are present.
+        """
+        if self.integrity_index is not None:
+            if self.integrity_index.is_complete(img_fp):
+                return True
+        elif Path(img_fp).is_file():
+            return True
+        return (self.image_pipeline is not None
+                and self.image_pipeline.remove_original
+                and self.image_pipeline.outputs_exist(img_fp))
+
+    def _write_image(self, img_fp, img_data, headers=None):
+        """Write image data to a file and run any post-save stages.
+
+        The data is first written to a temporary file, which is renamed
+        when complete, so that a crash never leaves a partial image. With a
+        writer, the file is written in the background; the integrity index
+        and the image pipeline get the image once it is on disk.
+
+        Arguments
+        ---------
+        img_fp: Path
+            File to write the image to.
+        img_data: bytes
+            Binary image data.
+        headers: dict, optional
+            Headers of the image download, for the integrity index.
+        """
+        link = self.link
+
+        def saved(img_fp):
+            # Only record the image once it is on disk.
+            index = self.integrity_index
+            if index is not None:
+                index.record(img_fp, img_data, link, headers)
+            pipeline = self.image_pipeline
+            if pipeline is None:
+                return
+            future = pipeline.submit(img_fp)
+            if index is not None and pipeline.remove_original:
+                # verify should not report the removed original as missing.
+                def processed(future):
+                    if future.exception() is None:
+                        index.record_removal(img_fp)
+                future.add_done_callback(processed)
+
+        if self.writer is not None:
+            self.writer.write(img_fp, img_data, saved)
+        else:
+            tmp_fp = Path(img_fp).with_name(Path(img_fp).name + ".part")
+            with open(tmp_fp, "wb") as f:  # pylint: disable=invalid-name
+                f.write(img_data)
+            os.replace(tmp_fp, img_fp)
+            saved(img_fp)
+        self.bytes_saved += len(img_data)
+        if self.hash_index is not None:
+            self.hash_index.add_image(self.link, img_data)
+
+    def _is_duplicate(self, thumbnail_url):
+        """Check the thumbnail of the current image against the hash index.
+
+        Parameters
+        ----------
+        thumbnail_url: callable
+            Returns the url of a small version of the current image, or
+            None if there is none. Only called with a hash index.
+
+        Returns
+        -------
+        bool:
+            True if the artwork is a (near) duplicate of an image that was
+            already saved. The pair is recorded in the hash index.
+        """
+        if self.hash_index is None:
+            return False
+        url = thumbnail_url()
+        if not url:
+            return False
+        thumbnail = self.transport.get(url, priority=IMAGE).content
+        return self.hash_index.find_duplicate(self.link, thumbnail) is not None
+
     def get_metadata(self, link=None, **kwargs):
         """Obtain metadata from an url.
 
@@ -139,7 +427,8 @@ class BaseArtScraper(ABC):
         if self.link == self._meta_store["link"]:
             metadata = self._meta_store["data"]
         else:
-            metadata = self._get_metadata()
+            with span("_get_metadata", url=self.link):
+                metadata = self._get_metadata()
             metadata["link"] = self.link
             self._meta_store = {
                 "link": self.link,
@@ -163,6 +452,9 @@ class BaseArtScraper(ABC):
         if meta_fp.is_file():
             return
         metadata = self.get_metadata()
+        if self.writer is not None:
+            self.writer.write_json(meta_fp, metadata)
+            return
         self.paint_dir.mkdir(exist_ok=True)
         with open(meta_fp, "w", encoding="utf-8") as f:  # pylint: disable=invalid-name
             json.dump(metadata, f)
@@ -0,0 +1,298 @@
+"""Offline benchmarks of the metadata extractors.
+
+The corpus is a ResponseArchive (see artscraper.archive) with the raw
+responses of real artworks, recorded with a crawl, or a directory with one
+sub directory per artwork. export_corpus copies a small sample of each
+source from a large archive, so that the same corpus can be reused to
+compare parser versions. The repository has a small synthetic corpus
+directory in benchmarks/smoke, which checks that the extractors work but
+is not representative for timings. benchmark_extractors runs every
+extractor of each source on the corpus, without network or browser, and
+measures the CPU time and memory allocations per page, optionally for
+several BeautifulSoup tree builders (html.parser, lxml) to compare them.
+
+check_import guards the lazy imports of the package: it imports
+artscraper in a fresh interpreter and reports the time it took and which
+heavy dependencies were loaded, which should be none.
+"""
+
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from importlib import import_module
+from itertools import islice
+from pathlib import Path
+
+from artscraper import parsing
+from artscraper.archive import ResponseArchive
+
+# Extractors besides parse_metadata: source -> list of (function name in
+# the scraper module, name of the raw response it takes).
+EXTRA_EXTRACTORS = {
+    "wikiart": [("find_painting_id", "page")],
+    "smithsonian": [("find_media_id", "page")],
+    "getty": [("find_manifest_link", "page")],
+}
+
+# Dependencies that importing artscraper must not load.
+HEAVY_MODULES = ["selenium", "requests", "bs4", "numpy", "PIL"]
+
+BenchmarkResult = namedtuple(
+    "BenchmarkResult",
+    ["source", "extractor", "parser", "pages", "errors", "cpu_mean",
+     "cpu_median", "cpu_max", "alloc_mean", "alloc_peak"])
+
+
+def _iter_corpus_dir(corpus_dir, source):
+    """Iterate over (link, responses) of a corpus directory.
+
+    Each artwork is a directory <source>/<name> with its link in link.txt
+    and each raw response in a file named after it (page.html, api.json).
+    """
+    for artwork_dir in sorted(Path(corpus_dir, source).iterdir()):
+        if not artwork_dir.is_dir():
+            continue
+        responses = {}
+        for response_fp in sorted(artwork_dir.iterdir()):
+            if response_fp.name != "link.txt":
+                responses[response_fp.stem] = response_fp.read_text(
+                    encoding="utf-8")
+        link = Path(artwork_dir, "link.txt").read_text(encoding="utf-8")
+        yield link.strip(), responses
+
+
+def _write_corpus_dir(corpus_dir, source, items):
+    """Write artworks to a corpus directory, see _iter_corpus_dir."""
+    for i_item, (link, responses) in enumerate(items):
+        artwork_dir = Path(corpus_dir, source, f"{i_item:03d}")
+        artwork_dir.mkdir(parents=True, exist_ok=True)
+        Path(artwork_dir, "link.txt").write_text(link + "\n", encoding="utf-8")
+        for name, text in responses.items():
+            suffix = ".json" if text.lstrip()[:1] in ("{", "[") else ".html"
+            Path(artwork_dir, name + suffix).write_text(text, encoding="utf-8")
+
+
+def load_corpus(archive, per_source=None, source=None):
+    """Load archived responses, grouped by source.
+
+    Parameters
+    ----------
+    archive: ResponseArchive or str or Path
+        The corpus: an archive, or a corpus directory.
+    per_source: int, optional
+        Maximum number of artworks per source, by default all.
+    source: str, optional
+        Only load this source.
+
+    Returns
+    -------
+    dict:
+        Source name -> list of (link, responses).
+    """
+    if not isinstance(archive, ResponseArchive) and Path(archive).is_dir():
+        sources = [source] if source is not None else sorted(
+            source_dir.name for source_dir in Path(archive).iterdir()
+            if source_dir.is_dir())
+        return {name: list(islice(_iter_corpus_dir(archive, name), per_source))
+                for name in sources}
+
+    if not isinstance(archive, ResponseArchive):
+        archive = ResponseArchive(archive)
+    sources = [source] if source is not None else archive.sources()
+    corpus = {}
+    for name in sources:
+        items = islice(archive.items(name), per_source)
+        corpus[name] = [(link, responses) for link, _, responses in items]
+    return corpus
+
+
+def export_corpus(archive, corpus_fp, per_source=20):
+    """Copy a sample of each source from an archive into a corpus.
+
+    Parameters
+    ----------
+    archive: ResponseArchive or str or Path
+        Archive (or corpus directory) to take the sample from.
+    corpus_fp: str or Path
+        New corpus: an archive file, or a directory if it has no suffix.
+    per_source: int, default=20
+        Number of artworks per source.
+
+    Returns
+    -------
+    dict:
+        Source name -> number of artworks in the corpus.
+    """
+    sample = load_corpus(archive, per_source)
+    if not Path(corpus_fp).suffix:
+        for source, items in sample.items():
+            _write_corpus_dir(corpus_fp, source, items)
+        return {source: len(items) for source, items in sample.items()}
+
+    corpus = ResponseArchive(corpus_fp)
+    counts = {}
+    for source, items in sample.items():
+        for link, responses in items:
+            corpus.record(link, responses)
+        counts[source] = len(items)
+    corpus.close()
+    return counts
+
+
+def _extractors(source):
+    """List of (name, function(responses, link), required response)."""
+    module = import_module(f"artscraper.{source}")
+    extractors = [("parse_metadata", module.parse_metadata, None)]
+    for name, response_name in EXTRA_EXTRACTORS.get(source, []):
+        function = getattr(module, name)
+        extractors.append((name, lambda responses, link, function=function,
+                           response_name=response_name:
+                           function(responses[response_name]),
+                           response_name))
+    return extractors
+
+
+def _time_extractor(extractor, items, repeat):
+    """CPU time in seconds of each page (best of repeat) and error count."""
+    cpu_times = []
+    errors = 0
+    for link, responses in items:
+        best = None
+        for _ in range(repeat):
+            start = time.process_time()
+            try:
+                extractor(responses, link)
+            except Exception:  # pylint: disable=broad-except
+                errors += 1
+                break
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if best is not None:
+            cpu_times.append(best)
+    return cpu_times, errors
+
+
+def _allocations(extractor, items):
+    """Peak allocated bytes while extracting each page."""
+    peaks = []
+    for link, responses in items:
+        tracemalloc.start()
+        try:
+            extractor(responses, link)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        except Exception:  # pylint: disable=broad-except
+            pass
+        finally:
+            tracemalloc.stop()
+    return peaks
+
+
+def benchmark_extractors(corpus, repeat=3, parsers=None):
+    """Time the extractors of every source on a corpus.
+
+    CPU time and allocations are measured in separate passes, since
+    tracing allocations slows the code down.
+
+    Parameters
+    ----------
+    corpus: dict
+        Source name -> list of (link, responses), see load_corpus.
+    repeat: int, default=3
+        Number of runs per page; the fastest is used.
+    parsers: list of str, optional
+        BeautifulSoup tree builders to run the extractors with, e.g.
+        ["html.parser", "lxml"]. By default the one make_soup uses.
+
+    Returns
+    -------
+    list of BenchmarkResult:
+        One result per extractor and parser, with times in seconds per page
+        and allocations in bytes per page.
+    """
+    default_parser = parsing.PARSER_FEATURES
+    results = []
+    try:
+        for parser in parsers or [default_parser]:
+            parsing.PARSER_FEATURES = parser
+            results.extend(_benchmark_parser(corpus, repeat, parser))
+    finally:
+        parsing.PARSER_FEATURES = default_parser
+    return results
+
+
+def _benchmark_parser(corpus, repeat, parser):
+    results = []
+    for source, items in corpus.items():
+        for name, extractor, required in _extractors(source):
+            # Skip artworks for which the response was not archived.
+            usable = [(link, responses) for link, responses in items
+                      if required is None or required in responses]
+            if not usable:
+                continue
+            cpu_times, errors = _time_extractor(extractor, usable, repeat)
+            peaks = _allocations(extractor, usable)
+            results.append(BenchmarkResult(
+                source, name, parser, len(usable), errors,
+                statistics.mean(cpu_times) if cpu_times else None,
+                statistics.median(cpu_times) if cpu_times else None,
+                max(cpu_times) if cpu_times else None,
+                statistics.mean(peaks) if peaks else None,
+                max(peaks) if peaks else None))
+    return results
+
+
+def check_import(modules=None):
+    """Import artscraper in a new interpreter and check what it loads.
+
+    Parameters
+    ----------
+    modules: list of str, optional
+        Top-level modules that must not be loaded, by default HEAVY_MODULES.
+
+    Returns
+    -------
+    (float, list of str):
+        Cumulative import time of artscraper in seconds, and the modules
+        of the list that were loaded.
+    """
+    if modules is None:
+        modules = HEAVY_MODULES
+    code = ("import sys, artscraper; "
+            "print(' '.join(sorted({name.partition('.')[0] "
+            "for name in sys.modules})))")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                             capture_output=True, text=True, check=True)
+    loaded = set(process.stdout.split())
+    import_time = 0.0
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)artscraper$",
+                         line)
+        if match is not None and not match.group(2):
+            import_time = int(match.group(1)) / 1e6
+    return import_time, [module for module in modules if module in loaded]
+
+
+def format_results(results):
+    """Format benchmark results as a text table."""
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.2f}"
+
+    def kib(n_bytes):
+        return "-" if n_bytes is None else f"{n_bytes / 1024:.0f}"
+
+    lines = [f"{'source':<12} {'extractor':<17} {'parser':<11} {'pages':>6} "
+             f"{'errors':>6} {'ms mean':>8} {'ms med':>8} {'ms max':>8} "
+             f"{'KiB mean':>9} {'KiB max':>9}"]
+    for result in results:
+        lines.append(
+            f"{result.source:<12} {result.extractor:<17} {result.parser:<11} "
+            f"{result.pages:>6} "
+            f"{result.errors:>6} {ms(result.cpu_mean):>8} "
+            f"{ms(result.cpu_median):>8} {ms(result.cpu_max):>8} "
+            f"{kib(result.alloc_mean):>9} {kib(result.alloc_peak):>9}")
+    return "\n".join(lines)
@@ -0,0 +1,449 @@
+"""Base class for the scrapers that use a (Firefox) browser.
+
+BrowserScraper creates the selenium driver and manages its lifecycle: over
+a long crawl Firefox keeps growing, so the browser can be restarted after
+a number of pages or when its memory use passes a threshold, and it is
+shut down with quit, which also stops geckodriver. Browsers left behind by
+crashed runs can be cleaned up with reap_orphaned_browsers.
+
+The browser is only started when it is first needed. In static metadata
+mode, scrapers whose metadata is in the server-rendered HTML (Philadelphia,
+Getty, Google Arts & Culture, the Met) fetch the page over plain HTTP for the
+metadata, and only load it in the browser when parsing the static page
+fails or the image has to be screenshotted. Crawls of only metadata then
+run without a browser.
+
+The browser based scrapers can optionally prefetch: while the current
+artwork is being extracted and screenshotted, the page of the next artwork
+is already loading in a second tab. When the next link is loaded, the
+scraper switches to that tab instead of waiting for a new page load.
+"""
+
+import logging
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from artscraper.base import BaseArtScraper
+from artscraper.deadline import check_deadline
+from artscraper.tracing import span
+from artscraper.tracing import trace_driver
+
+# Check the memory use of the browser every this many pages.
+RSS_CHECK_INTERVAL = 10
+
+# Errors of the parsers when the static page lacks the (rendered) metadata.
+STATIC_PARSE_ERRORS = (ValueError, IndexError, KeyError)
+
+logger = logging.getLogger(__name__)
+
+
+def create_driver(geckodriver_path=None, options=None):
+    """Start a Firefox driver, with tracing of its commands.
+
+    Parameters
+    ----------
+    geckodriver_path: str, optional
+        Path to the geckodriver executable, by default found on the PATH.
+    options: selenium.webdriver.FirefoxOptions, optional
+        Options for Firefox, e.g. to run it headless.
+
+    Returns
+    -------
+    selenium.webdriver.Firefox:
+        The new driver.
+    """
+    kwargs = {}
+    if options is not None:
+        kwargs["options"] = options
+    if geckodriver_path is not None:
+        try:
+            from selenium.webdriver.firefox.service import Service  # pylint: disable=import-outside-toplevel
+            kwargs["service"] = Service(executable_path=geckodriver_path)
+        except ImportError:
+            # Selenium 3
+            kwargs["executable_path"] = geckodriver_path
+    return trace_driver(webdriver.Firefox(**kwargs))
+
+
+def _psutil():
+    try:
+        import psutil  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError("Monitoring browser processes requires psutil, "
+                          "install it with pip install artscraper[monitor]"
+                          ) from error
+    return psutil
+
+
+def browser_rss(driver):
+    """Memory used by geckodriver and all browser processes it started.
+
+    Returns
+    -------
+    int:
+        Total resident set size in bytes.
+    """
+    psutil = _psutil()
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return 0
+    total = 0
+    for child in processes:
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+def reap_orphaned_browsers(timeout=5):
+    """Stop geckodriver and Firefox processes left behind by crashed runs.
+
+    Only processes whose parent has exited are stopped, and for Firefox
+    only instances started by geckodriver (with the -marionette flag), so
+    that browsers of the user are left alone.
+
+    Parameters
+    ----------
+    timeout: float, default=5
+        Time to wait for the processes to terminate before killing them.
+
+    Returns
+    -------
+    int:
+        The number of processes that were stopped.
+    """
+    psutil = _psutil()
+    orphans = []
+    for process in psutil.process_iter(["name", "cmdline", "ppid"]):
+        name = (process.info["name"] or "").lower()
+        cmdline = process.info["cmdline"] or []
+        if process.info["ppid"] != 1:
+            continue
+        if name.startswith("geckodriver") or (
+                name.startswith("firefox") and "-marionette" in cmdline):
+            orphans.append(process)
+    for process in orphans:
+        try:
+            process.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(orphans, timeout=timeout)
+    for process in alive:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    return len(orphans)
+
+
+class TabPrefetcher():
+    """Load a page in a background tab of a selenium driver.
+
+    Parameters
+    ----------
+    driver: selenium.webdriver.remote.webdriver.WebDriver
+        Driver whose browser opens the tabs.
+    timeout: float, default=60
+        Maximum time in seconds to wait for a prefetched page to finish
+        loading when switching to it.
+    """
+
+    def __init__(self, driver, timeout=60):
+        self.driver = driver
+        self.timeout = timeout
+        self.link = None
+        self._handle = None
+
+    def prefetch(self, link):
+        """Start loading a link in a new tab, without waiting for it.
+
+        A previously prefetched tab that was not used is closed.
+        """
+        self.discard()
+        current = self.driver.current_window_handle
+        handles = set(self.driver.window_handles)
+        # Unlike driver.get, window.open returns before the page is loaded.
+        self.driver.execute_script("window.open(arguments[0], '_blank');", link)
+        # The browser focuses the new tab; the current page stays in front,
+        # so that screenshots and element lookups are not affected.
+        self.driver.switch_to.window(current)
+        new_handles = set(self.driver.window_handles) - handles
+        if len(new_handles) != 1:
+            return
+        self.link = link
+        self._handle = new_handles.pop()
+
+    def switch_to(self, link):
+        """Switch to the prefetched tab of a link, closing the current tab.
+
+        Returns
+        -------
+        bool:
+            True if the link was prefetched and is now the current page.
+        """
+        if self._handle is None or link != self.link:
+            return False
+        self.driver.close()
+        self.driver.switch_to.window(self._handle)
+        self.link = None
+        self._handle = None
+        start = time.time()
+        while (self.driver.execute_script("return document.readyState") != "complete"
+               and time.time() - start < self.timeout):
+            time.sleep(0.05)
+        return True
+
+    def discard(self):
+        """Close the prefetched tab, if any."""
+        if self._handle is None:
+            return
+        current = self.driver.current_window_handle
+        self.driver.switch_to.window(self._handle)
+        self.driver.close()
+        self.driver.switch_to.window(current)
+        self.link = None
+        self._handle = None
+
+
+class BrowserScraper(BaseArtScraper):  # pylint: disable=abstract-method
+    """Base class for scrapers that load artwork pages in a browser.
+
+    The driver is available as self.driver; derived classes load pages
+    with _get_page.
+
+    Parameters
+    ----------
+    geckodriver_path: str, optional
+        Path to the geckodriver executable.
+    driver_options: selenium.webdriver.FirefoxOptions, optional
+        Options for Firefox.
+    tab_prefetch: bool, default=False
+        If true, prefetch allows the next link to be loaded in a second tab
+        while the current one is processed.
+    recycle_pages: int, optional
+        Restart the browser after this many page loads.
+    max_rss: int, optional
+        Restart the browser when geckodriver and Firefox together use more
+        than this many bytes of memory. Requires psutil.
+    clear_state: bool, default=False
+        Delete cookies and web storage of the site before each page load.
+    static_metadata: bool, default=False
+        Read the metadata from the page fetched over HTTP, and only load
+        the page in the browser when that fails or the browser is needed
+        for the image. Ignored by scrapers that need the rendered page.
+    kwargs:
+        Arguments for BaseArtScraper.
+    """
+
+    def __init__(self, *args, geckodriver_path=None, driver_options=None,
+                 tab_prefetch=False, recycle_pages=None, max_rss=None,
+                 clear_state=False, static_metadata=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.geckodriver_path = geckodriver_path
+        self.driver_options = driver_options
+        self.tab_prefetch = tab_prefetch
+        self.recycle_pages = recycle_pages
+        self.max_rss = max_rss
+        if max_rss is not None:
+            _psutil()
+        self.clear_state = clear_state
+        self.static_metadata = static_metadata
+        self.pages_loaded = 0
+        self.restarts = 0
+        self._tabs = None
+        self._aborted = False
+        self._driver = None
+        # Link whose page load in the browser is postponed until needed.
+        self._pending_page = None
+
+    @property
+    def driver(self):
+        """selenium.webdriver.Firefox: The browser, started on first use."""
+        if self._driver is None:
+            self._driver = create_driver(self.geckodriver_path,
+                                         self.driver_options)
+        return self._driver
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def _quit_driver(self):
+        """Quit the browser and geckodriver, killing them if needed."""
+        if self._driver is None:
+            return
+        try:
+            self._driver.quit()
+        except Exception:  # pylint: disable=broad-except
+            # An aborted browser fails with connection errors instead.
+            try:
+                self._driver.service.stop()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        self._driver = None
+        self._tabs = None
+
+    def restart_driver(self):
+        """Replace the browser with a fresh instance."""
+        with span("restart_driver", pages=self.pages_loaded):
+            self._quit_driver()
+            self._driver = create_driver(self.geckodriver_path,
+                                         self.driver_options)
+        self.pages_loaded = 0
+        self.restarts += 1
+        self._aborted = False
+
+    def abort(self):
+        """Kill the browser, so that a hung WebDriver command fails.
+
+        The browser is replaced by a new one at the next page load. HTTP
+        downloads are aborted as for other scrapers.
+        """
+        super().abort()
+        driver = self._driver
+        if driver is None:
+            return
+        self._aborted = True
+        try:
+            psutil = _psutil()
+            process = psutil.Process(driver.service.process.pid)
+            for child in process.children(recursive=True):
+                child.kill()
+        except Exception:  # pylint: disable=broad-except
+            # Without psutil, stopping geckodriver ends the session.
+            pass
+        try:
+            driver.service.stop()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def _recycle_due(self):
+        """Check whether the browser should be restarted before a page load."""
+        if self._aborted:
+            return True
+        if self.recycle_pages is not None and self.pages_loaded >= self.recycle_pages:
+            return True
+        return (self.max_rss is not None and self.pages_loaded > 0
+                and self.pages_loaded % RSS_CHECK_INTERVAL == 0
+                and browser_rss(self.driver) > self.max_rss)
+
+    def _clear_state(self):
+        """Delete cookies and web storage of the current site."""
+        try:
+            self.driver.delete_all_cookies()
+            self.driver.execute_script(
+                "window.localStorage.clear(); window.sessionStorage.clear();")
+        except WebDriverException:
+            pass
+
+    @property
+    def tabs(self):
+        """TabPrefetcher or None: Prefetcher for the driver, if enabled."""
+        if self.tab_prefetch and self._tabs is None:
+            self._tabs = TabPrefetcher(self.driver)
+        return self._tabs
+
+    def _get_page(self, link):
+        """Wait for the rate limit and load a page in the browser.
+
+        If the link was prefetched, the rate limit was already observed when
+        the prefetch started, and the scraper switches to its tab.
+        """
+        self._pending_page = None
+        if (not self._aborted and self.tabs is not None
+                and self.tabs.switch_to(link)):
+            self.pages_loaded += 1
+            return
+        if self._recycle_due():
+            self.restart_driver()
+        elif self.clear_state and self.pages_loaded:
+            self._clear_state()
+        self.wait(self.min_wait)
+        check_deadline()
+        start = time.time()
+        self.driver.get(link)
+        if self.transport.rate_controller is not None:
+            # The browser does not expose the status code.
+            self.transport.rate_controller.observe(link, time.time() - start)
+        self.pages_loaded += 1
+
+    def _load_page(self, link, postpone=False):
+        """Load a page, or in static metadata mode postpone it until needed.
+
+        With postpone, e.g. when the metadata is in the metadata store, the
+        page load is postponed in any mode.
+        """
+        if self.static_metadata or postpone:
+            self._pending_page = link
+        else:
+            self._get_page(link)
+
+    def _ensure_page(self):
+        """Load the current link in the browser, if it was postponed."""
+        if self._pending_page is not None:
+            self._get_page(self._pending_page)
+
+    def _page_source(self):
+        """Source of the current page: the rendered page if it was loaded in
+        the browser, otherwise the page fetched over HTTP."""
+        if self._pending_page is not None:
+            return self._fetch_static()
+        return self.driver.page_source
+
+    def _fetch_static(self):
+        """Fetch the server-rendered page of the current link over HTTP."""
+        self.wait(self.min_wait)
+        return self.transport.get(self.link).text
+
+    def _parse_static(self, get_sources):
+        """Extract the metadata from the static page, if possible.
+
+        Parameters
+        ----------
+        get_sources: callable
+            Takes the static page source and returns the sources for
+            parse_metadata.
+
+        Returns
+        -------
+        dict or None:
+            The metadata, or None if the static page did not contain it and
+            the browser has to be used.
+        """
+        if not self.static_metadata:
+            return None
+        try:
+            return self._parse_sources(get_sources(self._fetch_static()))
+        except STATIC_PARSE_ERRORS as exc:
+            logger.info("Using the browser for %s, the static page could "
+                        "not be parsed: %r", self.link, exc)
+            return None
+
+    def prefetch(self, link):
+        """Start loading the next link in a background tab.
+
+        The request counts against the rate limit, so this waits just like
+        loading the link would.
+
+        Returns
+        -------
+        bool:
+            True if the link is being prefetched.
+        """
+        # Do not start a browser only to prefetch.
+        if self.static_metadata and self._driver is None:
+            return False
+        # The tab would be lost when the browser is restarted.
+        if self.tabs is None or link == self.link or self._recycle_due():
+            return False
+        self.wait(self.min_wait)
+        self.tabs.prefetch(link)
+        return self.tabs.link == link
+
+    def close(self):
+        """Quit the browser and geckodriver."""
+        self._quit_driver()
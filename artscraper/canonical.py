@@ -0,0 +1,178 @@
+"""Canonical forms of artwork links.
+
+The same artwork can be linked in several ways: with another language
+(Rijksmuseum nl/collectie vs en/collection), with query strings or
+trailing segments, or with a different title slug (Google Arts & Culture,
+Art Institute of Chicago). Each source has a canonicalizer that maps a link
+to a stable (source, object_id) key and a canonical link, so that duplicate
+links can be removed before any request is made, and the same artwork
+always ends up with the same link, output directory and queue entry.
+"""
+
+from urllib.parse import urlparse
+
+from artscraper.sources import source_of
+
+
+def _segment_after(parts, names):
+    """The path segment that follows the first of names."""
+    for i_part, part in enumerate(parts[:-1]):
+        if part in names:
+            return parts[i_part + 1]
+    return None
+
+
+def _wikiart(parts):
+    # /<language>/<artist>/<painting>
+    if len(parts) < 2:
+        return None
+    artist, painting = parts[-2:] if len(parts) == 2 else parts[1:3]
+    object_id = f"{artist}/{painting}".lower()
+    return object_id, f"https://www.wikiart.org/en/{object_id}"
+
+
+def _googleart(parts):
+    # /asset/[<title slug>/]<id>
+    if len(parts) < 2 or parts[0] != "asset":
+        return None
+    object_id = parts[-1]
+    return object_id, "https://artsandculture.google.com/" + "/".join(parts[:3])
+
+
+def _philamuseum(parts):
+    # /collection/object/<id>
+    object_id = _segment_after(parts, ["object"])
+    if object_id is None:
+        return None
+    return object_id, f"https://philamuseum.org/collection/object/{object_id}"
+
+
+def _getty(parts):
+    # /art/collection/object/<id>
+    object_id = _segment_after(parts, ["object", "objects"])
+    if object_id is None:
+        return None
+    return object_id, f"https://www.getty.edu/art/collection/object/{object_id}"
+
+
+def _rijksmuseum(parts):
+    # /<language>/collection/<object number>, or /nl/collectie/...
+    object_id = _segment_after(parts, ["collection", "collectie"])
+    if object_id is None:
+        return None
+    return object_id, f"https://www.rijksmuseum.nl/en/collection/{object_id}"
+
+
+def _artic(parts):
+    # /artworks/<id>[/<title slug>]
+    object_id = _segment_after(parts, ["artworks"])
+    if object_id is None:
+        return None
+    i_part = parts.index("artworks")
+    return object_id, "https://www.artic.edu/" + "/".join(parts[i_part:i_part + 3])
+
+
+def _smithsonian(parts):
+    # /object/[<title slug>:]<id>
+    segment = _segment_after(parts, ["object"])
+    if segment is None:
+        return None
+    object_id = segment.rpartition(":")[2]
+    return object_id, f"https://www.si.edu/object/{segment}"
+
+
+def _met(parts):
+    # /art/collection/search/<id>[/...]
+    object_id = _segment_after(parts, ["search"])
+    if object_id is None or not object_id.isdigit():
+        return None
+    return object_id, f"https://www.metmuseum.org/art/collection/search/{object_id}"
+
+
+# Source name -> function that takes the path segments of a link and
+# returns (object_id, canonical link), or None if there is no object id.
+CANONICALIZERS = {
+    "wikiart": _wikiart,
+    "googleart": _googleart,
+    "philamuseum": _philamuseum,
+    "getty": _getty,
+    "rijksmuseum": _rijksmuseum,
+    "artic": _artic,
+    "smithsonian": _smithsonian,
+    "met": _met,
+}
+
+
+def _canonicalize(link):
+    source = source_of(link)
+    parts = [part for part in urlparse(link.strip()).path.split("/") if part]
+    result = CANONICALIZERS[source](parts)
+    if result is None:
+        raise ValueError(f"Cannot find the artwork id in link: {link}")
+    return source, result[0], result[1]
+
+
+def canonical_key(link):
+    """Get the key that identifies the artwork of a link.
+
+    Parameters
+    ----------
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    (str, str):
+        Source name and the identifier of the artwork at the source.
+    """
+    source, object_id, _ = _canonicalize(link)
+    return source, object_id
+
+
+def canonical_link(link):
+    """Get the canonical form of an artwork link.
+
+    Query strings, fragments and language variants are removed. Where the
+    link contains a title slug that the scraper needs (Google Arts &
+    Culture, Art Institute of Chicago, Smithsonian), the slug is kept.
+    """
+    return _canonicalize(link)[2]
+
+
+def object_dir(link):
+    """Get the name of the output directory of the artwork of a link.
+
+    The name is the object id of the canonical key, so that all links to
+    the same artwork share one directory.
+    """
+    _, object_id = canonical_key(link)
+    return object_id.replace("/", "_").replace(":", "_")
+
+
+def dedupe_links(links):
+    """Canonicalize links and remove links to the same artwork.
+
+    Parameters
+    ----------
+    links: iterable of str
+        Urls of artworks, possibly from mixed sources.
+
+    Returns
+    -------
+    list of str:
+        Canonical links, in the order in which their artwork first appears.
+        Links that cannot be canonicalized are kept as they are, so that
+        they are reported when they are scraped.
+    """
+    seen = set()
+    unique_links = []
+    for link in links:
+        try:
+            source, object_id, link = _canonicalize(link)
+            key = (source, object_id)
+        except ValueError:
+            key = link
+        if key not in seen:
+            seen.add(key)
+            unique_links.append(link)
+    return unique_links
@@ -0,0 +1,904 @@
+"""Command line interface for ArtScraper.
+
+Usage: artscraper crawl LINK_FILE -o OUTPUT_DIR [options]
+       artscraper enqueue QUEUE LINK_FILE
+       artscraper serve-queue QUEUE [--port PORT]
+       artscraper work QUEUE -o OUTPUT_DIR [options]
+       artscraper met-sync OUTPUT_DIR [--since YYYY-MM-DD]
+       artscraper verify OUTPUT_DIR [--deep] [--requeue QUEUE]
+       artscraper replay ARCHIVE [-o METADATA_FILE] [--processes N]
+       artscraper bench-parsers ARCHIVE [--per-source N] [--export FILE]
+       artscraper bench-import
+       artscraper ingest STORE (--met-csv FILE | --artic-dump PATH)
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+from artscraper.archive import ResponseArchive
+from artscraper.archive import replay as replay_archive
+from artscraper.bandwidth import BandwidthLimiter
+from artscraper.canonical import dedupe_links
+from artscraper.deadline import LinkTimeout
+from artscraper.ingest import MetadataStore
+from artscraper.ingest import ingest_dump
+from artscraper.integrity import IntegrityIndex
+from artscraper.ratecontrol import AdaptiveRateController
+from artscraper.ratecontrol import RequestClock
+from artscraper.router import ScraperRouter
+from artscraper.sources import BROWSER_SOURCES
+from artscraper.sources import STATIC_METADATA_SOURCES
+from artscraper.sources import source_of
+from artscraper.tracing import Tracer
+from artscraper.tracing import set_tracer
+from artscraper.transport import HTTPCache
+from artscraper.transport import Transport
+from artscraper.workqueue import QueueServer
+from artscraper.workqueue import SQLiteWorkQueue
+from artscraper.workqueue import open_queue
+from artscraper.workqueue import run_worker
+from artscraper.writer import AsyncWriter
+
+# Environment variable with the shared token of a queue server.
+QUEUE_TOKEN_VARIABLE = "ARTSCRAPER_QUEUE_TOKEN"
+
+
+class Progress():  # pylint: disable=too-many-instance-attributes
+    """Keep track of crawl throughput and report it on a single line.
+
+    Parameters
+    ----------
+    total: int
+        Total number of links in the crawl.
+    interval: float, default=1
+        Minimum time in seconds between two progress reports.
+    stream: file-like, default=sys.stderr
+        Stream to report to.
+    """
+
+    def __init__(self, total, interval=1, stream=None):
+        self.total = total
+        self.interval = interval
+        self.stream = sys.stderr if stream is None else stream
+        self.start_time = time.time()
+        self.last_report = 0
+        self.done = 0
+        self.errors = 0
+        self.bytes = 0
+
+    def update(self, error=None, n_bytes=0):
+        """Register a finished link."""
+        self.done += 1
+        self.bytes += n_bytes
+        if error is not None:
+            self.errors += 1
+        if time.time() - self.last_report >= self.interval:
+            self.report()
+
+    @property
+    def elapsed(self):
+        """float: Time since the start of the crawl in seconds."""
+        return time.time() - self.start_time
+
+    def report(self):
+        """Print the current throughput."""
+        self.last_report = time.time()
+        elapsed = max(self.elapsed, 1e-6)
+        rate = self.done / elapsed
+        if rate > 0:
+            eta = _format_time(max(self.total - self.done, 0) / rate)
+        else:
+            eta = "?"
+        self.stream.write(
+            f"\r{self.done}/{self.total} links | {rate:.2f} links/s | "
+            f"{_format_bytes(self.bytes / elapsed)}/s | "
+            f"{self.errors} errors | ETA {eta}   ")
+        self.stream.flush()
+
+    def summary(self):
+        """dict: Summary statistics of the crawl."""
+        elapsed = max(self.elapsed, 1e-6)
+        return {
+            "links": self.done,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "seconds": round(elapsed, 3),
+            "links_per_second": round(self.done / elapsed, 4),
+            "bytes_per_second": round(self.bytes / elapsed, 1),
+        }
+
+
+def _format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _format_bytes(n_bytes):
+    for unit in ["B", "kB", "MB"]:
+        if n_bytes < 1000:
+            return f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1000
+    return f"{n_bytes:.1f} GB"
+
+
+def _read_links(link_file):
+    """Read canonical links without duplicates from a file (or stdin)."""
+    if link_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(link_file, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    links = [line.strip() for line in lines
+             if line.strip() and not line.startswith("#")]
+    unique_links = dedupe_links(links)
+    if len(unique_links) < len(links):
+        print(f"Skipping {len(links) - len(unique_links)} duplicate links.",
+              file=sys.stderr)
+    return unique_links
+
+
+def _scraper_options(args):
+    """Per source scraper options from the command line arguments."""
+    options = {}
+    for min_wait in args.min_wait:
+        source, _, value = min_wait.rpartition("=")
+        if source:
+            options.setdefault(source, {})["min_wait"] = float(value)
+    browser_options = {
+        "tab_prefetch": args.tab_prefetch,
+        "recycle_pages": args.recycle_pages,
+        "max_rss": (None if args.max_browser_memory is None
+                    else args.max_browser_memory * 2**20),
+        "clear_state": args.clear_browser_state,
+    }
+    if args.geckodriver is not None:
+        browser_options["geckodriver_path"] = args.geckodriver
+    for source in BROWSER_SOURCES:
+        options.setdefault(source, {}).update(browser_options)
+    if args.static_metadata:
+        for source in STATIC_METADATA_SOURCES:
+            options[source]["static_metadata"] = True
+    return options
+
+
+def _common_options(args):
+    """Scraper options for all sources from the command line arguments."""
+    options = {"skip_existing": not args.no_skip_existing}
+    if args.transport is not None:
+        options["transport"] = args.transport
+    if args.integrity:
+        options["integrity_index"] = args.integrity_index
+    if args.max_size is not None:
+        options["max_size"] = args.max_size
+    if args.archive is not None:
+        options["archive"] = args.response_archive
+    if args.writer_threads:
+        options["writer"] = args.writer
+    if args.metadata_store is not None:
+        options["metadata_store"] = args.store
+    if args.workers > 1:
+        options["request_clock"] = args.request_clock
+    for min_wait in args.min_wait:
+        if "=" not in min_wait:
+            options["min_wait"] = float(min_wait)
+    return options
+
+
+def _new_router(args):
+    """Create a ScraperRouter from the command line arguments."""
+    return ScraperRouter(args.output_dir, scraper_options=_scraper_options(args),
+                         per_source_dirs=args.layout == "by-source",
+                         link_timeout=args.link_timeout,
+                         **_common_options(args))
+
+
+def _crawl_worker(args, link_queue, result_queue):
+    """Scrape links from a local queue until it is empty."""
+    def next_link():
+        try:
+            return link_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    with _new_router(args) as router:
+        link = next_link()
+        while link is not None:
+            # Take the next link already, so that its page can be prefetched.
+            following = next_link()
+            bytes_before = _bytes_saved(router)
+            result = router.scrape_link(link, metadata=not args.no_metadata,
+                                        image=not args.no_images,
+                                        next_link=following)
+            result_queue.put((result, _bytes_saved(router) - bytes_before))
+            link = following
+    result_queue.put(None)
+
+
+def _interleaved_worker(args, chunk_queue, result_queue):
+    """Scrape a chunk of links, interleaving the sources."""
+    links = chunk_queue.get_nowait()
+    with _new_router(args) as router:
+        bytes_before = 0
+        for result in router.scrape(links, metadata=not args.no_metadata,
+                                    image=not args.no_images, interleave=True):
+            result_queue.put((result, _bytes_saved(router) - bytes_before))
+            bytes_before = _bytes_saved(router)
+    result_queue.put(None)
+
+
+def _queue_worker(args, result_queue):
+    """Scrape links from a shared work queue until it is empty."""
+    work_queue = _open_queue(args.queue)
+    with _new_router(args) as router:
+        bytes_before = [0]
+
+        def callback(result):
+            result_queue.put((result, _bytes_saved(router) - bytes_before[0]))
+            bytes_before[0] = _bytes_saved(router)
+
+        run_worker(work_queue, router, batch_size=args.batch_size,
+                   lease_time=args.lease_time, callback=callback,
+                   poll_interval=args.poll_interval)
+    result_queue.put(None)
+
+
+def _open_queue(location):
+    """Open a work queue, with the token from the environment."""
+    return open_queue(location,
+                      token=os.environ.get(QUEUE_TOKEN_VARIABLE) or None)
+
+
+def _bytes_saved(router):
+    return sum(scraper.bytes_saved for scraper in router.scrapers.values())
+
+
+def _new_transport(args):
+    """Create the transport shared by all workers, if any option needs one.
+
+    All workers share one transport, so that they use the same HTTP cache,
+    rate controller and bandwidth limits.
+    """
+    cache = None
+    if args.http_cache is not None:
+        cache = HTTPCache(args.http_cache, max_bytes=args.http_cache_size)
+    rate_controller = None
+    if args.adaptive_rate:
+        rate_controller = AdaptiveRateController(
+            min_interval=args.rate_floor, max_interval=args.rate_ceiling)
+    bandwidth = None
+    host_rates = {}
+    for host_rate in args.host_bandwidth:
+        host, _, value = host_rate.rpartition("=")
+        host_rates[host] = float(value) * 1e6
+    if args.max_bandwidth is not None or host_rates:
+        bandwidth = BandwidthLimiter(
+            max_rate=None if args.max_bandwidth is None
+            else args.max_bandwidth * 1e6,
+            host_rates=host_rates, state_fp=args.bandwidth_state)
+    if cache is None and rate_controller is None and bandwidth is None:
+        return None
+    return Transport(cache=cache, rate_controller=rate_controller,
+                     bandwidth=bandwidth)
+
+
+def _setup_shared(args):
+    """Create the objects that all workers share, stored on args."""
+    args.transport = _new_transport(args)
+    args.integrity_index = None
+    if args.integrity:
+        args.integrity_index = IntegrityIndex(args.output_dir)
+    if args.reap_browsers:
+        from artscraper.browser import reap_orphaned_browsers  # pylint: disable=import-outside-toplevel
+        n_reaped = reap_orphaned_browsers()
+        if n_reaped:
+            print(f"Stopped {n_reaped} orphaned browser processes.",
+                  file=sys.stderr)
+    args.response_archive = None
+    if args.archive is not None:
+        args.response_archive = ResponseArchive(args.archive)
+    args.store = None
+    if args.metadata_store is not None:
+        args.store = MetadataStore(args.metadata_store)
+    # The workers have their own scrapers, but take turns for each host.
+    args.request_clock = RequestClock()
+    args.writer = None
+    if args.writer_threads:
+        args.writer = AsyncWriter(threads=args.writer_threads,
+                                  fsync=args.fsync)
+
+
+def _report_results(result_queue, n_workers, progress, done_fp=None):
+    """Report the results of the workers until they all finish.
+
+    Returns
+    -------
+    int:
+        The number of links that ran out of time.
+    """
+    n_timeouts = 0
+    while n_workers:
+        item = result_queue.get()
+        if item is None:
+            n_workers -= 1
+            continue
+        result, n_bytes = item
+        if isinstance(result.error, LinkTimeout):
+            n_timeouts += 1
+        if result.error is not None:
+            print(f"\n{result.link}: {result.error!r}", file=sys.stderr)
+        elif done_fp is not None:
+            done_fp.write(result.link + "\n")
+            done_fp.flush()
+        progress.update(result.error, n_bytes)
+    return n_timeouts
+
+
+def _crawl_summary(args, progress, n_timeouts):
+    """Summary of a finished crawl, with the statistics of shared objects."""
+    summary = progress.summary()
+    if args.link_timeout is not None:
+        summary["timeouts"] = n_timeouts
+    if args.writer is not None:
+        summary["write_errors"] = len(args.writer.errors)
+    transport = args.transport
+    if transport is not None and transport.cache is not None:
+        summary["http_cache_hits"] = transport.cache.hits
+        summary["http_cache_misses"] = transport.cache.misses
+    if transport is not None and transport.rate_controller is not None:
+        summary["rate_control"] = transport.rate_controller.metrics()
+    if transport is not None and transport.bandwidth is not None:
+        summary["bandwidth"] = transport.bandwidth.metrics()
+        transport.bandwidth.close()
+    return summary
+
+
+def _run_workers(args, target, worker_args, progress, done_fp=None):
+    """Run worker threads and report their results until they finish."""
+    _setup_shared(args)
+    tracer = None
+    if args.trace is not None:
+        tracer = Tracer()
+        set_tracer(tracer)
+    result_queue = queue.Queue()
+    workers = [threading.Thread(target=target, daemon=True,
+                                args=(args, *worker_args, result_queue))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    n_timeouts = _report_results(result_queue, len(workers), progress,
+                                 done_fp)
+
+    if args.writer is not None:
+        args.writer.close()
+        for file_fp, error in args.writer.errors:
+            print(f"\n{file_fp}: {error!r}", file=sys.stderr)
+    if tracer is not None:
+        set_tracer(None)
+        if args.trace_format == "json":
+            tracer.export_json(args.trace)
+        else:
+            tracer.export_chrome(args.trace)
+
+    progress.report()
+    summary = _crawl_summary(args, progress, n_timeouts)
+    print("\n" + json.dumps(summary), file=sys.stderr)
+    if args.summary_file is not None:
+        with open(args.summary_file, "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+    return 1 if summary["errors"] or summary.get("write_errors") else 0
+
+
+def crawl(args):
+    """Run the crawl command."""
+    links = _read_links(args.links)
+    done_links = set()
+    if args.done_file is not None and Path(args.done_file).is_file():
+        done_links = set(_read_links(args.done_file))
+    links = [link for link in links if link not in done_links]
+
+    progress = Progress(len(links), interval=args.report_interval)
+    # Queue the links grouped by source, so that workers keep their scrapers
+    # busy with one source at a time.
+    groups = {}
+    for link in links:
+        try:
+            groups.setdefault(source_of(link), []).append(link)
+        except ValueError as error:
+            print(f"\n{error}", file=sys.stderr)
+            progress.update(error)
+    link_queue = queue.Queue()
+    if args.interleave:
+        # Each worker interleaves the sources of its own share of the links.
+        worker = _interleaved_worker
+        for i_worker in range(args.workers):
+            link_queue.put([link for source_links in groups.values()
+                            for link in source_links][i_worker::args.workers])
+    else:
+        worker = _crawl_worker
+        for source_links in groups.values():
+            for link in source_links:
+                link_queue.put(link)
+
+    if args.done_file is None:
+        return _run_workers(args, worker, (link_queue,), progress)
+    with open(args.done_file, "a", encoding="utf-8") as done_fp:
+        return _run_workers(args, worker, (link_queue,), progress, done_fp)
+
+
+def enqueue(args):
+    """Run the enqueue command."""
+    work_queue = _open_queue(args.queue)
+    n_added = work_queue.add(_read_links(args.links))
+    print(f"Added {n_added} links: {work_queue.counts()}")
+    return 0
+
+
+def serve_queue(args):
+    """Run the serve-queue command."""
+    token = os.environ.get(QUEUE_TOKEN_VARIABLE) or None
+    server = QueueServer(SQLiteWorkQueue(args.queue), (args.host, args.port),
+                         token=token)
+    print(f"Serving work queue {args.queue} on {args.host}:{args.port}"
+          + ("" if token else f" without a token ({QUEUE_TOKEN_VARIABLE})"))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def work(args):
+    """Run the work command."""
+    counts = _open_queue(args.queue).counts()
+    progress = Progress(counts["pending"] + counts["leased"],
+                        interval=args.report_interval)
+    return _run_workers(args, _queue_worker, (), progress)
+
+
+def met_sync(args):
+    """Run the met-sync command."""
+    from artscraper.met import sync_collection  # pylint: disable=import-outside-toplevel
+    integrity_index = None
+    if args.integrity is not None:
+        integrity_index = IntegrityIndex(args.integrity)
+    summary = sync_collection(args.output_dir, since=args.since,
+                              only_existing=not args.add_new,
+                              images=not args.no_images,
+                              max_size=args.max_size,
+                              integrity_index=integrity_index)
+    print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+def verify(args):
+    """Run the verify command."""
+    index = IntegrityIndex(args.output_dir)
+    broken = index.verify(deep=args.deep, workers=args.workers)
+    for img_fp, link, status in broken:
+        print(f"{status}: {img_fp} ({link})")
+        if args.delete:
+            Path(img_fp).unlink(missing_ok=True)
+            index.remove(img_fp)
+    links = sorted({link for _, link, _ in broken if link is not None})
+    if args.requeue is not None and links:
+        _open_queue(args.requeue).retry(links)
+        print(f"Requeued {len(links)} links.")
+    print(f"{len(broken)} broken images.")
+    return 1 if broken else 0
+
+
+def replay(args):
+    """Run the replay command."""
+    out_fp = sys.stdout
+    if args.output is not None:
+        out_fp = open(args.output, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+    progress = Progress(len(ResponseArchive(args.archive)),
+                        interval=args.report_interval)
+    try:
+        for result in replay_archive(args.archive, source=args.source,
+                                     processes=args.processes):
+            if result.error is not None:
+                print(f"\n{result.link}: {result.error}", file=sys.stderr)
+            else:
+                out_fp.write(json.dumps(result.metadata) + "\n")
+            progress.update(result.error)
+    finally:
+        if out_fp is not sys.stdout:
+            out_fp.close()
+    progress.report()
+    print("\n" + json.dumps(progress.summary()), file=sys.stderr)
+    return 1 if progress.errors else 0
+
+
+def ingest(args):
+    """Run the ingest command."""
+    store = MetadataStore(args.store)
+    n_before = len(store)
+    for dump_format, dump_fp in [("met-csv", args.met_csv),
+                                 ("artic", args.artic_dump)]:
+        if dump_fp is None:
+            continue
+        n_ingested = ingest_dump(store, dump_format, dump_fp,
+                                 chunk_size=args.chunk_size)
+        print(f"Ingested {n_ingested} artworks from {dump_fp}.",
+              file=sys.stderr)
+    print(json.dumps({"artworks": len(store),
+                      "new": len(store) - n_before}))
+    store.close()
+    return 0
+
+
+def bench_parsers(args):
+    """Run the bench-parsers command."""
+    from artscraper import benchmark  # pylint: disable=import-outside-toplevel
+    if args.export is not None:
+        counts = benchmark.export_corpus(args.archive, args.export,
+                                         per_source=args.per_source)
+        print(f"Exported corpus: {json.dumps(counts)}")
+        return 0
+    corpus = benchmark.load_corpus(args.archive, per_source=args.per_source,
+                                   source=args.source)
+    results = benchmark.benchmark_extractors(corpus, repeat=args.repeat,
+                                             parsers=args.parser)
+    print(benchmark.format_results(results))
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([result._asdict() for result in results], f, indent=2)
+    return 0
+
+
+def bench_import(_args):
+    """Run the bench-import command."""
+    from artscraper import benchmark  # pylint: disable=import-outside-toplevel
+    import_time, loaded = benchmark.check_import()
+    print(f"import artscraper: {import_time * 1000:.1f} ms")
+    if loaded:
+        print(f"Importing artscraper loads: {', '.join(loaded)}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+def _add_scraper_arguments(parser):
+    """Arguments shared by the commands that scrape links."""
+    parser.add_argument(
+        "-o", "--output-dir", required=True,
+        help="Directory to store images and metadata in.")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Number of parallel workers, each with its own scrapers. The "
+             "workers share the rate limit of each host.")
+    parser.add_argument(
+        "--layout", choices=["by-source", "flat"], default="by-source",
+        help="Store each source in its own sub directory (default) or all "
+             "artworks directly in the output directory.")
+    parser.add_argument(
+        "--min-wait", action="append", default=[], metavar="[SOURCE=]SECONDS",
+        help="Minimum time between requests, for all sources or for one "
+             "source, e.g. --min-wait wikiart=0.5. Can be repeated.")
+    parser.add_argument(
+        "--adaptive-rate", action="store_true",
+        help="Adjust the time between requests to each host to its "
+             "latency and throttling, starting from --min-wait.")
+    parser.add_argument(
+        "--rate-floor", type=float, default=0.1, metavar="SECONDS",
+        help="Shortest time between requests with --adaptive-rate.")
+    parser.add_argument(
+        "--rate-ceiling", type=float, default=60, metavar="SECONDS",
+        help="Longest time between requests with --adaptive-rate.")
+    parser.add_argument(
+        "--max-bandwidth", type=float, metavar="MB_PER_S",
+        help="Limit the download rate of all hosts together, in megabytes "
+             "per second. Images wait for the budget; metadata does not.")
+    parser.add_argument(
+        "--host-bandwidth", action="append", default=[],
+        metavar="HOST=MB_PER_S",
+        help="Limit the download rate of one host, e.g. "
+             "--host-bandwidth wikiart.org=2 (including its subdomains). "
+             "Can be repeated.")
+    parser.add_argument(
+        "--bandwidth-state", metavar="FILE",
+        help="Share the bandwidth limits with other processes that use the "
+             "same file.")
+    parser.add_argument(
+        "--link-timeout", type=float, metavar="SECONDS",
+        help="Total time budget per link. Links that take longer are "
+             "aborted (restarting the browser if needed) and count as "
+             "failed, so that they are retried.")
+    parser.add_argument(
+        "--no-skip-existing", action="store_true",
+        help="Download artworks again even if they are already stored.")
+    parser.add_argument(
+        "--no-images", action="store_true", help="Do not store images.")
+    parser.add_argument(
+        "--no-metadata", action="store_true", help="Do not store metadata.")
+    parser.add_argument(
+        "--max-size", type=int, metavar="PIXELS",
+        help="Download the smallest image size offered by the source that "
+             "is at least this large (WikiArt, Met and Smithsonian).")
+    parser.add_argument(
+        "--geckodriver", help="Path to the geckodriver executable.")
+    parser.add_argument(
+        "--static-metadata", action="store_true",
+        help="Read the metadata of Philadelphia, Getty, Google Arts and Met "
+             "artworks from the page fetched over HTTP, and only use the "
+             "browser if that fails or for the image.")
+    parser.add_argument(
+        "--tab-prefetch", action="store_true",
+        help="Load the next page of browser based sources in a second tab "
+             "while the current artwork is processed.")
+    parser.add_argument(
+        "--recycle-pages", type=int, metavar="N",
+        help="Restart each browser after N page loads.")
+    parser.add_argument(
+        "--max-browser-memory", type=int, metavar="MB",
+        help="Restart a browser when it uses more memory than this "
+             "(requires psutil).")
+    parser.add_argument(
+        "--clear-browser-state", action="store_true",
+        help="Delete cookies and web storage between artworks.")
+    parser.add_argument(
+        "--reap-browsers", action="store_true",
+        help="Stop geckodriver and Firefox processes left behind by earlier "
+             "runs before starting (requires psutil).")
+    parser.add_argument(
+        "--integrity", action="store_true",
+        help="Record size and hash of saved images in an integrity index, "
+             "and download partially written images again.")
+    parser.add_argument(
+        "--writer-threads", type=int, default=0, metavar="N",
+        help="Write images and metadata on N background threads, so that "
+             "scraping does not wait for the disk.")
+    parser.add_argument(
+        "--fsync", action="store_true",
+        help="With --writer-threads, sync written files to disk.")
+    parser.add_argument(
+        "--archive", metavar="FILE",
+        help="Record the raw page sources and API responses in this "
+             "archive, so that metadata can be extracted again with replay.")
+    parser.add_argument(
+        "--metadata-store", metavar="FILE",
+        help="Take the metadata of the Met and Art Institute artworks in "
+             "this store (see ingest) from it instead of requesting it.")
+    parser.add_argument(
+        "--http-cache", metavar="DIR",
+        help="Cache HTTP responses in this directory and revalidate them "
+             "with conditional requests, useful for refresh crawls.")
+    parser.add_argument(
+        "--http-cache-size", type=int, default=2**30, metavar="BYTES",
+        help="Maximum size of the HTTP cache (default 1 GiB).")
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="Record a trace of all operations and write it to this file.")
+    parser.add_argument(
+        "--trace-format", choices=["chrome", "json"], default="chrome",
+        help="Format of the trace: Chrome trace events (default, for "
+             "chrome://tracing or Perfetto) or a plain JSON list of spans.")
+    parser.add_argument(
+        "--report-interval", type=float, default=1,
+        help="Seconds between progress reports.")
+    parser.add_argument(
+        "--summary-file",
+        help="Write the end-of-run summary as JSON to this file.")
+
+
+def _add_crawl_parser(subparsers):
+    """Add the parser of the crawl command."""
+    crawl_parser = subparsers.add_parser(
+        "crawl", help="Scrape a list of links from any supported source.")
+    crawl_parser.add_argument(
+        "links", nargs="?", default="-",
+        help="File with one link per line, or - for stdin (default).")
+    _add_scraper_arguments(crawl_parser)
+    crawl_parser.add_argument(
+        "--interleave", action="store_true",
+        help="Take the next link from the source that is ready first, so "
+             "that rate limit waits of different sources overlap.")
+    crawl_parser.add_argument(
+        "--done-file",
+        help="File to record finished links in; links in it are skipped, "
+             "so an interrupted crawl can be resumed.")
+    crawl_parser.set_defaults(func=crawl)
+
+
+def _add_enqueue_parser(subparsers):
+    """Add the parser of the enqueue command."""
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="Add links to a shared work queue.")
+    enqueue_parser.add_argument(
+        "queue", help="SQLite database file or url of a queue server.")
+    enqueue_parser.add_argument(
+        "links", nargs="?", default="-",
+        help="File with one link per line, or - for stdin (default).")
+    enqueue_parser.set_defaults(func=enqueue)
+
+
+def _add_serve_queue_parser(subparsers):
+    """Add the parser of the serve-queue command."""
+    serve_parser = subparsers.add_parser(
+        "serve-queue", help="Serve a work queue to workers on other nodes.")
+    serve_parser.add_argument("queue", help="SQLite database file.")
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1",
+        help="Address to bind to (default 127.0.0.1, use 0.0.0.0 for all "
+             f"interfaces). Set {QUEUE_TOKEN_VARIABLE} to require a token.")
+    serve_parser.add_argument("--port", type=int, default=8765,
+                              help="Port to listen on.")
+    serve_parser.set_defaults(func=serve_queue)
+
+
+def _add_work_parser(subparsers):
+    """Add the parser of the work command."""
+    work_parser = subparsers.add_parser(
+        "work", help="Scrape links from a shared work queue.")
+    work_parser.add_argument(
+        "queue", help="SQLite database file or url of a queue server.")
+    _add_scraper_arguments(work_parser)
+    work_parser.add_argument(
+        "--batch-size", type=int, default=10,
+        help="Number of links leased at a time.")
+    work_parser.add_argument(
+        "--lease-time", type=float, default=600,
+        help="Seconds before leased links are given to other workers.")
+    work_parser.add_argument(
+        "--poll-interval", type=float, default=10,
+        help="Seconds between polls of the queue while other workers still "
+             "hold leases.")
+    work_parser.set_defaults(func=work)
+
+
+def _add_verify_parser(subparsers):
+    """Add the parser of the verify command."""
+    verify_parser = subparsers.add_parser(
+        "verify", help="Find broken images with the integrity index.")
+    verify_parser.add_argument(
+        "output_dir", help="Output directory that was crawled with "
+                           "--integrity.")
+    verify_parser.add_argument(
+        "--deep", action="store_true",
+        help="Also compare content hashes, which reads every image.")
+    verify_parser.add_argument(
+        "-w", "--workers", type=int, default=8,
+        help="Number of threads to check images with.")
+    verify_parser.add_argument(
+        "--delete", action="store_true",
+        help="Delete broken images, so they are downloaded again.")
+    verify_parser.add_argument(
+        "--requeue", metavar="QUEUE",
+        help="Queue the links of broken images in this work queue.")
+    verify_parser.set_defaults(func=verify)
+
+
+def _add_replay_parser(subparsers):
+    """Add the parser of the replay command."""
+    replay_parser = subparsers.add_parser(
+        "replay", help="Extract metadata again from a response archive.")
+    replay_parser.add_argument(
+        "archive", help="Archive recorded with --archive.")
+    replay_parser.add_argument(
+        "-o", "--output", metavar="FILE",
+        help="File to write the metadata to as JSON lines (default stdout).")
+    replay_parser.add_argument(
+        "--source", help="Only replay the artworks of this source.")
+    replay_parser.add_argument(
+        "-p", "--processes", type=int,
+        help="Number of parser processes (default: number of CPUs).")
+    replay_parser.add_argument(
+        "--report-interval", type=float, default=1,
+        help="Seconds between progress reports.")
+    replay_parser.set_defaults(func=replay)
+
+
+def _add_bench_import_parser(subparsers):
+    """Add the parser of the bench-import command."""
+    import_parser = subparsers.add_parser(
+        "bench-import",
+        help="Time 'import artscraper' and check that it loads no heavy "
+             "dependencies.")
+    import_parser.set_defaults(func=bench_import)
+
+
+def _add_ingest_parser(subparsers):
+    """Add the parser of the ingest command."""
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Store the metadata of bulk open access dumps.")
+    ingest_parser.add_argument(
+        "store", help="Metadata store to create or update.")
+    ingest_parser.add_argument(
+        "--met-csv", metavar="FILE", help="The Met's MetObjects.csv.")
+    ingest_parser.add_argument(
+        "--artic-dump", metavar="PATH",
+        help="Art Institute data dump, extracted or as tar archive.")
+    ingest_parser.add_argument(
+        "--chunk-size", type=int, default=1000,
+        help="Number of artworks stored per transaction.")
+    ingest_parser.set_defaults(func=ingest)
+
+
+def _add_bench_parser(subparsers):
+    """Add the parser of the bench-parsers command."""
+    bench_parser = subparsers.add_parser(
+        "bench-parsers",
+        help="Time the metadata extractors on an archived corpus.")
+    bench_parser.add_argument(
+        "archive", help="Response archive, exported corpus or corpus "
+                        "directory to use (benchmarks/smoke only checks "
+                        "that the extractors work).")
+    bench_parser.add_argument(
+        "--per-source", type=int, metavar="N",
+        help="Use at most N artworks per source.")
+    bench_parser.add_argument(
+        "--source", help="Only benchmark the extractors of this source.")
+    bench_parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Runs per page; the fastest is reported.")
+    bench_parser.add_argument(
+        "--parser", action="append", metavar="FEATURES",
+        help="HTML tree builder to run the extractors with, e.g. html.parser "
+             "or lxml. Can be repeated to compare them.")
+    bench_parser.add_argument(
+        "--json", metavar="FILE", help="Also write the results to a JSON file.")
+    bench_parser.add_argument(
+        "--export", metavar="FILE",
+        help="Instead of benchmarking, copy --per-source artworks of each "
+             "source to a new corpus file (or directory, without suffix).")
+    bench_parser.set_defaults(func=bench_parsers)
+
+
+def _add_met_sync_parser(subparsers):
+    """Add the parser of the met-sync command."""
+    sync_parser = subparsers.add_parser(
+        "met-sync", help="Update stored Met artworks that changed since the "
+                         "last sync.")
+    sync_parser.add_argument(
+        "output_dir", help="Output directory of the Met scraper.")
+    sync_parser.add_argument(
+        "--since", metavar="YYYY-MM-DD",
+        help="Update objects changed since this date instead of since the "
+             "last sync.")
+    sync_parser.add_argument(
+        "--add-new", action="store_true",
+        help="Also store changed artworks that are not stored yet.")
+    sync_parser.add_argument(
+        "--no-images", action="store_true",
+        help="Only update the metadata.")
+    sync_parser.add_argument(
+        "--max-size", type=int, metavar="PIXELS",
+        help="Download the small versions of images if this is small "
+             "enough.")
+    sync_parser.add_argument(
+        "--integrity", metavar="DIR",
+        help="Record the downloaded images in the integrity index of this "
+             "directory (the output directory of the crawl).")
+    sync_parser.set_defaults(func=met_sync)
+
+
+def build_parser():
+    """argparse.ArgumentParser: Parser for the artscraper command."""
+    parser = argparse.ArgumentParser(
+        prog="artscraper",
+        description="Download artwork images and metadata.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    _add_crawl_parser(subparsers)
+    _add_enqueue_parser(subparsers)
+    _add_serve_queue_parser(subparsers)
+    _add_work_parser(subparsers)
+    _add_verify_parser(subparsers)
+    _add_replay_parser(subparsers)
+    _add_bench_import_parser(subparsers)
+    _add_ingest_parser(subparsers)
+    _add_bench_parser(subparsers)
+    _add_met_sync_parser(subparsers)
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the artscraper command."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,146 @@
+"""Time budgets per link, enforced by a watchdog.
+
+A single hung page load or element lookup can block a worker for a very
+long time. ScraperRouter can give each link a total time budget for
+loading it, extracting the metadata and saving the image. Within the
+budget, HTTP timeouts and rate limit waits are shortened to the time that
+is left (see remaining), and a Watchdog thread aborts the scraper when the
+budget runs out: browser scrapers kill their browser, which makes the
+blocked WebDriver call fail, and start a new one for the next link. The
+link then fails with a LinkTimeout, so that it can be retried later.
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+_LOCAL = threading.local()
+
+
+class LinkTimeout(Exception):
+    """The time budget of a link ran out."""
+
+
+def remaining():
+    """Time left in the budget of the link on the current thread.
+
+    Returns
+    -------
+    float or None:
+        Seconds left (negative when overdue), or None without a budget.
+    """
+    deadline = getattr(_LOCAL, "deadline", None)
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check_deadline():
+    """Raise LinkTimeout if the budget of the current link has run out."""
+    time_left = remaining()
+    if time_left is not None and time_left <= 0:
+        raise LinkTimeout("The time budget of the link ran out.")
+
+
+class Budget():
+    """Time budget of one link, see Watchdog.watch.
+
+    Attributes
+    ----------
+    seconds: float
+        Length of the budget.
+    deadline: float
+        Time (as time.time()) at which the budget runs out.
+    aborted: bool
+        Whether the watchdog aborted the operation.
+    """
+
+    def __init__(self, seconds, callback):
+        self.seconds = seconds
+        self.deadline = time.time() + seconds
+        self.callback = callback
+        self.aborted = False
+
+    @property
+    def expired(self):
+        """bool: Whether the deadline has passed."""
+        return time.time() >= self.deadline
+
+
+class Watchdog():
+    """Thread that aborts operations that run past their deadline.
+
+    Parameters
+    ----------
+    interval: float, default=0.5
+        Time between checks of the deadlines in seconds.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.aborts = 0
+        self._budgets = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def watch(self, seconds, abort):
+        """Give the code in the with block a time budget.
+
+        Parameters
+        ----------
+        seconds: float or None
+            Length of the budget; None disables the budget.
+        abort: callable
+            Called (on the watchdog thread) when the budget runs out, to
+            make the blocked operation fail.
+
+        Yields
+        ------
+        Budget or None:
+            The budget of the block.
+        """
+        if seconds is None:
+            yield None
+            return
+        budget = Budget(seconds, abort)
+        key = next(self._counter)
+        with self._lock:
+            self._budgets[key] = budget
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        previous = getattr(_LOCAL, "deadline", None)
+        _LOCAL.deadline = budget.deadline
+        try:
+            yield budget
+        finally:
+            _LOCAL.deadline = previous
+            with self._lock:
+                del self._budgets[key]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            now = time.time()
+            with self._lock:
+                overdue = [budget for budget in self._budgets.values()
+                           if not budget.aborted and now >= budget.deadline]
+                for budget in overdue:
+                    budget.aborted = True
+                    self.aborts += 1
+            for budget in overdue:
+                try:
+                    budget.callback()
+                except Exception:  # pylint: disable=broad-except
+                    pass
+
+    def close(self):
+        """Stop the watchdog thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop = threading.Event()
@@ -0,0 +1,195 @@
+"""Perceptual-hash index to find the same artwork across sources.
+
+Images are reduced to a 64-bit difference hash (dHash), which is stable
+under resizing and recompression. Hashes are kept in a NumPy uint64 array,
+so that searching for near-duplicates is a vectorized Hamming distance
+computation. Requires numpy and Pillow.
+"""
+
+import io
+from pathlib import Path
+
+import numpy as np
+
+# Number of set bits for each byte value, used when np.bitwise_count
+# is not available (numpy < 2.0).
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def perceptual_hash(image):
+    """Compute the 64-bit difference hash of an image.
+
+    Parameters
+    ----------
+    image: bytes, str, Path or PIL.Image.Image
+        Encoded image data, path to an image file or an opened image.
+
+    Returns
+    -------
+    int:
+        Hash of the image, 0 <= hash < 2**64.
+    """
+    try:
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError("Perceptual hashing requires Pillow, install it "
+                          "with 'pip install Pillow'.") from error
+
+    if isinstance(image, bytes):
+        image = Image.open(io.BytesIO(image))
+    elif isinstance(image, (str, Path)):
+        image = Image.open(image)
+    # Draft mode lets JPEG decoding skip most of the full size image.
+    image.draft("L", (32, 32))
+    small = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(hashes, query):
+    """Compute the Hamming distance between an array of hashes and a hash.
+
+    Parameters
+    ----------
+    hashes: numpy.ndarray
+        Array of uint64 hashes.
+    query: int
+        Hash to compare to.
+
+    Returns
+    -------
+    numpy.ndarray:
+        Number of differing bits for each of the hashes.
+    """
+    diff = np.bitwise_xor(hashes, np.uint64(query))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(diff)
+    return _POPCOUNT[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class HashIndex():
+    """Index of perceptual hashes of downloaded artworks.
+
+    Parameters
+    ----------
+    max_distance: int, default=6
+        Maximum Hamming distance between two hashes for the images to be
+        considered duplicates.
+    """
+
+    def __init__(self, max_distance=6):
+        self.max_distance = max_distance
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self.keys = []
+        self.duplicates = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def hashes(self):
+        """numpy.ndarray: The hashes in the index, in order of keys."""
+        return self._hashes[:len(self.keys)]
+
+    def add(self, key, image_hash):
+        """Add a hash to the index.
+
+        Parameters
+        ----------
+        key: str
+            Identifier of the artwork, e.g. the link it was scraped from.
+        image_hash: int
+            Perceptual hash of the image.
+        """
+        n_hashes = len(self.keys)
+        if n_hashes == len(self._hashes):
+            self._hashes = np.concatenate(
+                [self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[n_hashes] = image_hash
+        self.keys.append(key)
+
+    def add_image(self, key, image):
+        """Hash an image and add it to the index.
+
+        Parameters
+        ----------
+        key: str
+            Identifier of the artwork.
+        image: bytes, str, Path or PIL.Image.Image
+            Image to hash, see perceptual_hash.
+        """
+        self.add(key, perceptual_hash(image))
+
+    def search(self, image_hash, max_distance=None):
+        """Find all artworks with a similar hash.
+
+        Parameters
+        ----------
+        image_hash: int
+            Hash to search for.
+        max_distance: int, optional
+            Maximum Hamming distance, by default the one of the index.
+
+        Returns
+        -------
+        list of (str, int):
+            Keys and distances of the matches, closest first.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        distances = hamming_distance(self.hashes, image_hash)
+        matches = np.flatnonzero(distances <= max_distance)
+        matches = matches[np.argsort(distances[matches], kind="stable")]
+        return [(self.keys[i], int(distances[i])) for i in matches]
+
+    def find_duplicate(self, key, image, max_distance=None):
+        """Check whether an image is a duplicate of an indexed artwork.
+
+        If it is, the pair is recorded in the duplicates attribute, so that
+        the link between the two can be stored.
+
+        Parameters
+        ----------
+        key: str
+            Identifier of the artwork that is checked.
+        image: bytes, str, Path or PIL.Image.Image
+            Image (for instance a thumbnail) to check.
+        max_distance: int, optional
+            Maximum Hamming distance, by default the one of the index.
+
+        Returns
+        -------
+        str or None:
+            Key of the closest indexed artwork, or None if there is none.
+        """
+        matches = self.search(perceptual_hash(image), max_distance)
+        matches = [(match_key, dist) for match_key, dist in matches
+                   if match_key != key]
+        if not matches:
+            return None
+        self.duplicates.append((key, matches[0][0], matches[0][1]))
+        return matches[0][0]
+
+    def save(self, index_fp):
+        """Store the index in a compressed .npz file."""
+        dup_array = np.array(self.duplicates, dtype=object).reshape(-1, 3)
+        np.savez_compressed(index_fp, hashes=self.hashes,
+                            keys=np.array(self.keys, dtype=str),
+                            duplicates=dup_array.astype(str),
+                            max_distance=self.max_distance)
+
+    @classmethod
+    def load(cls, index_fp):
+        """Load an index that was stored with save."""
+        with np.load(index_fp) as data:
+            index = cls(max_distance=int(data["max_distance"]))
+            index._hashes = np.array(data["hashes"], dtype=np.uint64)
+            keys = np.asarray(data["keys"], dtype=str)
+            duplicates = np.asarray(data["duplicates"], dtype=str)
+            index.keys = [str(key) for key in keys]
+            index.duplicates = [(str(key), str(dup), int(dist))
+                                for key, dup, dist in duplicates.reshape(-1, 3)]
+        if len(index._hashes) == 0:
+            index._hashes = np.zeros(1024, dtype=np.uint64)
+        return index
@@ -3,15 +3,49 @@
 import json
 from pathlib import Path
 from urllib.parse import urlparse
-from urllib.request import urlopen
 
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 
-from artscraper.base import BaseArtScraper
+from artscraper.browser import BrowserScraper
+from artscraper.tracing import traced
+from artscraper.parsing import make_soup
 
 
-class GettyScraper(BaseArtScraper):
+def parse_metadata(sources, link):  # pylint: disable=unused-argument
+    """Extract the metadata of an artwork from its API response.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the JSON metadata under "api".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    return json.loads(sources["api"])
+
+
+def find_manifest_link(page):
+    """Find the link to the IIIF manifest in the page source of an artwork.
+
+    Raises
+    ------
+    ValueError:
+        If the page has no manifest link.
+    """
+    elem = make_soup(page).find(class_="m-technical-data__iiif-links")
+    anchor = None if elem is None else elem.find("a", href=True)
+    if anchor is None:
+        raise ValueError("Cannot find the IIIF manifest link.")
+    return anchor["href"]
+
+
+class GettyScraper(BrowserScraper):
     """Class for scraping Getty images.
 
     Parameters
@@ -26,13 +60,14 @@ class GettyScraper(BaseArtScraper):
         is randomly drawn from a polynomial distribution.
     """
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5, driver_options=None):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
-        self.driver = webdriver.Firefox(options=driver_options)
+    parse_metadata = staticmethod(parse_metadata)
 
-    def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.close()
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5,
+                 driver_options=None, **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait,
+                         driver_options=driver_options, **kwargs)
 
+    @traced()
     def load_link(self, link):
         if link == self.link:
             return False
@@ -45,8 +80,7 @@ class GettyScraper(BaseArtScraper):
                 return False
             self.paint_dir.mkdir(exist_ok=True, parents=True)
 
-        self.wait(self.min_wait)
-        self.driver.get(link)
+        self._load_page(link)
         return True
 
     @property
@@ -71,17 +105,21 @@ class GettyScraper(BaseArtScraper):
                 metadata = json.load(f)
             return metadata
 
+        metadata = self._parse_static(
+            lambda page: {"api": self.transport.get(find_manifest_link(page)).text})
+        if metadata is not None:
+            return metadata
+
+        self._ensure_page()
         self.wait(self.min_wait, update=False)
         elem = self.driver.find_element('class name', 'm-technical-data__iiif-links')
         link = elem.find_element('css selector', 'a').get_attribute('href')
 
-        with urlopen(link) as url:
-            metadata = json.load(url)
-
-        return metadata
+        return self._parse_sources({"api": self.transport.get(link).text})
 
     def get_image(self):
         """Get a binary PNG image in memory."""
+        self._ensure_page()
         self.wait(self.min_wait)
         button = self.driver.find_element("name", 'full-page')
         self.driver.execute_script("arguments[0].scrollIntoView(true);", button)
@@ -96,6 +134,7 @@ class GettyScraper(BaseArtScraper):
         self.driver.find_element("xpath", "/html/body").send_keys(Keys.ESCAPE)
         return img
 
+    @traced()
     def save_image(self, img_fp=None, link=None):
         """Save the artwork image to a file.
 
@@ -113,10 +152,6 @@ class GettyScraper(BaseArtScraper):
 
         img_fp = self._convert_img_fp(img_fp, suffix=".png")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
-
-    def close(self):
-        self.driver.close()
+        self._write_image(img_fp, self.get_image())
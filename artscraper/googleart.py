@@ -4,15 +4,78 @@ import json
 from pathlib import Path
 from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.keys import Keys
 
-from artscraper.base import BaseArtScraper
+from artscraper.browser import BrowserScraper
+from artscraper.canonical import object_dir
+from artscraper.tracing import traced
+from artscraper.parsing import html_text, make_soup
 
+# The description is the first div of the first section next to the section
+# with the metadata; without a description, the metadata section is first.
+MAIN_TEXT_XPATH = ('//*[@id="metadata-{paint_id}"]/ancestor::section[1]/..'
+                   '/section[1][not(.//*[@id="metadata-{paint_id}"])]/div[1]')
 
-class GoogleArtScraper(BaseArtScraper):
+
+def parse_metadata(sources, link):
+    """Extract the metadata of an artwork from its page source.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the rendered page source under "page".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    paint_id = urlparse(link).path.split("/")[-1]
+    soup = make_soup(sources["page"])
+    elem = soup.find(id=f"metadata-{paint_id}")
+    if elem is None:
+        raise ValueError(f"Cannot find the metadata of {link}.")
+
+    metadata = {}
+    main_elem = find_main_text(elem)
+    metadata["main_text"] = '' if main_elem is None else main_elem.get_text()
+    for par in elem.find_all("li"):
+        label = par.find("span", text=True)
+        if label is None:
+            continue
+        name = label.contents[0].lower()[:-1]
+        metadata[name] = par.text[len(name) + 2:]
+    metadata["id"] = paint_id
+    return metadata
+
+
+def find_main_text(metadata_elem):
+    """Find the description of an artwork, see MAIN_TEXT_XPATH.
+
+    Parameters
+    ----------
+    metadata_elem: bs4.Tag
+        The element with the metadata of the artwork.
+
+    Returns
+    -------
+    bs4.Tag or None:
+        The element with the description, or None if there is none.
+    """
+    section = metadata_elem.find_parent("section")
+    if section is None:
+        return None
+    first_section = section.parent.find("section", recursive=False)
+    if first_section is section:
+        return None
+    return first_section.find("div", recursive=False)
+
+
+class GoogleArtScraper(BrowserScraper):
     """Class for scraping GoogleArt images.
 
     Parameters
@@ -27,14 +90,14 @@ class GoogleArtScraper(BaseArtScraper):
         is randomly drawn from a polynomial distribution.
     """
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5,
-                 geckodriver_path="geckodriver"):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
-        self.driver = webdriver.Firefox(executable_path=geckodriver_path)
+    parse_metadata = staticmethod(parse_metadata)
 
-    def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.close()
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5,
+                 geckodriver_path="geckodriver", **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait,
+                         geckodriver_path=geckodriver_path, **kwargs)
 
+    @traced()
     def load_link(self, link):
         if link == self.link:
             return False
@@ -47,14 +110,12 @@ class GoogleArtScraper(BaseArtScraper):
                 return False
             self.paint_dir.mkdir(exist_ok=True, parents=True)
 
-        self.wait(self.min_wait)
-        self.driver.get(link)
+        self._load_page(link)
         return True
 
     @property
     def paint_dir(self):
-        paint_id = "_".join(urlparse(self.link).path.split("/")[-2:])
-        return Path(self.output_dir, paint_id)
+        return Path(self.output_dir, object_dir(self.link))
 
     def get_main_text(self):
         """Get the main text for the artwork.
@@ -64,17 +125,16 @@ class GoogleArtScraper(BaseArtScraper):
         str:
             The main text that was found.
         """
+        self._ensure_page()
         self.wait(self.min_wait, update=False)
+        paint_id = urlparse(self.link).path.split("/")[-1]
         try:
             elem = self.driver.find_element(
-                "xpath",
-                "/html/body/div[3]/div[3]/div/div/div[5]/section[1]/div")
+                "xpath", MAIN_TEXT_XPATH.format(paint_id=paint_id))
         except NoSuchElementException:
             return ''
-        if elem.get_attribute("id").startswith("metadata-"):
-            return ''
         inner_HTML = elem.get_attribute("innerHTML")
-        return BeautifulSoup(inner_HTML, features="html.parser").text
+        return html_text(inner_HTML)
 
     def _get_metadata(self):
         if self.output_dir is not None and self.meta_fp.is_file():
@@ -82,23 +142,17 @@ class GoogleArtScraper(BaseArtScraper):
                 metadata = json.load(f)
             return metadata
 
-        paint_id = urlparse(self.link).path.split("/")[-1]
-        self.wait(self.min_wait, update=False)
-        elem = self.driver.find_element("xpath", f'//*[@id="metadata-{paint_id}"]')
-        inner_HTML = elem.get_attribute("innerHTML")
-        soup = BeautifulSoup(inner_HTML, features="html.parser")
+        metadata = self._parse_static(lambda page: {"page": page})
+        if metadata is not None:
+            return metadata
 
-        paragraph_HTML = soup.find_all("li")
-        metadata = {}
-        metadata["main_text"] = self.get_main_text()
-        for par in paragraph_HTML:
-            name = par.find("span", text=True).contents[0].lower()[:-1]
-            metadata[name] = par.text[len(name) + 2:]
-        metadata["id"] = paint_id
-        return metadata
+        self._ensure_page()
+        self.wait(self.min_wait, update=False)
+        return self._parse_sources({"page": self.driver.page_source})
 
     def get_image(self):
         """Get a binary PNG image in memory."""
+        self._ensure_page()
         self.wait(self.min_wait)
         elem = self.driver.find_element(
             "xpath", "/html/body/div[3]/div[3]/div/div/div[2]/div[3]")
@@ -112,6 +166,7 @@ class GoogleArtScraper(BaseArtScraper):
         self.driver.find_element("xpath", "/html/body").send_keys(Keys.ESCAPE)
         return img
 
+    @traced()
     def save_image(self, img_fp=None, link=None):
         """Save the artwork image to a file.
 
@@ -129,10 +184,6 @@ class GoogleArtScraper(BaseArtScraper):
 
         img_fp = self._convert_img_fp(img_fp, suffix=".png")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
-
-    def close(self):
-        self.driver.close()
+        self._write_image(img_fp, self.get_image())
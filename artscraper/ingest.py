@@ -0,0 +1,278 @@
+"""Ingestion of the bulk open access dumps of the Met and the Art Institute.
+
+The Met publishes its open access catalogue as one CSV file (MetObjects.csv)
+and the Art Institute of Chicago a data dump with one JSON file per artwork
+(artic-api-data). Instead of requesting the metadata one object at a time,
+the dumps can be ingested into a MetadataStore: the files are streamed and
+stored in chunks, so memory use does not depend on the size of the dump.
+The records are converted to the metadata format of the scrapers, and a
+scraper with a metadata_store serves the metadata of the stored artworks
+from it, so that only the images (and for the Met, the page without a
+browser) are requested.
+"""
+
+import csv
+import json
+import sqlite3
+import tarfile
+import threading
+import zlib
+from itertools import islice
+from pathlib import Path
+
+from artscraper.canonical import canonical_key
+
+# Columns of MetObjects.csv -> field of the Met collection API, for the
+# columns that are not simply the camel-cased column name.
+MET_CSV_FIELDS = {
+    "Object ID": "objectID",
+    "Object Number": "accessionNumber",
+    "AccessionYear": "accessionYear",
+    "Gallery Number": "GalleryNumber",
+    "Artist ULAN URL": "artistULAN_URL",
+    "Artist Wikidata URL": "artistWikidata_URL",
+    "Object Wikidata URL": "objectWikidata_URL",
+    "Link Resource": "objectURL",
+}
+
+MET_BOOLEAN_FIELDS = ["isHighlight", "isTimelineWork", "isPublicDomain"]
+MET_INTEGER_FIELDS = ["objectID", "objectBeginDate", "objectEndDate"]
+
+# Part of the Art Institute API response that is not in the dump records.
+ARTIC_CONFIG = {
+    "iiif_url": "https://www.artic.edu/iiif/2",
+    "website_url": "http://www.artic.edu",
+}
+
+
+def _camel_case(column):
+    words = column.split()
+    return words[0].lower() + "".join(word[:1].upper() + word[1:]
+                                      for word in words[1:])
+
+
+def _met_record(row):
+    """Convert a row of MetObjects.csv to the format of the Met API."""
+    metadata = {}
+    for column, value in row.items():
+        if column is None:
+            continue
+        metadata[MET_CSV_FIELDS.get(column, _camel_case(column))] = value
+    for field in MET_BOOLEAN_FIELDS:
+        if field in metadata:
+            metadata[field] = metadata[field] == "True"
+    for field in MET_INTEGER_FIELDS:
+        try:
+            metadata[field] = int(metadata[field])
+        except (KeyError, ValueError):
+            pass
+
+    # Tags and their urls are "|" separated lists in the CSV.
+    terms = metadata.pop("tags", "")
+    aat_urls = metadata.pop("tagsAATURL", "").split("|")
+    wikidata_urls = metadata.pop("tagsWikidataURL", "").split("|")
+    metadata["tags"] = [
+        {"term": term,
+         "AAT_URL": aat_urls[i_term] if i_term < len(aat_urls) else "",
+         "Wikidata_URL": (wikidata_urls[i_term]
+                          if i_term < len(wikidata_urls) else "")}
+        for i_term, term in enumerate(terms.split("|")) if term] or None
+    return metadata
+
+
+def iter_met_csv(csv_fp):
+    """Stream the records of the Met open access CSV.
+
+    Parameters
+    ----------
+    csv_fp: str or Path
+        Path to MetObjects.csv.
+
+    Yields
+    ------
+    (str, dict):
+        Canonical link and metadata of each object, with the fields named as
+        in the Met collection API. The CSV has no image urls; the scraper
+        takes those from the artwork page.
+    """
+    with open(csv_fp, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            metadata = _met_record(row)
+            object_id = metadata.get("objectID")
+            if object_id in (None, ""):
+                continue
+            yield (f"https://www.metmuseum.org/art/collection/search/{object_id}",
+                   metadata)
+
+
+def _artic_item(record):
+    if "id" not in record:
+        return None
+    return (f"https://www.artic.edu/artworks/{record['id']}",
+            {"data": record, "config": ARTIC_CONFIG})
+
+
+def iter_artic_dump(dump_fp):
+    """Stream the artworks of the Art Institute data dump.
+
+    Parameters
+    ----------
+    dump_fp: str or Path
+        The extracted dump (a directory, in which the artworks are found in
+        json/artworks or any subdirectory called artworks) or the tar
+        archive of the dump, which is read as a stream.
+
+    Yields
+    ------
+    (str, dict):
+        Canonical link and metadata of each artwork, in the format of the
+        API response ({"data": ..., "config": ...}).
+    """
+    dump_fp = Path(dump_fp)
+    if dump_fp.is_dir():
+        for json_fp in sorted(dump_fp.glob("**/artworks/*.json")):
+            with open(json_fp, "r", encoding="utf-8") as f:
+                item = _artic_item(json.load(f))
+            if item is not None:
+                yield item
+        return
+
+    with tarfile.open(dump_fp, "r|*") as tar:
+        for member in tar:
+            path = Path(member.name)
+            if (not member.isfile() or path.suffix != ".json"
+                    or path.parent.name != "artworks"):
+                continue
+            item = _artic_item(json.load(tar.extractfile(member)))
+            if item is not None:
+                yield item
+
+
+# Dump format -> function that yields (link, metadata) from a dump file.
+DUMP_READERS = {
+    "met-csv": iter_met_csv,
+    "artic": iter_artic_dump,
+}
+
+
+class MetadataStore():
+    """Compressed store of artwork metadata, keyed on the artwork.
+
+    Artworks are identified by their canonical key (source, object id), so
+    that any link to an artwork finds its metadata.
+
+    Parameters
+    ----------
+    store_fp: str or Path
+        SQLite file to store the metadata in; created if needed.
+    level: int, default=6
+        Compression level of zlib.
+    """
+
+    def __init__(self, store_fp, level=6):
+        self.store_fp = store_fp
+        self.level = level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(store_fp), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata (source TEXT, "
+                "object_id TEXT, data BLOB, PRIMARY KEY (source, object_id))")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def _row(self, link, metadata):
+        source, object_id = canonical_key(link)
+        data = zlib.compress(json.dumps(metadata).encode("utf-8"), self.level)
+        return source, object_id, data
+
+    def add(self, items, chunk_size=1000):
+        """Store metadata, replacing older metadata of the same artworks.
+
+        Parameters
+        ----------
+        items: iterable of (str, dict)
+            Link and metadata of each artwork.
+        chunk_size: int, default=1000
+            Number of artworks stored per transaction. Only one chunk is
+            held in memory at a time.
+
+        Returns
+        -------
+        int:
+            The number of artworks stored.
+        """
+        items = iter(items)
+        n_stored = 0
+        while True:
+            rows = [self._row(link, metadata)
+                    for link, metadata in islice(items, chunk_size)]
+            if not rows:
+                return n_stored
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?)", rows)
+            n_stored += len(rows)
+
+    def __contains__(self, link):
+        """Whether the artwork of a link is stored, without loading it."""
+        try:
+            source, object_id = canonical_key(link)
+        except (KeyError, ValueError):
+            return False
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM metadata WHERE source = ? AND object_id = ?",
+                (source, object_id)).fetchone() is not None
+
+    def load(self, link):
+        """Load the metadata of the artwork of a link.
+
+        Returns
+        -------
+        dict or None:
+            The stored metadata, or None if the artwork is not stored or
+            the link has no artwork id.
+        """
+        try:
+            source, object_id = canonical_key(link)
+        except (KeyError, ValueError):
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM metadata WHERE source = ? AND object_id = ?",
+                (source, object_id)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+def ingest_dump(store, dump_format, dump_fp, chunk_size=1000):
+    """Stream a bulk dump into a metadata store.
+
+    Parameters
+    ----------
+    store: MetadataStore or str or Path
+        The store, or the file it is kept in.
+    dump_format: str
+        Format of the dump, one of DUMP_READERS ("met-csv" or "artic").
+    dump_fp: str or Path
+        The dump file (or directory for an extracted Art Institute dump).
+    chunk_size: int, default=1000
+        Number of artworks stored per transaction.
+
+    Returns
+    -------
+    int:
+        The number of artworks ingested.
+    """
+    if not isinstance(store, MetadataStore):
+        store = MetadataStore(store)
+    return store.add(DUMP_READERS[dump_format](dump_fp), chunk_size=chunk_size)
@@ -0,0 +1,199 @@
+"""Integrity index of saved images.
+
+When an image is saved, its size, a content hash and the Content-Length
+and ETag of the download are recorded. A file that was cut short (because
+of a crash or a broken connection) can then be recognized from a cheap
+stat call, without reading the images again, and only the broken artworks
+need to be downloaded again. Originals that an ImagePipeline removed after
+creating their derivatives are recorded as removed, not missing.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+OK = "ok"
+MISSING = "missing"
+SIZE_MISMATCH = "size mismatch"
+TRUNCATED = "truncated"
+HASH_MISMATCH = "hash mismatch"
+UNKNOWN = "unknown"
+REMOVED = "removed"
+
+
+def content_hash(data):
+    """str: BLAKE2b hash of binary data."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class IntegrityIndex():
+    """Record of the images saved in an output directory.
+
+    Parameters
+    ----------
+    root: str or Path
+        Output directory; the index is stored in .integrity.sqlite inside
+        it, and paths are stored relative to it.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(Path(self.root, ".integrity.sqlite")),
+                                     check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, "
+                "link TEXT, size INTEGER, hash TEXT, etag TEXT, "
+                "content_length INTEGER, saved REAL, removed REAL)")
+            columns = [row[1] for row in
+                       self._conn.execute("PRAGMA table_info(files)")]
+            if "removed" not in columns:
+                # Index of an older version.
+                self._conn.execute("ALTER TABLE files ADD COLUMN removed REAL")
+
+    def _key(self, img_fp):
+        img_fp = Path(img_fp).resolve()
+        try:
+            return str(img_fp.relative_to(self.root.resolve()))
+        except ValueError:
+            return str(img_fp)
+
+    def _path(self, key):
+        return Path(self.root, key)
+
+    def record(self, img_fp, data, link=None, headers=None):
+        """Record a saved image.
+
+        Parameters
+        ----------
+        img_fp: str or Path
+            Path the image was saved to.
+        data: bytes
+            The saved data.
+        link: str, optional
+            Url of the artwork, used to requeue it if the file breaks.
+        headers: dict, optional
+            Headers of the image download, for ETag and Content-Length.
+        """
+        headers = headers or {}
+        content_length = headers.get("Content-Length")
+        # With a compressed transfer, Content-Length is not the file size.
+        if headers.get("Content-Encoding") not in (None, "identity"):
+            content_length = None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, link, size, hash, etag, "
+                "content_length, saved) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(img_fp), link, len(data), content_hash(data),
+                 headers.get("ETag"),
+                 None if content_length is None else int(content_length),
+                 time.time()))
+
+    def record_removal(self, img_fp):
+        """Record that the original of an image was removed on purpose,
+        after its derivatives were created."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE files SET removed = ? WHERE path = ?",
+                               (time.time(), self._key(img_fp)))
+
+    def remove(self, img_fp):
+        """Remove an image from the index."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?",
+                               (self._key(img_fp),))
+
+    def _row(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT size, hash, content_length, removed FROM files "
+                "WHERE path = ?",
+                (key,)).fetchone()
+
+    def _check_row(self, key, row, deep=False):
+        if row is None:
+            return UNKNOWN
+        size, expected_hash, content_length, removed = row
+        img_fp = self._path(key)
+        try:
+            file_size = os.stat(img_fp).st_size
+        except FileNotFoundError:
+            return MISSING if removed is None else REMOVED
+        if content_length is not None and content_length != size:
+            return TRUNCATED
+        if file_size != size:
+            return SIZE_MISMATCH
+        if deep and content_hash(img_fp.read_bytes()) != expected_hash:
+            return HASH_MISMATCH
+        return OK
+
+    def check(self, img_fp, deep=False):
+        """Check a single image.
+
+        Parameters
+        ----------
+        img_fp: str or Path
+            Image to check.
+        deep: bool, default=False
+            Also compare the content hash, which reads the whole file.
+
+        Returns
+        -------
+        str:
+            One of OK, MISSING, SIZE_MISMATCH, TRUNCATED, HASH_MISMATCH,
+            REMOVED (if the original was removed after processing) or
+            UNKNOWN (if the image is not in the index).
+        """
+        key = self._key(img_fp)
+        return self._check_row(key, self._row(key), deep)
+
+    def is_complete(self, img_fp):
+        """Check whether an image was saved completely.
+
+        Images that are not in the index (for instance saved by an older
+        version) are considered complete if they exist, and removed
+        originals are complete.
+        """
+        status = self.check(img_fp)
+        if status == UNKNOWN:
+            return Path(img_fp).is_file()
+        return status in (OK, REMOVED)
+
+    def verify(self, deep=False, workers=8):
+        """Check all images in the index in parallel.
+
+        Parameters
+        ----------
+        deep: bool, default=False
+            Also compare content hashes.
+        workers: int, default=8
+            Number of threads to check files with.
+
+        Returns
+        -------
+        list of (pathlib.Path, str, str):
+            Path, link and status of every image that is neither OK nor
+            removed after processing.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, link, size, hash, content_length, removed "
+                "FROM files").fetchall()
+
+        def check_row(row):
+            return self._check_row(row[0], row[2:], deep)
+
+        with ThreadPoolExecutor(workers) as executor:
+            statuses = list(executor.map(check_row, rows))
+        return [(self._path(row[0]), row[1], status)
+                for row, status in zip(rows, statuses)
+                if status not in (OK, REMOVED)]
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
@@ -1,20 +1,63 @@
 """Module for MetScraper class."""
 
 import json
+import time
+from datetime import date
+from datetime import datetime
+from datetime import timezone
 from pathlib import Path
-import requests
 from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 
-from artscraper.base import BaseArtScraper
+from artscraper.bandwidth import IMAGE
+from artscraper.browser import BrowserScraper
+from artscraper.tracing import traced
+from artscraper.parsing import html_text
+from artscraper.parsing import make_soup
+from artscraper.transport import Transport
 
+MET_API = "https://collectionapi.metmuseum.org/public/collection/v1"
 
-class MetMuseumScraper(BaseArtScraper):
+# Approximate size of the longest side of primaryImageSmall ("web-large")
+# images in pixels.
+SMALL_IMAGE_SIZE = 800
+
+
+def parse_metadata(sources, link):  # pylint: disable=unused-argument
+    """Extract the metadata of an artwork from its raw responses.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses: the object from the collection API under "api" and
+        the rendered page source under "page".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    metadata = json.loads(sources["api"])
+    _add_page_fields(metadata, sources["page"])
+    return metadata
+
+
+def _add_page_fields(metadata, page):
+    """Add the main text and missing image url from the artwork page."""
+    soup = make_soup(page)
+    elem = soup.find(class_="artwork__intro__desc")
+    metadata['main_text'] = '' if elem is None else elem.get_text()
+
+    if not metadata.get('primaryImage', False):
+        elem = soup.find("meta", property="og:image")
+        metadata['primaryImage'] = None if elem is None else elem.get("content")
+
+
+class MetMuseumScraper(BrowserScraper):
     """Class for scraping Met Museum images.
 
     Parameters
@@ -28,14 +71,14 @@ class MetMuseumScraper(BaseArtScraper):
         of at least this value in seconds. The actual waiting time
         is randomly drawn from a polynomial distribution.
     """
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5,
-                 geckodriver_path="geckodriver"):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
-        self.driver = webdriver.Firefox(executable_path=geckodriver_path)
+    parse_metadata = staticmethod(parse_metadata)
 
-    def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.close()
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5,
+                 geckodriver_path="geckodriver", **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait,
+                         geckodriver_path=geckodriver_path, **kwargs)
 
+    @traced()
     def load_link(self, link):
         if link == self.link:
             return False
@@ -48,8 +91,8 @@ class MetMuseumScraper(BaseArtScraper):
                 return False
             self.paint_dir.mkdir(exist_ok=True)
 
-        self.wait(self.min_wait)
-        self.driver.get(link)
+        # With stored metadata, the page is fetched over HTTP instead.
+        self._load_page(link, postpone=self._has_stored_metadata())
         return True
 
     @property
@@ -63,47 +106,250 @@ class MetMuseumScraper(BaseArtScraper):
                 metadata = json.load(f)
             return metadata
 
+        metadata = self._stored_metadata()
+        if metadata is not None:
+            # Ingested from the open access CSV, which has no image urls;
+            # the server-rendered page has the main text and og:image.
+            _add_page_fields(metadata, self._page_source())
+            return metadata
+
         self.wait(self.min_wait, update=False)
         paint_id = urlparse(self.link).path.split("/")[4]
-        resp = requests.get(f"https://collectionapi.metmuseum.org/public/collection/v1/objects/{paint_id}")
-        metadata = resp.json()
-        metadata['main_text'] = self.get_main_text()
-
-        if not metadata.get('primaryImage', False):
-            metadata['primaryImage'] = self.get_image_url()
-
-        return metadata
+        resp = self.transport.get(f"{MET_API}/objects/{paint_id}")
+        return self._parse_sources({"api": resp.text,
+                                    "page": self._page_source()})
 
     def get_image_url(self):
+        self._ensure_page()
         elem = self.driver.find_element("xpath", '//meta[@property="og:image"]')
         return elem
 
     def get_main_text(self):
+        self._ensure_page()
         self.wait(self.min_wait, update=False)
         try:
             elem = self.driver.find_element(By.CLASS_NAME, 'artwork__intro__desc')
         except NoSuchElementException:
             return ''
         inner_HTML = elem.get_attribute("innerHTML")
-        return BeautifulSoup(inner_HTML, features="html.parser").text
+        return html_text(inner_HTML)
 
-    def get_image(self):
-        """Get a binary JPG image in memory."""
+    def _get_image_response(self, max_size=None):
         if self._meta_store['data']:
-            img_url = self._meta_store['data']['primaryImage']
+            metadata = self._meta_store['data']
         else:
-            img_url = self._get_metadata()['primaryImage']
+            metadata = self._get_metadata()
+
+        img_url = metadata['primaryImage']
+        if max_size is not None and max_size <= SMALL_IMAGE_SIZE:
+            img_url = metadata.get('primaryImageSmall') or img_url
+        return self.transport.get(img_url, priority=IMAGE)
 
-        return requests.get(img_url).content
+    def get_image(self, max_size=None):
+        """Get a binary JPG image in memory.
 
-    def save_image(self, img_fp=None, link=None):
-        """Save the artwork image to a file."""
+        If max_size is at most SMALL_IMAGE_SIZE pixels, the small version
+        of the image is downloaded instead of the original.
+        """
+        return self._get_image_response(max_size).content
+
+    def _thumbnail_url(self):
+        return self.get_metadata().get("primaryImageSmall")
+
+    @traced()
+    def save_image(self, img_fp=None, link=None, max_size=None):
+        """Save the artwork image to a file.
+
+        With a max_size (by default the max_size of the scraper) of at most
+        SMALL_IMAGE_SIZE pixels, the small version of the image is saved.
+        """
         if link is not None:
-            self.load_link()
+            self.load_link(link)
+        if max_size is None:
+            max_size = self.max_size
 
         img_fp = self._convert_img_fp(img_fp, suffix=".jpg")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
+        if self._is_duplicate(self._thumbnail_url):
+            return
+        response = self._get_image_response(max_size)
+        self._write_image(img_fp, response.content, response.headers)
+
+
+def sync_collection(output_dir, since=None, *, state_fp=None,  # pylint: disable=too-many-arguments,too-many-locals
+                    only_existing=True, images=True, transport=None,
+                    min_wait=0.05, max_size=None, integrity_index=None,
+                    writer=None):
+    """Update stored Met artworks that changed since the last sync.
+
+    The Met API lists the objects whose metadata changed since a date. Only
+    those objects are fetched again; their metadata.json is updated in place
+    (keeping fields that do not come from the API, such as main_text) and
+    the image is downloaded again if its url changed. No browser is needed.
+
+    Objects whose request fails (e.g. 429 or 5xx) are skipped and the date
+    of the last sync is not advanced, so that the next sync tries them
+    again.
+
+    Parameters
+    ----------
+    output_dir: str or Path
+        Output directory of a MetMuseumScraper.
+    since: str, datetime.date, optional
+        Only update objects changed since this date (YYYY-MM-DD). By default
+        the date of the last sync, read from state_fp. If there was no
+        previous sync, all objects are considered changed.
+    state_fp: str or Path, optional
+        File that stores the date of the last sync, by default
+        .met_sync.json in the output directory.
+    only_existing: bool, default=True
+        Only update artworks that are already stored. If false, changed
+        artworks that are not stored yet are added as well, with the link
+        and the main text of their page, as stored by the scraper.
+    images: bool, default=True
+        Download the images of artworks whose image url changed or whose
+        image is missing.
+    transport: artscraper.transport.Transport, optional
+        Transport for the HTTP requests.
+    min_wait: float, default=0.05
+        Minimum time between requests to the API.
+    max_size: int, optional
+        If at most SMALL_IMAGE_SIZE, download the small versions of images.
+    integrity_index: artscraper.integrity.IntegrityIndex, optional
+        Record the downloaded images in this index.
+    writer: artscraper.writer.AsyncWriter, optional
+        Write the images and metadata on the threads of this writer.
+
+    Returns
+    -------
+    dict:
+        Number of changed, updated, downloaded and failed objects.
+    """
+    output_dir = Path(output_dir)
+    if state_fp is None:
+        state_fp = Path(output_dir, ".met_sync.json")
+    if transport is None:
+        transport = Transport()
+    if since is None and Path(state_fp).is_file():
+        with open(state_fp, "r", encoding="utf-8") as f:
+            since = json.load(f)["last_sync"]
+    if isinstance(since, (date, datetime)):
+        since = since.strftime("%Y-%m-%d")
+
+    # Take the date before listing, so that changes made during the sync
+    # are picked up next time.
+    sync_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    params = {} if since is None else {"metadataDate": since}
+    response = transport.get(f"{MET_API}/objects", params=params)
+    response.raise_for_status()
+    object_ids = response.json().get("objectIDs") or []
+
+    # The images are written like the scraper writes them (atomically, and
+    # recorded in the integrity index); its browser is never started.
+    scraper = MetMuseumScraper(output_dir, skip_existing=False,
+                               transport=transport,
+                               integrity_index=integrity_index, writer=writer)
+    last_request = 0
+
+    def get(url, **kwargs):
+        nonlocal last_request
+        time.sleep(max(0, min_wait - (time.time() - last_request)))
+        last_request = time.time()
+        return transport.get(url, **kwargs)
+
+    options = {"only_existing": only_existing, "images": images,
+               "max_size": max_size}
+    summary = {"changed": len(object_ids), "updated": 0, "images": 0,
+               "failed": 0}
+    with scraper:
+        for object_id in object_ids:
+            scraper.link = f"https://www.metmuseum.org/art/collection/search/{object_id}"
+            status = _sync_object(scraper, get, object_id, options)
+            if status == "failed":
+                summary["failed"] += 1
+            elif status != "skipped":
+                summary["updated"] += 1
+                summary["images"] += status == "image"
+
+    if not summary["failed"]:
+        with open(state_fp, "w", encoding="utf-8") as f:
+            json.dump({"last_sync": sync_date}, f)
+    return summary
+
+
+def _sync_object(scraper, get, object_id, options):
+    """Update the stored metadata and image of one object, see sync_collection.
+
+    Parameters
+    ----------
+    scraper: MetMuseumScraper
+        Scraper with the link of the object loaded, to write with.
+    get: callable
+        Rate limited transport.get.
+    object_id: int
+        Id of the object in the Met API.
+    options: dict
+        The only_existing, images and max_size options of sync_collection.
+
+    Returns
+    -------
+    str:
+        "skipped", "failed", "updated" or "image" (updated with the image).
+    """
+    meta_fp = scraper.meta_fp
+    if options["only_existing"] and not meta_fp.is_file():
+        return "skipped"
+
+    response = get(f"{MET_API}/objects/{object_id}")
+    if response.status_code == 404:
+        return "skipped"
+    if response.status_code != 200:
+        return "failed"
+    new_metadata = response.json()
+
+    if meta_fp.is_file():
+        with open(meta_fp, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+    else:
+        # A new artwork: add the fields that the scraper takes from the page.
+        page = get(scraper.link)
+        if page.status_code != 200:
+            return "failed"
+        metadata = {"link": scraper.link}
+        _add_page_fields(new_metadata, page.text)
+    old_image = metadata.get("primaryImage")
+    metadata.update(new_metadata)
+
+    # Same default image path as MetMuseumScraper.save_image.
+    img_fp = scraper._convert_img_fp(suffix=".jpg")  # pylint: disable=protected-access
+    img_url = metadata.get("primaryImage")
+    image = None
+    if (options["images"] and img_url
+            and (img_url != old_image or not img_fp.is_file())):
+        max_size = options["max_size"]
+        if max_size is not None and max_size <= SMALL_IMAGE_SIZE:
+            img_url = metadata.get("primaryImageSmall") or img_url
+        image = get(img_url, priority=IMAGE)
+        if image.status_code != 200:
+            # Keep the old metadata, so that the image url still differs at
+            # the next sync.
+            return "failed"
+
+    _write_metadata(scraper, metadata)
+    if image is not None:
+        scraper._write_image(img_fp, image.content, image.headers)  # pylint: disable=protected-access
+    return "updated" if image is None else "image"
+
+
+def _write_metadata(scraper, metadata):
+    """Replace the metadata.json of the loaded artwork atomically."""
+    scraper.paint_dir.mkdir(parents=True, exist_ok=True)
+    if scraper.writer is not None:
+        scraper.writer.write_json(scraper.meta_fp, metadata)
+        return
+    tmp_fp = Path(scraper.paint_dir, "metadata.json.tmp")
+    with open(tmp_fp, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    tmp_fp.replace(scraper.meta_fp)
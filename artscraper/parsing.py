@@ -0,0 +1,162 @@
+"""HTML parsing helpers shared by the scrapers.
+
+BeautifulSoup is used with the fastest tree builder that is installed
+(lxml if available, otherwise the pure-Python html.parser). For cases
+where only a single attribute is needed from a page, find_attribute
+scans the markup without building a tree at all, and find_path looks up
+the absolute XPath expressions used with selenium in a parsed page.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401  pylint: disable=unused-import
+    PARSER_FEATURES = "lxml"
+except ImportError:
+    PARSER_FEATURES = "html.parser"
+
+
+def make_soup(markup, features=None):
+    """Parse HTML markup into a BeautifulSoup tree.
+
+    Parameters
+    ----------
+    markup: str, bytes or file-like
+        HTML to parse.
+    features: str, optional
+        BeautifulSoup tree builder to use. By default the fastest available
+        builder is used (see PARSER_FEATURES).
+
+    Returns
+    -------
+    bs4.BeautifulSoup:
+        The parsed document.
+    """
+    if features is None:
+        features = PARSER_FEATURES
+    return BeautifulSoup(markup, features=features)
+
+
+def html_text(markup):
+    """Get the text content of a HTML fragment."""
+    return make_soup(markup).text
+
+
+_PATH_STEP = re.compile(r"(\w+|\*)(?:\[(\d+)\])?")
+
+
+def find_path(root, path):
+    """Find an element by a simple absolute XPath, such as /html/body/div[3].
+
+    Only steps with a tag name (or *) and an optional 1-based index are
+    supported, which is enough to replay the paths used with selenium on a
+    stored page.
+
+    Parameters
+    ----------
+    root: bs4.BeautifulSoup or bs4.Tag
+        Document or element to start from.
+    path: str
+        Path of child steps separated by slashes.
+
+    Returns
+    -------
+    bs4.Tag or None:
+        The first matching element in document order, or None.
+    """
+    nodes = [root]
+    for step in path.strip("/").split("/"):
+        match = _PATH_STEP.fullmatch(step)
+        if match is None:
+            raise ValueError(f"Unsupported XPath step: {step}")
+        name, index = match.groups()
+        next_nodes = []
+        for node in nodes:
+            children = node.find_all(None if name == "*" else name,
+                                     recursive=False)
+            if index is None:
+                next_nodes.extend(children)
+            elif len(children) >= int(index):
+                next_nodes.append(children[int(index) - 1])
+        nodes = next_nodes
+    return nodes[0] if nodes else None
+
+
+class _AttributeFound(Exception):
+    """Raised internally to stop parsing once the attribute is found."""
+
+
+class _AttributeFinder(HTMLParser):
+    """Streaming parser that stops at the first matching start tag."""
+
+    def __init__(self, tag, attr, class_=None):
+        super().__init__(convert_charrefs=True)
+        self.tag = tag
+        self.attr = attr
+        self.class_ = class_
+        self.value = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag != self.tag:
+            return
+        attrs = dict(attrs)
+        if self.class_ is not None:
+            classes = (attrs.get("class") or "").split()
+            if self.class_ not in classes:
+                return
+        if self.attr in attrs:
+            self.value = attrs[self.attr]
+            raise _AttributeFound()
+
+    handle_startendtag = handle_starttag
+
+
+def find_attribute(markup, tag, attr, class_=None, chunk_size=16384):
+    """Find the value of an attribute without building a document tree.
+
+    The markup is fed incrementally to a streaming parser, which stops
+    as soon as a matching tag is found. If markup is a file-like object
+    or an iterator of chunks (such as the iter_content of a streamed
+    HTTP response), the rest of the page is not even read.
+
+    Parameters
+    ----------
+    markup: str, bytes, file-like or iterable of str/bytes
+        HTML to search.
+    tag: str
+        Name of the tag that has the attribute, e.g. "div".
+    attr: str
+        Name of the attribute, e.g. "data-idsid".
+    class_: str, optional
+        If given, only consider tags that have this CSS class.
+    chunk_size: int, default=16384
+        Number of bytes/characters read per step for file-like input.
+
+    Returns
+    -------
+    str or None:
+        The attribute value, or None if no matching tag was found.
+    """
+    finder = _AttributeFinder(tag, attr, class_)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    if hasattr(markup, "read"):
+        chunks = iter(lambda: markup.read(chunk_size), b"")
+    elif isinstance(markup, (str, bytes)):
+        chunks = [markup]
+    else:
+        chunks = markup
+    try:
+        for chunk in chunks:
+            if not chunk:
+                break
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk)
+            finder.feed(chunk)
+        finder.close()
+    except _AttributeFound:
+        pass
+    return finder.value
@@ -4,15 +4,48 @@ import json
 from pathlib import Path
 from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.keys import Keys
 
-from artscraper.base import BaseArtScraper
+from artscraper.browser import BrowserScraper
+from artscraper.tracing import traced
+from artscraper.parsing import make_soup
 
 
-class PhiladelphiaMuseumScraper(BaseArtScraper):
+def parse_metadata(sources, link):
+    """Extract the metadata of an artwork from its page source.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the rendered page source under "page".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    paint_id = urlparse(link).path.split("/")[-1]
+    soup = make_soup(sources["page"])
+    table = soup.find(attrs={"aria-labelledby": "object decription"})
+    if table is None:
+        raise ValueError(f"Cannot find the metadata of {link}.")
+
+    metadata = {}
+    # No main text for the artwork.
+    metadata["main_text"] = ''
+    for element in (table.find("tbody") or table).find_all("tr"):
+        elems_HTML = element.find_all("td")
+        name = elems_HTML[0].span.text.strip().lower()
+        metadata[name] = elems_HTML[1].span.text.strip().lower()
+    metadata["id"] = paint_id
+    return metadata
+
+
+class PhiladelphiaMuseumScraper(BrowserScraper):
     """Class for scraping Philadelphia Museum images.
 
     Parameters
@@ -27,13 +60,12 @@ class PhiladelphiaMuseumScraper(BaseArtScraper):
         is randomly drawn from a polynomial distribution.
     """
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
-        self.driver = webdriver.Firefox()
+    parse_metadata = staticmethod(parse_metadata)
 
-    def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.close()
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5, **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait, **kwargs)
 
+    @traced()
     def load_link(self, link):
         if link == self.link:
             return False
@@ -46,8 +78,7 @@ class PhiladelphiaMuseumScraper(BaseArtScraper):
                 return False
             self.paint_dir.mkdir(exist_ok=True, parents=True)
 
-        self.wait(self.min_wait)
-        self.driver.get(link)
+        self._load_page(link)
         return True
 
     @property
@@ -72,26 +103,17 @@ class PhiladelphiaMuseumScraper(BaseArtScraper):
                 metadata = json.load(f)
             return metadata
 
-        paint_id = urlparse(self.link).path.split("/")[-1]
-        self.wait(self.min_wait, update=False)
-        elem = self.driver.find_element("xpath", f'//*[@aria-labelledby="object decription"]/tbody')
-        inner_HTML = elem.get_attribute("innerHTML")
-        soup = BeautifulSoup(inner_HTML, features="html.parser")
-
-        metadata = {}
-        metadata["main_text"] = self.get_main_text()
-
-        table_HTML = soup.find_all("tr")
+        metadata = self._parse_static(lambda page: {"page": page})
+        if metadata is not None:
+            return metadata
 
-        for element in table_HTML:
-            elems_HTML = element.find_all("td")
-            name = elems_HTML[0].span.text.strip().lower()
-            metadata[name] = elems_HTML[1].span.text.strip().lower()
-        metadata["id"] = paint_id
-        return metadata
+        self._ensure_page()
+        self.wait(self.min_wait, update=False)
+        return self._parse_sources({"page": self.driver.page_source})
 
     def get_image(self):
         """Get a binary PNG image in memory."""
+        self._ensure_page()
         self.wait(self.min_wait)
         # click the zoom button to enlarge the image
         zoom_button = self.driver.find_element(
@@ -107,6 +129,7 @@ class PhiladelphiaMuseumScraper(BaseArtScraper):
         self.driver.find_element("xpath", "/html/body").send_keys(Keys.ESCAPE)
         return img
 
+    @traced()
     def save_image(self, img_fp=None, link=None):
         """Save the artwork image to a file.
 
@@ -124,10 +147,6 @@ class PhiladelphiaMuseumScraper(BaseArtScraper):
 
         img_fp = self._convert_img_fp(img_fp, suffix=".png")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
-
-    def close(self):
-        self.driver.close()
+        self._write_image(img_fp, self.get_image())
@@ -0,0 +1,181 @@
+"""Post-processing of saved images in a pool of worker processes.
+
+An ImagePipeline can be passed to any scraper (image_pipeline=...). Each
+image that the scraper saves is then submitted to a process pool, which
+creates resized and/or transcoded derivatives while the crawl continues.
+Requires Pillow.
+"""
+
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+Derivative = namedtuple("Derivative", ["name", "max_size", "format", "quality"],
+                        defaults=(None, "JPEG", 90))
+Derivative.__doc__ = """Description of an image derivative.
+
+Parameters
+----------
+name: str
+    Name of the derivative, appended to the stem of the original image,
+    e.g. "thumb" turns "artwork.png" into "artwork_thumb.jpg".
+max_size: int, optional
+    Maximum width and height in pixels; the aspect ratio is preserved.
+    If None, the image is not resized.
+format: str, default="JPEG"
+    Pillow format name of the output, e.g. "JPEG", "WEBP" or "PNG".
+quality: int, default=90
+    Encoder quality for lossy formats.
+"""
+
+_SUFFIXES = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+
+
+def derivative_fp(img_fp, derivative):
+    """pathlib.Path: Path of a derivative of an image file."""
+    img_fp = Path(img_fp)
+    suffix = _SUFFIXES.get(derivative.format.upper(),
+                           "." + derivative.format.lower())
+    return Path(img_fp.parent, f"{img_fp.stem}_{derivative.name}{suffix}")
+
+
+def process_image(img_fp, derivatives, remove_original=False):
+    """Create the derivatives of a single image.
+
+    This function runs inside the worker processes, but can also be
+    called directly.
+
+    Parameters
+    ----------
+    img_fp: str or Path
+        Image to process.
+    derivatives: list of Derivative
+        Derivatives to create.
+    remove_original: bool, default=False
+        If true, remove the original once all derivatives are written.
+
+    Returns
+    -------
+    list of pathlib.Path:
+        Paths to the created derivatives.
+    """
+    try:
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError("Image post-processing requires Pillow, install "
+                          "it with 'pip install Pillow'.") from error
+
+    out_fps = []
+    with Image.open(img_fp) as img:
+        img.load()
+        for derivative in derivatives:
+            out_img = img
+            if derivative.format.upper() == "JPEG" and img.mode != "RGB":
+                out_img = img.convert("RGB")
+            if derivative.max_size is not None:
+                out_img = out_img.copy()
+                out_img.thumbnail((derivative.max_size, derivative.max_size))
+            out_fp = derivative_fp(img_fp, derivative)
+            out_img.save(out_fp, format=derivative.format,
+                         quality=derivative.quality)
+            out_fps.append(out_fp)
+    if remove_original:
+        Path(img_fp).unlink()
+    return out_fps
+
+
+class ImagePipeline():
+    """Create image derivatives in the background.
+
+    Parameters
+    ----------
+    derivatives: list of Derivative
+        Derivatives to create for each image.
+    processes: int, optional
+        Number of worker processes, by default the number of CPUs.
+    remove_original: bool, default=False
+        Remove the original image after the derivatives are created. This
+        is mostly useful for the large PNG screenshots of the browser based
+        scrapers.
+    max_pending: int, optional
+        Maximum number of images that are waiting to be processed. When this
+        is reached, submitting blocks until the oldest image is done, so
+        that the crawl cannot outrun the pipeline. By default 4 times the
+        number of processes.
+    """
+
+    def __init__(self, derivatives, processes=None, remove_original=False,
+                 max_pending=None):
+        self.derivatives = list(derivatives)
+        if remove_original and not self.derivatives:
+            raise ValueError("Removing the originals requires at least one "
+                             "derivative.")
+        self.remove_original = remove_original
+        if processes is None:
+            processes = os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+        if max_pending is None:
+            max_pending = 4 * processes
+        self.max_pending = max_pending
+        self._pending = []
+        # Images can be submitted from several threads (e.g. an AsyncWriter).
+        self._lock = threading.Lock()
+        self.errors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def submit(self, img_fp):
+        """Queue an image for processing.
+
+        Parameters
+        ----------
+        img_fp: str or Path
+            Image that was just saved.
+        """
+        with self._lock:
+            self._collect(block=len(self._pending) >= self.max_pending)
+            future = self._executor.submit(process_image, img_fp,
+                                           self.derivatives,
+                                           self.remove_original)
+            self._pending.append((img_fp, future))
+        return future
+
+    def outputs_exist(self, img_fp):
+        """Check whether all derivatives of an image are present.
+
+        Used by the scrapers to skip images whose original has been removed
+        after processing. Without derivatives, there are no outputs and
+        this is always false.
+        """
+        return bool(self.derivatives) and all(
+            derivative_fp(img_fp, derivative).is_file()
+            for derivative in self.derivatives)
+
+    def _collect(self, block=False):
+        """Remove finished jobs, optionally waiting for the oldest."""
+        if block and self._pending:
+            self._pending[0][1].exception()
+        still_pending = []
+        for img_fp, future in self._pending:
+            if not future.done():
+                still_pending.append((img_fp, future))
+            elif future.exception() is not None:
+                self.errors.append((img_fp, future.exception()))
+        self._pending = still_pending
+
+    def wait(self):
+        """Wait until all submitted images are processed."""
+        with self._lock:
+            while self._pending:
+                self._collect(block=True)
+
+    def close(self):
+        """Wait for all images and shut down the worker processes."""
+        self.wait()
+        self._executor.shutdown()
@@ -0,0 +1,302 @@
+"""Adaptive per-host rate control.
+
+The fixed min_wait of a scraper is a guess: too long for a host that can
+take more requests, too short for one that starts throttling. An
+AdaptiveRateController adjusts the request rate of each host while
+crawling, AIMD-style (additive increase, multiplicative decrease): every
+fast response increases the rate a little, while throttling (429/503
+responses), failed requests and responses that are much slower than usual
+halve it. A Retry-After header pauses the host for the requested time. The
+rate always stays between a floor and a ceiling set by the user.
+
+The controller is attached to a Transport, which reports every response to
+it; the scrapers then use the interval of the controller as their min_wait.
+Each host (full hostname) has its own rate, which starts at the min_wait of
+the scraper. A scraper waits for the slowest of the host of its links and
+the other hosts it requests while scraping them (API and image servers),
+so that throttling by any of them slows the scraper down.
+
+Parallel workers each have their own scrapers, and so their own time of
+the last request. A RequestClock shared by all scrapers keeps one time per
+host instead, so that N workers together keep to the rate of one scraper.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Status codes with which servers ask clients to slow down.
+THROTTLE_STATUS = (429, 503)
+
+
+def rate_host(url):
+    """Get the host a request counts against for rate control.
+
+    Returns
+    -------
+    str or None:
+        The hostname of the url, or None if it has none.
+    """
+    return urlparse(url).hostname or None
+
+
+def parse_retry_after(value, now=None):
+    """Convert a Retry-After header to a number of seconds.
+
+    Parameters
+    ----------
+    value: str or None
+        Value of the header, either a number of seconds or an HTTP date.
+    now: float, optional
+        Current time, by default time.time().
+
+    Returns
+    -------
+    float or None:
+        Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+    return max(0.0, retry_time - (time.time() if now is None else now))
+
+
+class RequestClock():
+    """Time of the last request to each host, shared between scrapers.
+
+    Scrapers reserve the start time of their next request, so that the
+    requests of scrapers on different threads to the same host are spaced
+    as if they came from one scraper.
+    """
+
+    def __init__(self):
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def last_request(self, url):
+        """Time (as time.time()) of the last (reserved) request to a host."""
+        with self._lock:
+            return self._last.get(rate_host(url), 0)
+
+    def update(self, url, request_time):
+        """Record a request to a host that was made without reserving it."""
+        host = rate_host(url)
+        with self._lock:
+            self._last[host] = max(self._last.get(host, 0), request_time)
+
+    def reserve(self, url, wait_time, not_before=0):
+        """Reserve the time of the next request to a host.
+
+        Parameters
+        ----------
+        url: str
+            Any url of the host.
+        wait_time: float
+            Minimum time after the previous request in seconds.
+        not_before: float, default=0
+            Earliest allowed time, e.g. when a Retry-After ends.
+
+        Returns
+        -------
+        float:
+            Time (as time.time()) at which the request may be made.
+        """
+        host = rate_host(url)
+        with self._lock:
+            start = max(time.time(), self._last.get(host, 0) + wait_time,
+                        not_before)
+            self._last[host] = start
+            return start
+
+
+class _HostState():
+    """Rate and statistics of one host."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.latency = None
+        self.baseline = None
+        self.blocked_until = 0
+        self.last_decrease = 0
+        self.requests = 0
+        self.throttled = 0
+        self.slow = 0
+        self.failed = 0
+        self.decreases = 0
+
+
+class AdaptiveRateController():
+    """Adjust the request rate of each host to its responses.
+
+    Parameters
+    ----------
+    min_interval: float, default=0.1
+        Floor of the time between requests to a host in seconds, i.e. the
+        highest allowed rate.
+    max_interval: float, default=60
+        Ceiling of the time between requests in seconds, i.e. the lowest
+        allowed rate.
+    increase: float, default=0.01
+        Requests per second added to the rate of a host after each response
+        that is neither throttled nor slow.
+    decrease: float, default=0.5
+        Factor with which the rate is multiplied on throttling.
+    latency_factor: float, default=3
+        A response is slow, and the rate is decreased, if it takes longer
+        than this many times the usual latency of the host (the lowest
+        moving average of its latency so far).
+    """
+
+    def __init__(self, min_interval=0.1, max_interval=60, increase=0.01,
+                 decrease=0.5, latency_factor=3):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Need 0 < min_interval <= max_interval.")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self._hosts = {}
+        # Host of the links of a scraper -> other hosts it requests.
+        self._related = {}
+        # Link host and min_wait of the scraper on each thread, from the
+        # last call to interval.
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _clip(self, rate):
+        return min(max(rate, 1 / self.max_interval), 1 / self.min_interval)
+
+    def _state(self, host, interval):
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(self._clip(1 / max(interval, 1e-9)))
+            self._hosts[host] = state
+        return state
+
+    def _group(self, host):
+        return [host, *self._related.get(host, ())]
+
+    def interval(self, url, default):
+        """Get the current minimum time between requests for a link.
+
+        This is the longest interval of the host of the link and the other
+        hosts requested while scraping links of that host. The responses
+        observed on the same thread are counted as requests for this link,
+        until interval is called for a link of another host.
+
+        Parameters
+        ----------
+        url: str
+            Url of the artwork (or any url of its host).
+        default: float
+            Starting interval of hosts without requests yet, the min_wait
+            of the scraper.
+
+        Returns
+        -------
+        float:
+            The interval in seconds.
+        """
+        host = rate_host(url)
+        if host is None:
+            return default
+        self._local.host = host
+        self._local.default = default
+        with self._lock:
+            return max(1 / self._state(other, default).rate
+                       for other in self._group(host))
+
+    def blocked_until(self, url):
+        """Time (as time.time()) until which a Retry-After pauses requests
+        for a link, see interval."""
+        with self._lock:
+            return max([self._hosts[other].blocked_until
+                        for other in self._group(rate_host(url))
+                        if other in self._hosts] or [0])
+
+    def observe(self, url, latency, status=200, retry_after=None):
+        """Adjust the rate of a host to a response.
+
+        Parameters
+        ----------
+        url: str
+            Url of the request.
+        latency: float
+            Time in seconds until the response (headers) arrived.
+        status: int or None, default=200
+            HTTP status code, or None if the request failed without a
+            response (connection error, timeout).
+        retry_after: str, optional
+            Value of the Retry-After header of the response.
+        """
+        host = rate_host(url)
+        if host is None:
+            return
+        now = time.time()
+        link_host = getattr(self._local, "host", None)
+        # Without a scraper on this thread, start at the lowest rate.
+        default = getattr(self._local, "default", None) or self.max_interval
+        with self._lock:
+            if link_host is not None and host != link_host:
+                self._related.setdefault(link_host, set()).add(host)
+            state = self._state(host, default)
+            state.requests += 1
+            throttled = status is None or status in THROTTLE_STATUS
+            slow = False
+            if status is None:
+                state.failed += 1
+            elif status in THROTTLE_STATUS:
+                state.throttled += 1
+            else:
+                slow = (state.baseline is not None and
+                        latency > self.latency_factor * state.baseline)
+                state.latency = (latency if state.latency is None
+                                 else 0.8 * state.latency + 0.2 * latency)
+                state.baseline = (state.latency if state.baseline is None
+                                  else min(state.baseline, state.latency))
+                state.slow += slow
+
+            delay = parse_retry_after(retry_after, now)
+            if delay is not None:
+                state.blocked_until = max(state.blocked_until, now + delay)
+            if throttled or slow:
+                # Decrease once per round trip: responses to requests sent
+                # before the last decrease already reflect the old rate.
+                if now - latency >= state.last_decrease:
+                    state.rate = self._clip(state.rate * self.decrease)
+                    state.last_decrease = now
+                    state.decreases += 1
+            else:
+                state.rate = self._clip(state.rate + self.increase)
+
+    def metrics(self):
+        """Current rate and statistics of every host.
+
+        Returns
+        -------
+        dict:
+            Host -> dict with the rate (requests per second), interval and
+            usual latency (seconds), and counts of requests, throttled,
+            slow and failed responses and rate decreases.
+        """
+        with self._lock:
+            return {host: {
+                "rate": round(state.rate, 4),
+                "interval": round(1 / state.rate, 3),
+                "latency": None if state.baseline is None
+                else round(state.baseline, 3),
+                "requests": state.requests,
+                "throttled": state.throttled,
+                "slow": state.slow,
+                "failed": state.failed,
+                "decreases": state.decreases,
+            } for host, state in self._hosts.items()}
@@ -0,0 +1,301 @@
+"""Compact typed records of artwork metadata.
+
+Each scraper returns a differently shaped metadata dictionary. An
+ArtworkRecord holds the fields that all sources have in common as typed
+attributes, and keeps the remaining fields as serialized bytes that are
+only decoded when accessed. For millions of records, a RecordBatch stores
+the same information column-wise in flat buffers, which avoids the
+overhead of one Python object per field.
+"""
+
+import json
+import zlib
+from array import array
+
+from artscraper.sources import source_of
+
+CORE_FIELDS = ["source", "object_id", "link", "title", "artist", "date",
+               "image_url"]
+
+# For each source and core field, the metadata keys that contain it, in
+# order of preference. Keys are compared case-insensitively.
+FIELD_KEYS = {
+    "wikiart": {
+        "object_id": ["id"], "title": ["title"], "artist": ["artistName"],
+        "date": ["completitionYear"], "image_url": ["image"],
+    },
+    "googleart": {
+        "object_id": ["id"], "title": ["title"],
+        "artist": ["creator", "artist"],
+        "date": ["date created", "date"], "image_url": [],
+    },
+    "met": {
+        "object_id": ["objectID"], "title": ["title"],
+        "artist": ["artistDisplayName"], "date": ["objectDate"],
+        "image_url": ["primaryImage"],
+    },
+    "artic": {
+        "object_id": ["id"], "title": ["title"],
+        "artist": ["artist_display", "artist_title"],
+        "date": ["date_display"], "image_url": ["image_id"],
+    },
+    "getty": {
+        "object_id": ["@id", "id"], "title": ["label", "title"],
+        "artist": ["artist/maker", "artist"], "date": ["date"],
+        "image_url": ["thumbnail"],
+    },
+    "philamuseum": {
+        "object_id": ["id"], "title": ["title"],
+        "artist": ["artist/maker", "artist", "maker"], "date": ["date"],
+        "image_url": [],
+    },
+    "rijksmuseum": {
+        "object_id": ["id", "object number"], "title": ["title(s)", "title"],
+        "artist": ["maker", "artist"], "date": ["date"], "image_url": [],
+    },
+    "smithsonian": {
+        "object_id": ["id", "EDAN-URL", "ID Number"], "title": ["Title"],
+        "artist": ["Artist", "Creator", "Maker"], "date": ["Date"],
+        "image_url": ["img_url"],
+    },
+}
+
+# Metadata is compressed when its JSON is longer than this.
+_COMPRESS_SIZE = 512
+
+
+def _encode_extras(extras):
+    if not extras:
+        return b""
+    data = json.dumps(extras, separators=(",", ":"), default=str).encode("utf-8")
+    if len(data) > _COMPRESS_SIZE:
+        return b"z" + zlib.compress(data, 1)
+    return b"j" + data
+
+
+def _decode_extras(data):
+    if not data:
+        return {}
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]))
+    return json.loads(data[1:])
+
+
+def _text(value):
+    """Convert a metadata value to a string, or None if it is empty."""
+    if value is None or value == "" or value == []:
+        return None
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+class ArtworkRecord():
+    """Metadata of a single artwork with typed core fields.
+
+    Parameters
+    ----------
+    source: str
+        Name of the source, e.g. "wikiart".
+    object_id: str
+        Identifier of the artwork at the source.
+    link: str, optional
+        Url the artwork was scraped from.
+    title, artist, date, image_url: str, optional
+        Common metadata of the artwork.
+    extras: dict or bytes, optional
+        All other metadata; stored serialized and decoded on access.
+    """
+
+    __slots__ = CORE_FIELDS + ["_extras"]
+
+    def __init__(self, source, object_id, link=None, title=None, artist=None,
+                 date=None, image_url=None, extras=None):
+        self.source = source
+        self.object_id = object_id
+        self.link = link
+        self.title = title
+        self.artist = artist
+        self.date = date
+        self.image_url = image_url
+        if isinstance(extras, (bytes, bytearray)):
+            self._extras = bytes(extras)
+        else:
+            self._extras = _encode_extras(extras)
+
+    def __repr__(self):
+        return (f"ArtworkRecord(source={self.source!r}, "
+                f"object_id={self.object_id!r}, title={self.title!r})")
+
+    def __eq__(self, other):
+        if not isinstance(other, ArtworkRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    @property
+    def extras(self):
+        """dict: Metadata fields that are not core fields (decoded copy)."""
+        return _decode_extras(self._extras)
+
+    @property
+    def extras_bytes(self):
+        """bytes: The serialized extra metadata."""
+        return self._extras
+
+    @classmethod
+    def from_metadata(cls, metadata, source=None):
+        """Create a record from the metadata returned by any scraper.
+
+        Parameters
+        ----------
+        metadata: dict
+            Metadata as returned by get_metadata or stored in metadata.json.
+        source: str, optional
+            Name of the source; detected from metadata["link"] if not given.
+
+        Returns
+        -------
+        ArtworkRecord:
+            The record; fields that are not core fields end up in extras.
+        """
+        # The Art Institute API wraps the artwork in a "data" field.
+        if "data" in metadata and isinstance(metadata["data"], dict):
+            metadata = dict(metadata["data"], link=metadata.get("link"))
+        link = metadata.get("link")
+        if source is None:
+            if link is None:
+                raise ValueError("Supply the source for metadata without a link.")
+            source = source_of(link)
+
+        lower_keys = {key.lower(): key for key in metadata}
+        extras = dict(metadata)
+        extras.pop("link", None)
+        fields = {}
+        for field, candidates in FIELD_KEYS.get(source, {}).items():
+            fields[field] = None
+            for candidate in candidates:
+                key = lower_keys.get(candidate.lower())
+                if key is not None and key in extras:
+                    fields[field] = _text(extras.pop(key))
+                    break
+        if fields.get("object_id") is None:
+            fields["object_id"] = _text(link)
+        return cls(source, link=link, extras=extras, **fields)
+
+    def to_dict(self):
+        """dict: All metadata, with core fields and extras combined."""
+        data = self.extras
+        data.update({name: getattr(self, name) for name in CORE_FIELDS})
+        return data
+
+
+class _StringColumn():
+    """Column of optional strings stored in one buffer with offsets."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+        self.is_null = bytearray()
+
+    def __len__(self):
+        return len(self.is_null)
+
+    def append(self, value):
+        """Add a string or None to the end of the column."""
+        if value is not None:
+            self.data += value.encode("utf-8") if isinstance(value, str) else value
+        self.offsets.append(len(self.data))
+        self.is_null.append(value is None)
+
+    def raw(self, index):
+        """bytes: Stored bytes of an item."""
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]])
+
+    def __getitem__(self, index):
+        if self.is_null[index]:
+            return None
+        return self.raw(index).decode("utf-8")
+
+    def nbytes(self):
+        """int: Memory used by the buffers."""
+        return (len(self.data) + len(self.offsets) * self.offsets.itemsize
+                + len(self.is_null))
+
+
+class RecordBatch():
+    """Column-wise storage of many ArtworkRecords.
+
+    Strings are stored back to back in one buffer per column, and the
+    source is stored as a one byte code, so that a batch of millions of
+    records takes little more memory than the text it contains.
+
+    Parameters
+    ----------
+    records: iterable of ArtworkRecord, optional
+        Records to add to the batch.
+    """
+
+    def __init__(self, records=None):
+        self.sources = []
+        self._source_codes = array("B")
+        self._columns = {name: _StringColumn() for name in CORE_FIELDS[1:]}
+        self._extras = _StringColumn()
+        for record in records or []:
+            self.append(record)
+
+    def __len__(self):
+        return len(self._source_codes)
+
+    def append(self, record):
+        """Add a record to the batch."""
+        if record.source not in self.sources:
+            self.sources.append(record.source)
+        self._source_codes.append(self.sources.index(record.source))
+        for name, column in self._columns.items():
+            column.append(getattr(record, name))
+        self._extras.append(record.extras_bytes)
+
+    def extend_metadata(self, metadata_list, source=None):
+        """Convert scraper metadata and add it to the batch."""
+        for metadata in metadata_list:
+            self.append(ArtworkRecord.from_metadata(metadata, source))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RecordBatch index out of range")
+        fields = {name: column[index] for name, column in self._columns.items()}
+        return ArtworkRecord(self.sources[self._source_codes[index]],
+                             extras=self._extras.raw(index), **fields)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, name):
+        """Get all values of one core field.
+
+        Parameters
+        ----------
+        name: str
+            Name of the core field, e.g. "title".
+
+        Returns
+        -------
+        list:
+            The values of the field for all records.
+        """
+        if name == "source":
+            return [self.sources[code] for code in self._source_codes]
+        column = self._columns[name]
+        return [column[index] for index in range(len(self))]
+
+    def nbytes(self):
+        """int: Approximate memory used by the stored data."""
+        return (len(self._source_codes)
+                + sum(column.nbytes() for column in self._columns.values())
+                + self._extras.nbytes())
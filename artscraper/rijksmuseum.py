@@ -5,15 +5,77 @@ from pathlib import Path
 from urllib.parse import urlparse
 import re
 
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.keys import Keys
 
-from artscraper.base import BaseArtScraper
+from artscraper.browser import BrowserScraper
+from artscraper.tracing import traced
+from artscraper.parsing import make_soup
 
+SECTIONS = ['identification', 'creation', 'material and technique', 'subject']
+_DATA_CLASS = ["object-data", "mini-page", "mini-page-compact", "hidden"]
 
-class RijksmuseumScraper(BaseArtScraper):
+
+def parse_metadata(sources, link):
+    """Extract the metadata of an artwork from its page source.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the rendered page source under "page".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    paint_id = urlparse(link).path.split("/")[-1]
+    soup = make_soup(sources["page"])
+    base_element = soup.find(lambda tag: tag.get("class") == _DATA_CLASS)
+    if base_element is None:
+        raise ValueError(f"Cannot find the metadata of {link}.")
+
+    HTML_sections = []
+    current_sections = []
+    for article in base_element.find_all("article", recursive=False)[:10]:
+        if set(current_sections) == set(SECTIONS):
+            break
+        sec_title = article.find("h2").get_text().strip().lower()
+        if sec_title in SECTIONS:
+            sec_soup = article.find("div", recursive=False)
+            HTML_sections.append(sec_soup.find_all("div", class_="item"))
+            current_sections.append(sec_title)
+
+    metadata = {}
+    for HTML in HTML_sections:
+        for element in HTML:
+            name = element.find("h3").get_text().strip().lower()
+            if name == "description":
+                name = "main_text"
+            elif name == "what":
+                name = "keywords"
+            try:
+                content = []
+                paragraphs = element.find_all("p")
+                for para in paragraphs:
+                    content += [para.get_text(separator = '. ').strip().lower()]
+                if len(content) == 0: # if there is no <p> tag, try <ul>
+                    content = element.find("ul").text.strip().lower()
+                if len(content) == 1: content = content[0]
+            except AttributeError:
+                # Entry that cannot be parsed.
+                continue
+
+            metadata[name] = content
+
+    metadata["id"] = paint_id
+    return metadata
+
+
+class RijksmuseumScraper(BrowserScraper):
     """Class for scraping Philadelphia Museum images.
 
     Parameters
@@ -28,13 +90,12 @@ class RijksmuseumScraper(BaseArtScraper):
         is randomly drawn from a polynomial distribution.
     """
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
-        self.driver = webdriver.Firefox()
+    parse_metadata = staticmethod(parse_metadata)
 
-    def __exit__(self, _exc_type, _exc_val, _exc_tb):
-        self.driver.close()
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5, **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait, **kwargs)
 
+    @traced()
     def load_link(self, link):
 
         # if the Dutch version of the website is loaded, switch to English
@@ -52,8 +113,8 @@ class RijksmuseumScraper(BaseArtScraper):
                 return False
             self.paint_dir.mkdir(exist_ok=True, parents=True)
 
-        self.driver.get(link)
-        self.wait(self.min_wait)
+        self._get_page(link)
+        self.wait(self.min_wait, update=False)
 
         # accept cookies
         cookies_button = self.driver.find_element(
@@ -74,53 +135,8 @@ class RijksmuseumScraper(BaseArtScraper):
                 metadata = json.load(f)
             return metadata
 
-        metadata = {}
-
-        paint_id = urlparse(self.link).path.split("/")[-1]
         self.wait(self.min_wait, update=False)
-        base_element = f'//*[@class="object-data mini-page mini-page-compact hidden"]'
-
-        HTML_sections = []
-        possible_sections = ['identification', 'creation', 'material and technique', 'subject']
-        i=0
-        current_sections = []
-        while set(current_sections) != set(possible_sections) and i < 10:
-            i += 1
-            sec_HTML = self.driver.find_element(
-                "xpath", f"{base_element}/article[{i}]").get_attribute("innerHTML")
-            sec_soup = BeautifulSoup(sec_HTML, features="html.parser")
-            sec_title = sec_soup.find("h2").get_text().strip().lower()
-            if sec_title in possible_sections:
-                sec_inner_HTML = self.driver.find_element(
-                "xpath", f"{base_element}/article[{i}]/div[1]").get_attribute("innerHTML")
-                sec_soup = BeautifulSoup(sec_inner_HTML, features="html.parser")
-                HTML_sections.append(sec_soup.find_all("div", class_="item"))
-                current_sections.append(sec_title)
-
-        for HTML in HTML_sections:
-            for element in HTML:
-                name = element.find("h3").get_text().strip().lower()
-                if name == "description":
-                    name = "main_text"
-                elif name == "what":
-                    name = "keywords"
-                try:
-                    content = []
-                    paragraphs = element.find_all("p")
-                    for para in paragraphs:
-                        content += [para.get_text(separator = '. ').strip().lower()]
-                    if len(content) == 0: # if there is no <p> tag, try <ul>
-                        content = element.find("ul").text.strip().lower()
-                    if len(content) == 1: content = content[0]
-                except:
-                    continue
-                # print(f"Couldnt parse the entry: {name}")
-
-                metadata[name] = content
-                # print(f"{name}: {content}")
-
-        metadata["id"] = paint_id
-        return metadata
+        return self._parse_sources({"page": self.driver.page_source})
 
 
     def get_image(self):
@@ -158,6 +174,7 @@ class RijksmuseumScraper(BaseArtScraper):
         # self.driver.find_element("xpath", "/html/body").send_keys(Keys.ESCAPE)
         return img
 
+    @traced()
     def save_image(self, img_fp=None, link=None):
         """Save the artwork image to a file.
 
@@ -175,10 +192,6 @@ class RijksmuseumScraper(BaseArtScraper):
 
         img_fp = self._convert_img_fp(img_fp, suffix=".png")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
-
-    def close(self):
-        self.driver.close()
+        self._write_image(img_fp, self.get_image())
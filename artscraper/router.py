@@ -0,0 +1,230 @@
+"""Route links from mixed sources to the right scraper.
+
+A ScraperRouter keeps one scraper instance per source alive for the whole
+run, so that browsers, sessions and logins are reused between links.
+"""
+
+from collections import namedtuple
+from importlib import import_module
+from pathlib import Path
+
+from artscraper.canonical import dedupe_links
+from artscraper.deadline import LinkTimeout
+from artscraper.deadline import Watchdog
+from artscraper.scheduler import HostScheduler
+from artscraper.sources import SCRAPERS
+from artscraper.sources import source_of
+
+ScrapeResult = namedtuple("ScrapeResult", ["link", "source", "metadata", "error"])
+
+
+def scraper_class(source):
+    """Get the scraper class for a source, importing it on demand."""
+    return getattr(import_module(f"artscraper.{source}"), SCRAPERS[source])
+
+
+def group_by_source(links):
+    """Group links by their source, keeping their order within each source.
+
+    Returns
+    -------
+    dict:
+        Source name -> list of links.
+    """
+    groups = {}
+    for link in links:
+        groups.setdefault(source_of(link), []).append(link)
+    return groups
+
+
+def _same_source(link, source):
+    try:
+        return source_of(link) == source
+    except ValueError:
+        return False
+
+
+class ScraperRouter():
+    """Scrape links from any supported source.
+
+    Parameters
+    ----------
+    output_dir: Path or str, optional
+        Base output directory. The results of each source are stored in a
+        sub directory named after the source. If None, only metadata is
+        retrieved and nothing is stored.
+    scraper_options: dict, optional
+        Source name -> dict of keyword arguments for that scraper, e.g.
+        {"googleart": {"geckodriver_path": "./geckodriver"}}.
+    per_source_dirs: bool, default=True
+        If false, all sources store their results directly in output_dir.
+    link_timeout: float, optional
+        Total time budget in seconds for scraping one link. When it runs
+        out, the scraper is aborted and the link fails with a LinkTimeout.
+    kwargs:
+        Keyword arguments passed to every scraper, e.g. skip_existing or
+        image_pipeline.
+    """
+
+    def __init__(self, output_dir=None, scraper_options=None,
+                 per_source_dirs=True, link_timeout=None, **kwargs):
+        self.output_dir = output_dir
+        self.scraper_options = scraper_options or {}
+        self.per_source_dirs = per_source_dirs
+        self.link_timeout = link_timeout
+        self.common_options = kwargs
+        self.scrapers = {}
+        self.watchdog = Watchdog()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def scraper(self, source):
+        """Get the (long-lived) scraper for a source, creating it if needed."""
+        if source not in self.scrapers:
+            options = dict(self.common_options)
+            options.update(self.scraper_options.get(source, {}))
+            if self.output_dir is not None:
+                output_dir = Path(self.output_dir)
+                if self.per_source_dirs:
+                    output_dir = Path(output_dir, source)
+                output_dir.mkdir(parents=True, exist_ok=True)
+                options["output_dir"] = output_dir
+            self.scrapers[source] = scraper_class(source)(**options)
+        return self.scrapers[source]
+
+    def scrape_link(self, link, source=None, metadata=True, image=True,
+                    next_link=None):
+        """Scrape a single link with the scraper of its source.
+
+        Parameters
+        ----------
+        link: str
+            Url of the artwork.
+        source: str, optional
+            Source of the link, detected from the link if not given.
+        metadata: bool, default=True
+            Store the metadata (if there is an output directory).
+        image: bool, default=True
+            Store the image (if there is an output directory).
+        next_link: str, optional
+            Link that will be scraped next. If it has the same source and
+            the scraper prefetches, it starts loading while this link is
+            processed.
+
+        Returns
+        -------
+        ScrapeResult:
+            The link, its source, and either the metadata or the error.
+            Links that ran out of time have a LinkTimeout as error.
+        """
+        budget = None
+        try:
+            if source is None:
+                source = source_of(link)
+            scraper = self.scraper(source)
+            with self.watchdog.watch(self.link_timeout, scraper.abort) as budget:
+                scraper.load_link(link)
+                if next_link is not None and _same_source(next_link, source):
+                    scraper.prefetch(next_link)
+                if self.output_dir is not None and metadata:
+                    scraper.save_metadata()
+                if self.output_dir is not None and image:
+                    scraper.save_image()
+                result = scraper.get_metadata()
+        except Exception as error:  # pylint: disable=broad-except
+            if (budget is not None and budget.expired
+                    and not isinstance(error, LinkTimeout)):
+                # The error is a consequence of the abort.
+                timeout = LinkTimeout(f"Timed out after {budget.seconds} s: "
+                                      f"{error!r}")
+                timeout.__cause__ = error
+                error = timeout
+            return ScrapeResult(link, source, None, error)
+        return ScrapeResult(link, source, result, None)
+
+    def ready_at(self, source):
+        """Earliest time at which the scraper of a source may be used again."""
+        if source not in self.scrapers:
+            return 0
+        return self.scrapers[source].ready_at()
+
+    def scrape(self, links, metadata=True, image=True, interleave=False,
+               dedupe=False):
+        """Scrape a list of links from mixed sources.
+
+        Links are grouped by source, so that each scraper processes all
+        its links in one go. Alternatively, with interleave=True, the next
+        link is always taken from the source whose rate limit expires
+        first, so that waiting for one source overlaps with work for the
+        others.
+
+        With dedupe, links are canonicalized first and links to the same
+        artwork are only scraped once.
+
+        Parameters
+        ----------
+        links: iterable of str
+            Urls of the artworks.
+        metadata: bool, default=True
+            Store the metadata (if there is an output directory).
+        image: bool, default=True
+            Store the images (if there is an output directory).
+        interleave: bool, default=False
+            Interleave the sources with a HostScheduler.
+        dedupe: bool, default=False
+            Canonicalize the links and remove duplicates.
+
+        Yields
+        ------
+        ScrapeResult:
+            One result per (unique) link. Errors do not stop the crawl, but
+            are stored in the error field of the result.
+        """
+        if dedupe:
+            links = dedupe_links(links)
+        groups = {}
+        for link in links:
+            try:
+                groups.setdefault(source_of(link), []).append(link)
+            except ValueError as error:
+                yield ScrapeResult(link, None, None, error)
+        if interleave:
+            scheduler = HostScheduler(self.ready_at)
+            for source, source_links in groups.items():
+                for link in source_links:
+                    scheduler.add(source, link)
+            yield from scheduler.run(
+                lambda source, link: self.scrape_link(link, source, metadata,
+                                                      image))
+            return
+        for source, source_links in groups.items():
+            for link, next_link in zip(source_links, source_links[1:] + [None]):
+                yield self.scrape_link(link, source, metadata, image,
+                                       next_link)
+
+    def close(self):
+        """Close all scrapers."""
+        for scraper in self.scrapers.values():
+            scraper.close()
+        self.scrapers = {}
+        self.watchdog.close()
+
+
+def scrape(links, output_dir=None, **kwargs):
+    """Scrape links from any of the supported sources.
+
+    Each link is routed to the scraper for its domain; one scraper per
+    source is kept open for the whole run. See ScraperRouter for the
+    arguments.
+
+    Yields
+    ------
+    ScrapeResult:
+        One result per link.
+    """
+    with ScraperRouter(output_dir, **kwargs) as router:
+        yield from router.scrape(links)
@@ -0,0 +1,104 @@
+"""Scheduler that interleaves links from different hosts.
+
+Each host (in practice each source, which has its own scraper) has a
+ready time: the earliest moment at which its rate limit allows the next
+request. The scheduler always dispatches a link of the host that is ready
+first, so that while one host is waiting for its rate limit, links of
+other hosts are processed. The total time then approaches the time needed
+by the slowest host, instead of the sum of all waiting times.
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque
+
+
+def _always_ready(_host):
+    return 0
+
+
+class HostScheduler():
+    """Priority queue of links keyed on the ready time of their host.
+
+    Parameters
+    ----------
+    ready_time: callable, optional
+        Function that takes a host and returns the earliest time (as
+        time.time()) at which the host may receive its next request. It is
+        called again whenever a host is put back in the queue, so it can
+        track the rate limiter of a scraper. By default hosts are always
+        ready.
+    """
+
+    def __init__(self, ready_time=None):
+        self._ready_time = _always_ready if ready_time is None else ready_time
+        self._queues = {}
+        self._heap = []
+        self._active = set()
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return sum(len(host_queue) for host_queue in self._queues.values())
+
+    def _push(self, host):
+        heapq.heappush(self._heap,
+                       (self._ready_time(host), next(self._counter), host))
+
+    def add(self, host, item):
+        """Add a link (or any other item) for a host."""
+        host_queue = self._queues.setdefault(host, deque())
+        if not host_queue and host not in self._active:
+            self._push(host)
+        host_queue.append(item)
+
+    def next(self):
+        """Get the next item whose host is ready, waiting if none is ready.
+
+        The host is not scheduled again until done is called for it, so
+        that each host has at most one request in flight.
+
+        Returns
+        -------
+        (host, item):
+            The host and the item to process.
+        """
+        while self._heap:
+            ready, _, host = heapq.heappop(self._heap)
+            # The ready time can have moved since the host was queued.
+            current = self._ready_time(host)
+            if current > ready:
+                heapq.heappush(self._heap, (current, next(self._counter), host))
+                continue
+            delay = ready - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self._active.add(host)
+            return host, self._queues[host].popleft()
+        raise IndexError("No items left in the scheduler.")
+
+    def done(self, host):
+        """Mark the item of a host as processed, rescheduling the host."""
+        self._active.discard(host)
+        if self._queues.get(host):
+            self._push(host)
+
+    def run(self, process):
+        """Process all items in order of host readiness.
+
+        Parameters
+        ----------
+        process: callable
+            Called with (host, item) for each item.
+
+        Yields
+        ------
+        object:
+            The return values of process.
+        """
+        while self._heap:
+            host, item = self.next()
+            try:
+                yield process(host, item)
+            finally:
+                self.done(host)
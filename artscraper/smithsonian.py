@@ -1,16 +1,72 @@
 """Module for SmithsonianScraper class."""
 
 import json
+import re
 from pathlib import Path
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
 from urllib.parse import urlparse
-from urllib.request import urlopen
-from urllib.request import urlretrieve
 
-from PIL import Image
+from artscraper.bandwidth import IMAGE
+from artscraper.base import BaseArtScraper
+from artscraper.canonical import object_dir
+from artscraper.tracing import traced
+from artscraper.parsing import find_attribute
 
-from bs4 import BeautifulSoup
+# Size segment of a IIIF image url: {region}/{size}/{rotation}/{quality}.{format}
+_IIIF_SIZE = re.compile(r"/full/[^/]+/([^/]+)/([^/.]+)\.(\w+)$")
+
+
+def sized_image_url(img_url, max_size=None):
+    """Url of an image scaled to fit within max_size x max_size pixels.
+
+    IIIF image urls get the size !max_size,max_size, and urls of the IDS
+    delivery service get the max parameter. Other urls are returned as is.
+    """
+    if max_size is None:
+        return img_url
+    if _IIIF_SIZE.search(img_url):
+        return _IIIF_SIZE.sub(rf"/full/!{max_size},{max_size}/\1/\2.\3",
+                              img_url)
+    parsed = urlparse(img_url)
+    if parsed.path.endswith("/deliveryService"):
+        params = dict(parse_qsl(parsed.query))
+        params["max"] = str(max_size)
+        return parsed._replace(query=urlencode(params)).geturl()
+    return img_url
+
+
+def find_media_id(page):
+    """Find the id of the media of an artwork in the HTML of its page.
+
+    The page can also be given as an iterator of chunks, which is only
+    read up to the media id.
+    """
+    return find_attribute(page, "div", "data-idsid", class_="media-metadata")
+
+
+def parse_metadata(sources, link):  # pylint: disable=unused-argument
+    """Extract the metadata of an artwork from its IIIF manifest.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the IIIF manifest of the media under "api".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the artwork.
+    """
+    manifest = json.loads(sources["api"])
+    to_val = lambda a: list(a.values())
+    metadata = {to_val(i)[0]: to_val(i)[1] for i in manifest['metadata']}
+    metadata['img_url'] = manifest['sequences'][0]['canvases'][0] \
+                                    ['images'][0]['resource']['@id']
+    return metadata
 
-from artscraper.base import BaseArtScraper
 
 class SmithsonianScraper(BaseArtScraper):
     """Class for scraping Smithsonian images.
@@ -26,9 +82,12 @@ class SmithsonianScraper(BaseArtScraper):
         of at least this value in seconds. The actual waiting time
         is randomly drawn from a polynomial distribution.
     """
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=5):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
+    parse_metadata = staticmethod(parse_metadata)
 
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=5, **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait, **kwargs)
+
+    @traced()
     def load_link(self, link):
         if link == self.link:
             return False
@@ -47,8 +106,7 @@ class SmithsonianScraper(BaseArtScraper):
 
     @property
     def paint_dir(self):
-        paint_id = urlparse(self.link).path.split("/")[-1].replace(":", "_")
-        return Path(self.output_dir, paint_id)
+        return Path(self.output_dir, object_dir(self.link))
 
     def _get_metadata(self):
         if self.output_dir is not None and self.meta_fp.is_file():
@@ -57,36 +115,64 @@ class SmithsonianScraper(BaseArtScraper):
             return metadata
 
         self.wait(self.min_wait, update=False)
-        soup = BeautifulSoup(urlopen(self.link), 'html.parser')
-        div = soup.find("div", attrs={'class': 'media-metadata'})
-        art_id = div.attrs['data-idsid']
-
-        manifest = urlopen(f"https://ids.si.edu/ids/manifest/{art_id}").read()
-        manifest = json.loads(manifest)
-        to_val = lambda a: list(a.values())
-        metadata = {to_val(i)[0]: to_val(i)[1] for i in manifest['metadata']}
-        metadata['img_url'] = manifest['sequences'][0]['canvases'][0] \
-                                        ['images'][0]['resource']['@id']
-
-        return metadata
-
-    def get_image(self):
-        """Get a binary JPG image in memory."""
+        page, art_id = self._stream_media_id()
+        if art_id is None:
+            raise ValueError(f"Cannot find media id for {self.link}.")
+
+        manifest = self.transport.get(
+            f"https://ids.si.edu/ids/manifest/{art_id}").text
+        return self._parse_sources({"page": page, "api": manifest})
+
+    def _stream_media_id(self):
+        """Read the artwork page only up to the media id.
+
+        Only one attribute is needed, so no document tree is built and the
+        rest of the page is not downloaded. The part that was read is
+        returned as well, for the response archive.
+        """
+        response = self.transport.get(self.link, stream=True)
+        chunks = []
+
+        def read():
+            for chunk in response.iter_content(16384):
+                chunks.append(chunk)
+                yield chunk
+
+        try:
+            art_id = find_media_id(read())
+        finally:
+            response.close()
+        page = b"".join(chunks).decode("utf-8", errors="replace")
+        return page, art_id
+
+    def _get_image_response(self, max_size=None):
         if self._meta_store['data']:
             img_url = self._meta_store['data']['img_url']
         else:
             img_url = self._get_metadata()['img_url']
 
-        return urlopen(img_url).read()
+        return self.transport.get(sized_image_url(img_url, max_size),
+                                  priority=IMAGE)
+
+    def get_image(self, max_size=None):
+        """Get a binary JPG image in memory, optionally scaled down."""
+        return self._get_image_response(max_size).content
+
+    @traced()
+    def save_image(self, img_fp=None, link=None, max_size=None):
+        """Save the artwork image to a file.
 
-    def save_image(self, img_fp=None, link=None):
-        """Save the artwork image to a file."""
+        The image is scaled down by the server to fit within max_size x
+        max_size pixels, by default the max_size of the scraper.
+        """
         if link is not None:
-            self.load_link()
+            self.load_link(link)
+        if max_size is None:
+            max_size = self.max_size
 
         img_fp = self._convert_img_fp(img_fp, suffix=".jpg")
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
             return
-        with open(img_fp, "wb") as f:
-            f.write(self.get_image())
+        response = self._get_image_response(max_size)
+        self._write_image(img_fp, response.content, response.headers)
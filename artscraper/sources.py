@@ -0,0 +1,60 @@
+"""Supported sources and the domains of their links.
+
+Kept apart from the router, so that modules that only need to know the
+source of a link (canonical, archive, records) do not import the router.
+"""
+
+from urllib.parse import urlparse
+
+# Domain (without subdomains) -> source name.
+DOMAINS = {
+    "wikiart.org": "wikiart",
+    "artsandculture.google.com": "googleart",
+    "philamuseum.org": "philamuseum",
+    "getty.edu": "getty",
+    "rijksmuseum.nl": "rijksmuseum",
+    "artic.edu": "artic",
+    "si.edu": "smithsonian",
+    "metmuseum.org": "met",
+}
+
+# Source name -> scraper class, which lives in artscraper.<source name>.
+SCRAPERS = {
+    "wikiart": "WikiArtScraper",
+    "googleart": "GoogleArtScraper",
+    "philamuseum": "PhiladelphiaMuseumScraper",
+    "getty": "GettyScraper",
+    "rijksmuseum": "RijksmuseumScraper",
+    "artic": "ArticScraper",
+    "smithsonian": "SmithsonianScraper",
+    "met": "MetMuseumScraper",
+}
+
+# Sources whose scraper uses a browser (artscraper.browser.BrowserScraper).
+BROWSER_SOURCES = ["googleart", "philamuseum", "getty", "rijksmuseum", "artic",
+                   "met"]
+
+# Browser sources that can take their metadata from the page fetched over
+# HTTP (the static_metadata option of BrowserScraper).
+STATIC_METADATA_SOURCES = ["googleart", "philamuseum", "getty", "met"]
+
+
+def source_of(link):
+    """Find the source of an artwork link.
+
+    Parameters
+    ----------
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    str:
+        Name of the source, one of the keys of SCRAPERS.
+    """
+    domain = urlparse(link).netloc.lower().split(":")[0]
+    while domain:
+        if domain in DOMAINS:
+            return DOMAINS[domain]
+        _, _, domain = domain.partition(".")
+    raise ValueError(f"No scraper available for link: {link}")
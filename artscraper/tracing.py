@@ -0,0 +1,220 @@
+"""Structured tracing of scraper operations.
+
+When a Tracer is installed with set_tracer, loading links, extracting
+metadata, the WikiArt search strategies, HTTP requests, WebDriver commands
+and saving images are recorded as nested spans with their duration and
+attributes (url, status, bytes, ...). The spans can be exported as JSON or
+in the Chrome trace format, which can be opened in chrome://tracing or
+https://ui.perfetto.dev. Without a tracer, tracing costs next to nothing.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_TRACER = None
+
+
+class Span():
+    """A single traced operation.
+
+    Attributes
+    ----------
+    name: str
+        Name of the operation.
+    start: float
+        Start time in seconds since the epoch.
+    duration: float
+        Duration in seconds, None while the span is open.
+    attributes: dict
+        Extra information about the operation.
+    """
+
+    __slots__ = ["span_id", "parent_id", "name", "start", "duration",
+                 "thread_id", "attributes"]
+
+    def __init__(self, span_id, parent_id, name, attributes):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration = None
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+
+    def set(self, key, value):
+        """Set an attribute of the span."""
+        self.attributes[key] = value
+
+    def to_dict(self):
+        """dict: JSON serializable representation of the span."""
+        return {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread_id,
+            "attributes": {key: _jsonable(value)
+                           for key, value in self.attributes.items()},
+        }
+
+
+class _NoSpan():
+    """Stand-in for a span when tracing is disabled."""
+
+    def set(self, key, value):
+        """Ignore the attribute."""
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer():
+    """Collect spans from all threads."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Record the code in the with block as a span.
+
+        Parameters
+        ----------
+        name: str
+            Name of the operation.
+        attributes:
+            Initial attributes of the span.
+
+        Yields
+        ------
+        Span:
+            The open span, to which more attributes can be added.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        with self._lock:
+            self._next_id += 1
+            span_id = self._next_id
+        parent_id = stack[-1].span_id if stack else None
+        new_span = Span(span_id, parent_id, name, attributes)
+        stack.append(new_span)
+        try:
+            yield new_span
+        except BaseException as error:
+            new_span.set("error", repr(error))
+            raise
+        finally:
+            new_span.duration = time.time() - new_span.start
+            stack.pop()
+            with self._lock:
+                self.spans.append(new_span)
+
+    def export_json(self, trace_fp):
+        """Write all finished spans to a JSON file."""
+        with open(trace_fp, "w", encoding="utf-8") as f:
+            json.dump([span.to_dict() for span in self.spans], f)
+
+    def export_chrome(self, trace_fp):
+        """Write all finished spans in the Chrome trace event format."""
+        pid = os.getpid()
+        events = [{
+            "name": span.name,
+            "ph": "X",
+            "ts": span.start * 1e6,
+            "dur": span.duration * 1e6,
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": span.to_dict()["attributes"],
+        } for span in self.spans]
+        with open(trace_fp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events}, f)
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def set_tracer(tracer):
+    """Install a tracer for all scrapers, or remove it with None."""
+    global _TRACER  # pylint: disable=global-statement
+    _TRACER = tracer
+
+
+def get_tracer():
+    """Tracer or None: The installed tracer."""
+    return _TRACER
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record a span with the installed tracer, if any.
+
+    Yields
+    ------
+    Span:
+        The open span, or a stand-in that ignores attributes.
+    """
+    if _TRACER is None:
+        yield _NO_SPAN
+        return
+    with _TRACER.span(name, **attributes) as new_span:
+        yield new_span
+
+
+def traced(name=None):
+    """Decorator that records each call of a scraper method as a span.
+
+    The url of the scraper (its link attribute) is added to the span once
+    the method returns.
+    """
+    def decorator(method):
+        span_name = method.__name__ if name is None else name
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if _TRACER is None:
+                return method(self, *args, **kwargs)
+            with _TRACER.span(span_name) as new_span:
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    new_span.set("url", getattr(self, "link", None))
+        return wrapper
+    return decorator
+
+
+def trace_driver(driver):
+    """Record every WebDriver command of a selenium driver as a span.
+
+    Parameters
+    ----------
+    driver: selenium.webdriver.remote.webdriver.WebDriver
+        Driver to instrument; it is changed in place.
+
+    Returns
+    -------
+    WebDriver:
+        The same driver.
+    """
+    execute = driver.execute
+
+    @functools.wraps(execute)
+    def traced_execute(driver_command, params=None):
+        if _TRACER is None:
+            return execute(driver_command, params)
+        with _TRACER.span(f"webdriver.{driver_command}") as new_span:
+            if params and "url" in params:
+                new_span.set("url", params["url"])
+            return execute(driver_command, params)
+
+    driver.execute = traced_execute
+    return driver
@@ -0,0 +1,372 @@
+"""HTTP transport shared by the scrapers.
+
+All HTTP requests of the scrapers go through a Transport, which reuses
+connections through a requests.Session. Optionally, responses are stored
+in an HTTPCache: stored responses are revalidated with conditional
+requests (If-None-Match/If-Modified-Since), and on a 304 Not Modified
+the stored body is used, so that refreshing a crawl mostly costs headers.
+With a rate controller, the latency and status of every request are
+reported to it, so that the scrapers can adapt their request rate. With a
+bandwidth limiter, response bodies are read in chunks that are charged to
+its budget.
+
+Within the time budget of a link (see artscraper.deadline), bodies are
+read in chunks as well, and reading stops when the budget runs out. The
+timeout of requests only applies to each read, so a body that keeps
+trickling in would otherwise never end: when the watchdog aborts the link,
+abort_overdue shuts down the connection of the download.
+"""
+
+import hashlib
+import json
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import suppress
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from requests.utils import stream_decode_response_unicode
+
+from artscraper.bandwidth import CHUNK_SIZE
+from artscraper.bandwidth import METADATA
+from artscraper.deadline import LinkTimeout
+from artscraper.deadline import check_deadline
+from artscraper.deadline import remaining
+from artscraper.tracing import span
+
+
+class HTTPCache():
+    """Size bounded on-disk cache of HTTP responses.
+
+    Only responses with an ETag or Last-Modified header are stored, since
+    others cannot be revalidated. When the total size of the stored
+    bodies exceeds max_bytes, the least recently used entries are removed.
+
+    Parameters
+    ----------
+    cache_dir: str or Path
+        Directory to store the responses in.
+    max_bytes: int, default=2**30
+        Maximum total size of the stored bodies.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2**30):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(Path(self.cache_dir, "index.sqlite")),
+                                     check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, "
+                "etag TEXT, last_modified TEXT, headers TEXT, size INTEGER, "
+                "last_used REAL)")
+        self.hits = 0
+        self.misses = 0
+
+    def _body_fp(self, key):
+        return Path(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def validators(self, key):
+        """Get the headers for a conditional request for a stored response.
+
+        Returns
+        -------
+        dict:
+            If-None-Match and/or If-Modified-Since headers, empty if the
+            response is not stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM entries WHERE key = ?",
+                (key,)).fetchone()
+        if row is None or not self._body_fp(key).is_file():
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def load(self, key):
+        """Load a stored response.
+
+        Returns
+        -------
+        (dict, bytes) or None:
+            The stored headers and body, or None if it is not stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT headers FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                (time.time(), key))
+            self._conn.commit()
+        try:
+            body = self._body_fp(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        return json.loads(row[0]), body
+
+    def store(self, key, response):
+        """Store a response, if it can be revalidated later."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        if "no-store" in response.headers.get("Cache-Control", ""):
+            return
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        self._body_fp(key).write_bytes(body)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, json.dumps(dict(response.headers)),
+                 len(body), time.time()))
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits."""
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._body_fp(key).unlink(missing_ok=True)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self._conn.commit()
+
+
+class Transport():
+    """Perform HTTP requests for the scrapers.
+
+    Parameters
+    ----------
+    timeout: float, default=150
+        Default timeout of a request in seconds.
+    cache: HTTPCache, optional
+        Cache for conditional requests.
+    ignore_params: iterable of str, default=("authSessionKey",)
+        Query parameters that are left out of the cache key, such as
+        session keys that change between runs.
+    rate_controller: artscraper.ratecontrol.AdaptiveRateController, optional
+        Controller to report all responses to. Scrapers using this
+        transport then take their waiting time from the controller.
+    bandwidth: artscraper.bandwidth.BandwidthLimiter, optional
+        Limiter that the bytes of all response bodies are charged to. The
+        bodies of streamed responses are charged as they are read.
+    """
+
+    def __init__(self, timeout=150, cache=None,
+                 ignore_params=("authSessionKey",), rate_controller=None,
+                 bandwidth=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.ignore_params = set(ignore_params)
+        self.rate_controller = rate_controller
+        self.bandwidth = bandwidth
+        self.session = requests.Session()
+        # Responses whose body is being read within a time budget -> the
+        # deadline of their link.
+        self._reading = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self, url, params):
+        if not params:
+            return url
+        params = sorted((key, value) for key, value in params.items()
+                        if key not in self.ignore_params)
+        return f"{url}?{urlencode(params)}" if params else url
+
+    def get(self, url, params=None, timeout=None, stream=False, headers=None,
+            priority=METADATA):
+        """Perform a GET request.
+
+        Parameters
+        ----------
+        url: str
+            Url to request.
+        params: dict, optional
+            Query parameters.
+        timeout: float, optional
+            Timeout in seconds, by default the timeout of the transport. It
+            is shortened to the time left in the budget of the current link
+            (see artscraper.deadline).
+        stream: bool, default=False
+            If true, the body is not read yet and the cache is not used.
+        headers: dict, optional
+            Extra request headers.
+        priority: str, default="metadata"
+            Priority of the body for the bandwidth limiter: "image" bodies
+            are delayed when the bandwidth budget is used up, "metadata"
+            bodies are only charged.
+
+        Returns
+        -------
+        requests.Response:
+            The response. Responses served from the cache have the
+            attribute from_cache set to True.
+        """
+        with span("http.get", url=url) as http_span:
+            start = time.time()
+            try:
+                response = self._get(url, params, timeout, stream, headers,
+                                     priority)
+            except requests.RequestException:
+                if self.rate_controller is not None:
+                    self.rate_controller.observe(url, time.time() - start,
+                                                 status=None)
+                raise
+            if self.rate_controller is not None:
+                # response.elapsed excludes reading the body, like a stream.
+                self.rate_controller.observe(
+                    url, response.elapsed.total_seconds(),
+                    status=response.status_code,
+                    retry_after=response.headers.get("Retry-After"))
+            http_span.set("status", response.status_code)
+            http_span.set("from_cache", response.from_cache)
+            if not stream:
+                http_span.set("bytes", len(response.content))
+        return response
+
+    def _limit_body(self, response, priority):
+        """Read the body of a streamed response within the budgets.
+
+        The iter_content method of the response is replaced, so that every
+        chunk is charged to the bandwidth budget and checked against the
+        time budget of the link when it is read, whether directly or
+        through content, text or iter_lines.
+        """
+        iter_content = response.iter_content
+
+        def limited_iter_content(chunk_size=1, decode_unicode=False):
+            def chunks():
+                time_left = remaining()
+                if time_left is not None:
+                    with self._lock:
+                        self._reading[response] = time.time() + time_left
+                try:
+                    for chunk in iter_content(chunk_size):
+                        check_deadline()
+                        if self.bandwidth is not None:
+                            self.bandwidth.consume(response.url, len(chunk),
+                                                   priority)
+                        yield chunk
+                finally:
+                    with self._lock:
+                        self._reading.pop(response, None)
+            if decode_unicode:
+                return stream_decode_response_unicode(chunks(), response)
+            return chunks()
+
+        response.iter_content = limited_iter_content
+
+    def _get(self, url, params, timeout, stream, headers, priority):
+        """Perform a GET request, using the cache if available."""
+        if timeout is None:
+            timeout = self.timeout
+        time_left = remaining()
+        if time_left is not None:
+            if time_left <= 0:
+                raise LinkTimeout(f"No time left to request {url}.")
+            timeout = min(timeout, time_left)
+        request_headers = dict(headers or {})
+        key = None
+        if self.cache is not None and not stream:
+            key = self._cache_key(url, params)
+            request_headers.update(self.cache.validators(key))
+
+        limited = self.bandwidth is not None or time_left is not None
+        response = self.session.get(url, params=params, timeout=timeout,
+                                    stream=stream or limited,
+                                    headers=request_headers)
+        if limited:
+            self._limit_body(response, priority)
+            if not stream:
+                response._content = b"".join(  # pylint: disable=protected-access
+                    response.iter_content(CHUNK_SIZE))
+        response.from_cache = False
+        if key is None:
+            return response
+        if response.status_code == 304:
+            cached = self.cache.load(key)
+            if cached is not None:
+                self.cache.hits += 1
+                return _cached_response(response, *cached)
+            # The body disappeared in the meantime, request it in full.
+            return self._get(url, params, timeout, stream, headers, priority)
+        self.cache.misses += 1
+        if response.status_code == 200:
+            self.cache.store(key, response)
+        return response
+
+    def abort_overdue(self):
+        """Cut off the downloads of links whose time budget ran out.
+
+        The connections of bodies that are still being read after the
+        deadline of their link are shut down, which makes the blocked read
+        fail. The session is replaced by a new one, so that no connection
+        of the old one is used again.
+        """
+        now = time.time()
+        with self._lock:
+            overdue = [response for response, deadline in self._reading.items()
+                       if deadline <= now]
+            session, self.session = self.session, requests.Session()
+        for response in overdue:
+            _shutdown(response)
+        session.close()
+
+    def close(self):
+        """Close all open connections."""
+        self.session.close()
+
+
+def _shutdown(response):
+    """Shut down the socket of a response that is being read."""
+    connection = getattr(response.raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        with suppress(OSError):
+            sock.shutdown(socket.SHUT_RDWR)
+
+
+# Headers of a 304 response that update the stored response.
+_REVALIDATED_HEADERS = ["Date", "ETag", "Last-Modified", "Expires",
+                        "Cache-Control"]
+
+
+def _cached_response(not_modified, headers, body):
+    """Create a 200 response from a 304 response and the stored body."""
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(headers)
+    for name in _REVALIDATED_HEADERS:
+        if name in not_modified.headers:
+            response.headers[name] = not_modified.headers[name]
+    response._content = body  # pylint: disable=protected-access
+    response.url = not_modified.url
+    response.request = not_modified.request
+    response.elapsed = not_modified.elapsed
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
@@ -6,17 +6,66 @@ import time
 from pathlib import Path
 from urllib.parse import urlparse
 
-import requests
-
+from artscraper.bandwidth import IMAGE
 from artscraper.base import BaseArtScraper
+from artscraper.tracing import traced
+
+# Size variants of WikiArt images, selected with a suffix to the image url,
+# with the approximate size of their longest side in pixels.
+IMAGE_VARIANTS = [("PinterestSmall", 236), ("Blog", 500),
+                  ("PinterestLarge", 564), ("Large", 750), ("HalfHD", 960),
+                  ("HD", 1920)]
+
+
+def parse_metadata(sources, link):  # pylint: disable=unused-argument
+    """Extract the metadata of a painting from its API response.
+
+    Parameters
+    ----------
+    sources: dict
+        Raw responses, with the painting info from the API under "api".
+    link: str
+        Url of the artwork.
+
+    Returns
+    -------
+    dict:
+        The metadata of the painting.
+    """
+    return json.loads(sources["api"])
+
+
+# We try two different regexes to get the painting ID from a page.
+_PAINTING_ID_REGEXES = [(re.compile(r"paintingId = '(.+?')"), 14),
+                        (re.compile(r'data-painting-id="(.+?)"'), 18)]
+
+
+def find_painting_id(page):
+    """Find the painting id in the HTML of a WikiArt painting page.
+
+    Returns
+    -------
+    str or None:
+        The painting id, or None if it cannot be found.
+    """
+    for p_rgx, prefix_length in _PAINTING_ID_REGEXES:
+        match = p_rgx.search(page)
+        if match is not None:
+            return match.group(0)[prefix_length:-1]
+    return None
 
 
 class WikiArtScraper(BaseArtScraper):
     """Class to interact with the WikiArt API."""
 
-    def __init__(self, output_dir=None, skip_existing=True, min_wait=0.3, timeout=150):
-        super().__init__(output_dir, skip_existing, min_wait=min_wait)
+    parse_metadata = staticmethod(parse_metadata)
+
+    def __init__(self, output_dir=None, skip_existing=True, min_wait=0.3,
+                 timeout=150, **kwargs):
+        super().__init__(output_dir, skip_existing, min_wait=min_wait, **kwargs)
         self.timeout = timeout
+        # Link and HTML of the last page fetched by _find_by_scrape.
+        self._scraped_page = (None, None)
         self._get_API_keys()
 
         # Try to use the previous session, can be deleted if expired.
@@ -27,7 +76,6 @@ class WikiArtScraper(BaseArtScraper):
             self._new_session()
             with open(".wiki_session", "w", encoding="utf-8") as f:
                 f.write(self.session_key)
-        self.last_request = None
 
     @property
     def paint_dir(self):
@@ -59,26 +107,26 @@ class WikiArtScraper(BaseArtScraper):
     def _new_session(self):
         """Create a new session and store the session key"""
         login_page = "https://www.wikiart.org/en/Api/2/login"
-        response = requests.get(login_page,
-                                params={
-                                    "accessCode": self.API_access_key,
-                                    "secretCode": self.API_secret_key
-                                },
-                                timeout=self.timeout)
+        # Login goes around the transport, so that it is never cached.
+        response = self.transport.session.get(
+            login_page,
+            params={
+                "accessCode": self.API_access_key,
+                "secretCode": self.API_secret_key
+            },
+            timeout=self.timeout)
         self.session_key = json.loads(response.text)["SessionKey"]
         self.last_request = time.time()
 
     def _get_content(self, url, params):
         """Get data through the WikiArt API with rate limits"""
         params["authSessionKey"] = self.session_key
-        if self.last_request is not None:
-            time_elapsed = time.time() - self.last_request
-            if time_elapsed < self.min_wait:
-                time.sleep(self.min_wait - time_elapsed)
-        response = requests.get(url, params=params, timeout=self.timeout)
+        time.sleep(max(0, self._start_time(self.min_wait) - time.time()))
+        response = self.transport.get(url, params=params, timeout=self.timeout)
         self.last_request = time.time()
         return json.loads(response.text)
 
+    @traced()
     def _find_by_artist_painting(self):
         """Find the painting by searching for artist + painting name"""
         link_dirs = _link_dirs(self.link)
@@ -101,20 +149,15 @@ class WikiArtScraper(BaseArtScraper):
 
         raise ValueError("Cannot find painting by artist + painting")
 
+    @traced()
     def _find_by_scrape(self):
         """This is a nasty bit of regex to get the painting ID"""
         link_dirs = _link_dirs(self.link)
-        response = requests.get(self.link, timeout=self.timeout)
-        # We try two different regexes to get the painting ID.
-        p_rgx = re.compile(r"paintingId = '(.+?')")
-        try:
-            paint_id = p_rgx.search(response.text).group(0)[14:-1]
-        except AttributeError:
-            try:
-                p_rgx = re.compile(r'data-painting-id="(.+?)"')
-                paint_id = p_rgx.search(response.text).group(0)[18:-1]
-            except AttributeError as error:
-                raise ValueError("Cannot find painting by scrape.") from error
+        response = self.transport.get(self.link, timeout=self.timeout)
+        self._scraped_page = (self.link, response.text)
+        paint_id = find_painting_id(response.text)
+        if paint_id is None:
+            raise ValueError("Cannot find painting by scrape.")
         return self._check_metadata(paint_id, link_dirs)
 
     def _check_metadata(self, paint_meta, link_dirs):
@@ -129,6 +172,7 @@ class WikiArtScraper(BaseArtScraper):
             return paint_data
         raise ValueError("Painting is not the right one.")
 
+    @traced()
     def _find_by_artist(self):
         """Get the meta data by searching for all paintings by the artist
 
@@ -162,6 +206,14 @@ class WikiArtScraper(BaseArtScraper):
         raise ValueError("Cannot find painting by artist.")
 
     def _get_metadata(self):
+        # The painting is found through several API requests; the final
+        # painting info is what is archived and parsed.
+        sources = {"api": json.dumps(self._find_painting())}
+        if self._scraped_page[0] == self.link:
+            sources["page"] = self._scraped_page[1]
+        return self._parse_sources(sources)
+
+    def _find_painting(self):
         """Find a painting from a link through 3 different methods"""
         try:
             return self._find_by_artist_painting()
@@ -179,21 +231,62 @@ class WikiArtScraper(BaseArtScraper):
         params = {"id": painting_id}
         return self._get_content(url, params)
 
-    def save_image(self, img_fp=None, link=None):
-        metadata = self.get_metadata(link=link)
+    def _thumbnail_url(self):
+        return self.get_metadata()["image"] + "!PinterestSmall.jpg"
+
+    def _image_url(self, max_size=None, image_variant=None):
+        """Url of the smallest image variant that is at least max_size."""
+        metadata = self.get_metadata()
         img_url = metadata["image"]
+        if image_variant is not None:
+            return f"{img_url}!{image_variant}.jpg"
+        if max_size is None:
+            return img_url
+        full_size = max(metadata.get("width") or 0, metadata.get("height") or 0)
+        if full_size and full_size <= max_size:
+            return img_url
+        for variant, size in IMAGE_VARIANTS:
+            if size >= max_size:
+                return f"{img_url}!{variant}.jpg"
+        return img_url
+
+    @traced()
+    def save_image(self, img_fp=None, link=None, max_size=None,
+                   image_variant=None):
+        """Save the artwork image to a file.
+
+        Parameters
+        ----------
+        img_fp: Path.pathlib or str, optional
+            Path to where the image should be stored.
+        link: str, optional
+            Url to load, optional.
+        max_size: int, optional
+            Download the smallest variant of the image whose longest side is
+            at least this many pixels, by default the max_size of the
+            scraper. If not set, the original image is downloaded.
+        image_variant: str, optional
+            Name of the variant to download, e.g. "Large" or "HD",
+            overriding max_size.
+        """
+        self.get_metadata(link=link)
+        if max_size is None:
+            max_size = self.max_size
+        img_url = self._image_url(max_size, image_variant)
         path = urlparse(img_url).path
         suffix = Path(path).suffix
         img_fp = self._convert_img_fp(img_fp, suffix)
 
-        if self.skip_existing and img_fp.is_file():
+        if self.skip_existing and self._image_exists(img_fp):
+            return
+        if self._is_duplicate(self._thumbnail_url):
             return
-        img_data = requests.get(img_url, timeout=self.timeout).content
+        response = self.transport.get(img_url, timeout=self.timeout,
+                                      priority=IMAGE)
 
         if self.output_dir:
             self.paint_dir.mkdir(exist_ok=True)
-        with open(img_fp, "wb") as f:
-            f.write(img_data)
+        self._write_image(img_fp, response.content, response.headers)
 
 
 def _link_dirs(link):
@@ -0,0 +1,438 @@
+"""Shared work queue of links, for crawls spread over workers and nodes.
+
+Workers lease a batch of links for a limited time, extend the lease with
+heartbeats while they work, and mark each link as done or failed. Leases
+that expire (because a worker died or hangs) are put back in the queue.
+
+Two backends are available: SQLiteWorkQueue for workers on a single host,
+and HTTPWorkQueue, which talks to a SQLiteWorkQueue served by QueueServer
+on one of the nodes. Other backends can derive from WorkQueue. The server
+listens on localhost by default; when it is reachable from other nodes,
+give it a shared token, which the clients send in the TOKEN_HEADER.
+"""
+
+import hmac
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC
+from abc import abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.request import Request
+from urllib.request import urlopen
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Header with the shared token of a QueueServer.
+TOKEN_HEADER = "X-Queue-Token"
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    """str: Identifier for the current worker, based on host, process and
+    thread."""
+    return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+
+
+class WorkQueue(ABC):
+    """Base class for work queues with leases."""
+
+    @abstractmethod
+    def add(self, links):
+        """Add links to the queue; links already in the queue are ignored.
+
+        Returns
+        -------
+        int:
+            The number of links that were added.
+        """
+
+    @abstractmethod
+    def retry(self, links):
+        """Queue links again, whatever their status, with a fresh attempt count.
+
+        Links that are not in the queue yet are added.
+        """
+
+    @abstractmethod
+    def lease(self, worker_id, n_links=10, lease_time=300):
+        """Lease a batch of pending links.
+
+        Parameters
+        ----------
+        worker_id: str
+            Identifier of the worker that leases the links.
+        n_links: int, default=10
+            Maximum number of links to lease.
+        lease_time: float, default=300
+            Number of seconds after which the lease expires.
+
+        Returns
+        -------
+        list of str:
+            The leased links, empty if there is no more work.
+        """
+
+    @abstractmethod
+    def heartbeat(self, worker_id, lease_time=300):
+        """Extend the leases of all links held by a worker."""
+
+    @abstractmethod
+    def done(self, link):
+        """Mark a link as successfully scraped."""
+
+    @abstractmethod
+    def failed(self, link, error=None):
+        """Mark a link as failed.
+
+        The link is queued again, unless it has failed too often.
+        """
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Put links with an expired lease back in the queue.
+
+        Returns
+        -------
+        int:
+            The number of links that were requeued.
+        """
+
+    @abstractmethod
+    def counts(self):
+        """dict: Number of links for each status."""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue stored in a SQLite database.
+
+    Safe to use from multiple processes on the same host. SQLite locking is
+    not reliable on network file systems; use QueueServer/HTTPWorkQueue to
+    share a queue between nodes.
+
+    Parameters
+    ----------
+    db_fp: str or Path
+        Database file, created if it doesn't exist.
+    max_attempts: int, default=3
+        Number of times a link is tried before it is marked as failed.
+    """
+
+    def __init__(self, db_fp, max_attempts=3):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_fp), timeout=60,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            "link TEXT PRIMARY KEY, status TEXT NOT NULL, worker TEXT, "
+            "lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS links_status ON links (status)")
+
+    @contextmanager
+    def _write(self):
+        """Run statements in a single write transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def add(self, links):
+        with self._write() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO links (link, status) VALUES (?, ?)",
+                ((link, PENDING) for link in links))
+        return cursor.rowcount
+
+    def retry(self, links):
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO links (link, status) VALUES (?, ?) "
+                "ON CONFLICT (link) DO UPDATE SET status = excluded.status, "
+                "worker = NULL, lease_until = NULL, attempts = 0",
+                ((link, PENDING) for link in links))
+
+    def lease(self, worker_id, n_links=10, lease_time=300):
+        self.requeue_expired()
+        with self._write() as conn:
+            links = [row[0] for row in conn.execute(
+                "SELECT link FROM links WHERE status = ? ORDER BY rowid "
+                "LIMIT ?", (PENDING, n_links))]
+            conn.executemany(
+                "UPDATE links SET status = ?, worker = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE link = ?",
+                ((LEASED, worker_id, time.time() + lease_time, link)
+                 for link in links))
+        return links
+
+    def heartbeat(self, worker_id, lease_time=300):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE links SET lease_until = ? "
+                "WHERE status = ? AND worker = ?",
+                (time.time() + lease_time, LEASED, worker_id))
+
+    def done(self, link):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE links SET status = ?, worker = NULL, "
+                "lease_until = NULL, error = NULL WHERE link = ?",
+                (DONE, link))
+
+    def failed(self, link, error=None):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE links SET status = CASE WHEN attempts >= ? THEN ? "
+                "ELSE ? END, worker = NULL, lease_until = NULL, error = ? "
+                "WHERE link = ?",
+                (self.max_attempts, FAILED, PENDING,
+                 None if error is None else str(error), link))
+
+    def requeue_expired(self):
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE links SET status = CASE WHEN attempts >= ? THEN ? "
+                "ELSE ? END, worker = NULL, lease_until = NULL, "
+                "error = 'lease expired' "
+                "WHERE status = ? AND lease_until < ?",
+                (self.max_attempts, FAILED, PENDING, LEASED, time.time()))
+        return cursor.rowcount
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM links GROUP BY status").fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+class QueueServer(ThreadingHTTPServer):
+    """Serve a work queue over HTTP, for use with HTTPWorkQueue.
+
+    Parameters
+    ----------
+    work_queue: WorkQueue
+        Queue to serve, usually a SQLiteWorkQueue.
+    address: (str, int), default=("127.0.0.1", 8765)
+        Host and port to listen on.
+    token: str, optional
+        Shared token that clients have to send; without it, any client
+        that can reach the server can change the queue.
+    """
+
+    def __init__(self, work_queue, address=("127.0.0.1", 8765), token=None):
+        self.work_queue = work_queue
+        self.token = token
+        super().__init__(address, _QueueRequestHandler)
+
+
+class _QueueRequestHandler(BaseHTTPRequestHandler):
+    """Map POST /<method> with a JSON body to WorkQueue.<method>."""
+
+    methods = ["add", "retry", "lease", "heartbeat", "done", "failed",
+               "requeue_expired", "counts"]
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handle a call to the work queue."""
+        method = self.path.strip("/")
+        if method not in self.methods:
+            self.send_error(404)
+            return
+        token = self.server.token
+        if token is not None and not hmac.compare_digest(
+                self.headers.get(TOKEN_HEADER, "").encode("utf-8"),
+                token.encode("utf-8")):
+            self.send_error(401)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            kwargs = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(kwargs, dict):
+                raise ValueError("The body is not a JSON object.")
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+        try:
+            result = getattr(self.server.work_queue, method)(**kwargs)
+        except Exception as error:  # pylint: disable=broad-except
+            self.send_error(500, str(error))
+            return
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class HTTPWorkQueue(WorkQueue):
+    """Client for a work queue served by QueueServer on another node.
+
+    Parameters
+    ----------
+    url: str
+        Url of the server, e.g. "http://node1:8765".
+    timeout: float, default=60
+        Timeout for each call to the server.
+    token: str, optional
+        Shared token of the server.
+    """
+
+    def __init__(self, url, timeout=60, token=None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.token = token
+
+    def _call(self, method, **kwargs):
+        headers = {"Content-Type": "application/json"}
+        if self.token is not None:
+            headers[TOKEN_HEADER] = self.token
+        request = Request(f"{self.url}/{method}",
+                          data=json.dumps(kwargs).encode("utf-8"),
+                          headers=headers)
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def add(self, links):
+        return self._call("add", links=list(links))
+
+    def retry(self, links):
+        return self._call("retry", links=list(links))
+
+    def lease(self, worker_id, n_links=10, lease_time=300):
+        return self._call("lease", worker_id=worker_id, n_links=n_links,
+                          lease_time=lease_time)
+
+    def heartbeat(self, worker_id, lease_time=300):
+        return self._call("heartbeat", worker_id=worker_id,
+                          lease_time=lease_time)
+
+    def done(self, link):
+        return self._call("done", link=link)
+
+    def failed(self, link, error=None):
+        return self._call("failed", link=link,
+                          error=None if error is None else str(error))
+
+    def requeue_expired(self):
+        return self._call("requeue_expired")
+
+    def counts(self):
+        return self._call("counts")
+
+
+def open_queue(location, token=None, **kwargs):
+    """Open a work queue from a url or a database file.
+
+    Parameters
+    ----------
+    location: str
+        Either an http(s) url of a QueueServer, or a SQLite database file.
+    token: str, optional
+        Shared token of the QueueServer; ignored for database files.
+    kwargs:
+        Passed on to the queue class.
+
+    Returns
+    -------
+    WorkQueue:
+        The opened queue.
+    """
+    if location.startswith(("http://", "https://")):
+        return HTTPWorkQueue(location, token=token, **kwargs)
+    return SQLiteWorkQueue(location, **kwargs)
+
+
+def run_worker(work_queue, router, *, worker_id=None, batch_size=10,  # pylint: disable=too-many-arguments
+               lease_time=300, heartbeat_interval=None, callback=None,
+               poll_interval=10):
+    """Scrape links from a work queue until it is empty.
+
+    While other workers still hold leases, the worker keeps polling the
+    queue, so that it takes over the links of workers that die.
+
+    Parameters
+    ----------
+    work_queue: WorkQueue
+        Queue to take links from.
+    router: artscraper.router.ScraperRouter
+        Router that scrapes each link with the scraper of its source.
+    worker_id: str, optional
+        Identifier of this worker, by default based on host, process and
+        thread.
+    batch_size: int, default=10
+        Number of links leased at a time.
+    lease_time: float, default=300
+        Duration of a lease in seconds.
+    heartbeat_interval: float, optional
+        Time between heartbeats, by default a third of the lease time.
+    callback: callable, optional
+        Called with each ScrapeResult, e.g. for progress reporting.
+    poll_interval: float, default=10
+        Time between polls of the queue in seconds, when no links are
+        pending but some are leased by other workers.
+    """
+    if worker_id is None:
+        worker_id = default_worker_id()
+    if heartbeat_interval is None:
+        heartbeat_interval = lease_time / 3
+
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(heartbeat_interval):
+            # A failed heartbeat (e.g. the queue server is briefly down)
+            # must not end the heartbeats, or the leases would expire.
+            try:
+                work_queue.heartbeat(worker_id, lease_time)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Heartbeat of worker %s failed.", worker_id)
+
+    heartbeat_thread = threading.Thread(target=beat, daemon=True)
+    heartbeat_thread.start()
+    try:
+        while True:
+            links = work_queue.lease(worker_id, batch_size, lease_time)
+            if not links:
+                counts = work_queue.counts()
+                if not counts[PENDING] and not counts[LEASED]:
+                    break
+                time.sleep(poll_interval)
+                continue
+            for link in links:
+                result = router.scrape_link(link)
+                if result.error is None:
+                    work_queue.done(link)
+                else:
+                    work_queue.failed(link, repr(result.error))
+                if callback is not None:
+                    callback(result)
+    finally:
+        stop.set()
+        heartbeat_thread.join()
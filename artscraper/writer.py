@@ -0,0 +1,197 @@
+"""Background writer for images and metadata.
+
+Without a writer, the scrapers write every file on the scraping thread,
+which on slow (network) storage delays the next request. An AsyncWriter
+takes the data and writes it on background threads instead, so that disk
+and network I/O overlap. Writes are handled in batches: the directories
+of a batch are created once, and with fsync the files and directories of a
+batch are synced together before the files are renamed into place.
+"""
+
+import json
+import os
+import queue
+import threading
+from contextlib import suppress
+from pathlib import Path
+
+
+class AsyncWriter():
+    """Write files on background threads, through a bounded queue.
+
+    Parameters
+    ----------
+    threads: int, default=2
+        Number of writer threads.
+    max_pending: int, default=64
+        Maximum number of files waiting to be written. When this is reached,
+        write blocks until there is room, so that the crawl cannot outrun
+        the disk and fill up the memory.
+    batch_size: int, default=16
+        Maximum number of files a thread writes in one batch.
+    fsync: bool, default=False
+        Sync the files (and their directories) to disk before they are
+        considered written, so that they survive a power loss.
+    """
+
+    def __init__(self, threads=2, max_pending=64, batch_size=16, fsync=False):
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.errors = []
+        self.bytes_written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._dirs = set()
+        self._threads = [threading.Thread(target=self._run, daemon=True)
+                         for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def write(self, file_fp, data, callback=None):
+        """Queue data to be written to a file.
+
+        Parameters
+        ----------
+        file_fp: str or Path
+            File to write; its directory is created if needed.
+        data: bytes or iterable of bytes
+            The content, or chunks of it (e.g. response.iter_content()).
+        callback: callable, optional
+            Called with file_fp on the writer thread once the file is
+            written, e.g. to post-process it.
+        """
+        if self._threads is None:
+            raise ValueError("Cannot write with a closed writer.")
+        self._queue.put((Path(file_fp), data, callback))
+
+    def write_json(self, file_fp, obj, callback=None):
+        """Queue a JSON serializable object to be written to a file."""
+        self.write(file_fp, json.dumps(obj).encode("utf-8"), callback)
+
+    def _mkdir(self, directory):
+        with self._lock:
+            if directory in self._dirs:
+                return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._dirs.add(directory)
+
+    def _next_batch(self):
+        """Wait for a file to write and take whatever else is queued."""
+        batch = [self._queue.get()]
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            items = [item for item in batch if item is not None]
+            try:
+                self._write_batch(items)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, items):
+        """Write a batch of files.
+
+        Errors are recorded in self.errors per file, and never stop the
+        thread; callbacks only run for files that were renamed into place.
+        """
+        for directory in {file_fp.parent for file_fp, _, _ in items}:
+            try:
+                self._mkdir(directory)
+            except OSError:
+                # Recorded below, when the files in it cannot be opened.
+                pass
+
+        written = []
+        for file_fp, data, callback in items:
+            tmp_fp = file_fp.with_name(file_fp.name + ".part")
+            try:
+                n_bytes = 0
+                with open(tmp_fp, "wb") as f:  # pylint: disable=invalid-name
+                    chunks = [data] if isinstance(data, (bytes, bytearray)) else data
+                    for chunk in chunks:
+                        f.write(chunk)
+                        n_bytes += len(chunk)
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+            except Exception as error:  # pylint: disable=broad-except
+                self.errors.append((file_fp, error))
+                continue
+            written.append((file_fp, tmp_fp, callback, n_bytes))
+
+        renamed = []
+        for item in written:
+            file_fp, tmp_fp, _, _ = item
+            try:
+                os.replace(tmp_fp, file_fp)
+            except OSError as error:
+                self.errors.append((file_fp, error))
+                with suppress(OSError):
+                    tmp_fp.unlink()
+                continue
+            renamed.append(item)
+        if self.fsync:
+            # Make the renames durable, once per directory.
+            for directory in {file_fp.parent for file_fp, _, _, _ in renamed}:
+                try:
+                    _fsync_dir(directory)
+                except OSError as error:
+                    self.errors.append((directory, error))
+
+        for file_fp, _, callback, n_bytes in renamed:
+            with self._lock:
+                self.bytes_written += n_bytes
+            if callback is None:
+                continue
+            try:
+                callback(file_fp)
+            except Exception as error:  # pylint: disable=broad-except
+                self.errors.append((file_fp, error))
+
+    @property
+    def pending(self):
+        """int: Number of files waiting to be written."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Wait until all queued files are written."""
+        self._queue.join()
+
+    def close(self):
+        """Write all queued files and stop the writer threads."""
+        if self._threads is None:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = None
+
+
+def _fsync_dir(directory):
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on some platforms (Windows).
+        return
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
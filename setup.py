@@ -21,5 +21,13 @@ setup(
         "requests",
         "selenium",
         "beautifulsoup4"
-    ]
+    ],
+    entry_points={
+        "console_scripts": ["artscraper=artscraper.cli:main"],
+    },
+    extras_require={
+        "fast": ["lxml"],
+        "images": ["Pillow", "numpy"],
+        "monitor": ["psutil"],
+    }
 )